@@ -1,14 +1,31 @@
 """Main application logic for BillSoft"""
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkcalendar import DateEntry
 from datetime import datetime
 
-from database import DatabaseManager
-from utils import resource_path
+from database import DatabaseManager, AuthDB
+from backup import BackupManager
+from archive import SalesArchiver
+from maintenance import DatabaseMaintenance
+from scheduler import IdleScheduler
+from stall_watchdog import StallWatchdog
+from metrics import MetricsExporter, REGISTRY, SCAN_TO_CART_SECONDS, REPORT_SECONDS
+from importer import InventoryImporter, EXCEL_AVAILABLE
+from exporter import SalesExporter
+from billing import BillingEngine
+from cart_journal import CartJournal
+from utils import (
+    resource_path, get_backup_config, get_archive_config, get_watchdog_config,
+    get_metrics_config, get_quick_keys_config, to_paise, rupees, format_sales_report
+)
 from ui_components import (
     PrinterConfigDialog, HelpDialog, BackupDialog, PrintPreviewDialog,
-    ManualQuantityDialog, FastBillingDialog
+    ManualQuantityDialog, FastBillingDialog, ReceiptLookupDialog, ProgressDialog,
+    SalesExportDialog, SalesSearchDialog, SuggestionDropdown, StockHistoryDialog,
+    BackgroundTask, ParkedCartsDialog, LockScreen
 )
 from printing import ReceiptPrinter
 
@@ -22,37 +39,129 @@ except ImportError:
 class ShopApp:
     """Main application class for the clothing shop POS system"""
     
-    def __init__(self, root):
+    def __init__(self, root, cashier=None, auth=None):
         self.root = root
         self.root.title("BillSoft")
         self.root.state('zoomed')
         self.screen_width = self.root.winfo_screenwidth()
         self.screen_height = self.root.winfo_screenheight()
 
+        # Logs event-loop freezes with the stack of the handler that caused them
+        self.watchdog = StallWatchdog(self.root, get_watchdog_config())
+        # Checkout, scan, print and report latencies for the monitoring box
+        self.metrics = MetricsExporter(get_metrics_config())
+        self.scan_started = None
+
         # Database
         self.db = DatabaseManager()
 
-        # Load inventory from DB
-        self.inventory = {}
-        try:
-            for name, price, stock, barcode in self.db.fetch_inventory():
-                self.inventory[name] = {"price": price, "stock": stock, "barcode": barcode}
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Failed to load inventory: {e}")
-            self.inventory = {}
+        # Inventory cache, lookup, cart and checkout; the screens below only drive it
+        # Every cart change is journalled, so a crash or power cut mid-bill loses no scans
+        self.billing = BillingEngine(self.db, self.metrics.config["lane"], CartJournal(), cashier)
+        # Cashiers switch through the lock screen; the app and its caches stay loaded
+        self.auth = auth or AuthDB()
+        self.cart = self.billing.cart
+        self.reload_inventory()
 
-        self.cart = []
         self.manual_qty = tk.IntVar(value=1)
+        self.quick_keys = get_quick_keys_config()
+        self.quick_items = []
+
+        # Background jobs that run while the till is idle
+        backup_config = get_backup_config()
+        self.scheduler = IdleScheduler(self.root, backup_config["idle_seconds"])
+        self.backups = BackupManager(self.db, backup_config)
+        self.backups.schedule(self.scheduler)
+        self.scheduler.add_job("stock_snapshot", self.db.stock_snapshot_due, self.db.snapshot_stock)
+        self.archiver = SalesArchiver(self.db, get_archive_config())
+        self.archiver.schedule(self.scheduler)
+        self.maintenance = DatabaseMaintenance(self.db)
+        self.maintenance.schedule(self.scheduler)
+        self.migration_thread = None
+        # Set while a restore writes Data.db; checkout and the cart hold wait for it
+        self.restoring = False
 
         # Report data
         self.last_report_rows = []
         self.last_report_date = ""
+        self.last_report_total = 0
 
         # Create UI
         self.create_navigation()
         self.create_shop_page()
         self.create_inventory_page()
         self.show_frame("shop")
+        self.recover_cart()
+        self.start_data_migrations()
+        if self.quick_keys["enabled"]:
+            self.refresh_quick_keys()
+
+    @property
+    def inventory(self):
+        """The billing engine's inventory cache, {name: {"price", "stock", "barcode"}}"""
+        return self.billing.inventory
+
+    def reload_inventory(self):
+        """Rebuild the in-memory inventory cache and search index from the database"""
+        try:
+            self.billing.reload_inventory()
+        except Exception as e:
+            messagebox.showerror("Database Error", f"Failed to load inventory: {e}")
+            self.billing.inventory = {}
+        self.billing.rebuild_search_index()
+
+    def start_data_migrations(self):
+        """Finish row rewrites left by a schema upgrade on a worker thread
+
+        Billing carries on meanwhile; progress shows in the navigation bar.
+        """
+        if not self.db.data_migrations_pending or \
+                (self.migration_thread and self.migration_thread.is_alive()):
+            return
+        status = {"text": "Upgrading database...", "running": True}
+
+        def report(description, done, total):
+            status["text"] = f"{description}: {done * 100 // max(total, 1)}%"
+
+        def work():
+            try:
+                self.db.run_data_migrations(report)
+            except Exception as e:
+                print(f"Database upgrade stopped, will resume on next start: {e}")
+            finally:
+                status["running"] = False
+
+        def poll():
+            if status["running"]:
+                self.upgrade_label.config(text=status["text"])
+                self.root.after(500, poll)
+            else:
+                self.upgrade_label.config(text="")
+
+        self.migration_thread = threading.Thread(target=work, daemon=True)
+        self.migration_thread.start()
+        poll()
+
+    def lock_till(self):
+        """Lock the till (F12) until a cashier logs in; bills from then on are theirs
+
+        The cart, caches and database connections are left as they are, so a
+        shift change is just a login.
+        """
+        cashier = LockScreen.show(self.root, self.auth, self.billing.cashier)
+        if cashier is None:
+            return
+        self.billing.cashier = cashier
+        self.cashier_label.config(text=f"👤 {cashier}")
+        self.item_entry.focus_set()
+
+    def on_database_restored(self):
+        """Refresh caches and views after a hot restore"""
+        self.reload_inventory()
+        self.start_data_migrations()
+        self.update_inventory_display()
+        self.update_cart_display()
+        self.update_parked_count()
 
     # ==================== Navigation ====================
     def create_navigation(self):
@@ -64,9 +173,18 @@ class ShopApp:
         tk.Label(nav_frame, text="BillSoft",font=("Arial", 20, "bold"),  
                 bg="#212121", fg="#00d4ff").pack(side=tk.LEFT, padx=20)
 
+        # Background database upgrade progress; empty otherwise
+        self.upgrade_label = tk.Label(nav_frame, text="", font=("Arial", 10),
+                                      bg="#212121", fg="#FFC107")
+        self.upgrade_label.pack(side=tk.LEFT, padx=10)
+
         btn_frame = tk.Frame(nav_frame, bg="#212121")
         btn_frame.pack(side=tk.RIGHT, padx=20)
 
+        self.cashier_label = tk.Label(nav_frame, text=f"👤 {self.billing.cashier or ''}",
+                                      font=("Arial", 11, "bold"), bg="#212121", fg="#ffffff")
+        self.cashier_label.pack(side=tk.RIGHT, padx=10)
+
         self.Daily_sales = tk.Button(btn_frame, text="Daily Sales Report", 
                                     command=self.show_sales_report,
                                     bg="#424242", fg="white", 
@@ -91,6 +209,11 @@ class ShopApp:
                                font=("Arial", 11, "bold"), padx=20, pady=10, relief=tk.FLAT)
         self.Helper.pack(side=tk.LEFT, padx=5)
 
+        tk.Button(btn_frame, text="🔒 Lock (F12)", command=self.lock_till,
+                 bg="#424242", fg="white", font=("Arial", 11, "bold"),
+                 padx=20, pady=10, relief=tk.FLAT).pack(side=tk.LEFT, padx=5)
+        self.root.bind("<F12>", lambda event: self.lock_till())
+
         # Container for frames
         self.container = tk.Frame(self.root, bg="#1e1e1e")
         self.container.pack(fill=tk.BOTH, expand=True)
@@ -149,11 +272,39 @@ class ShopApp:
 
     def open_backup_popup(self):
         """Open backup dialog"""
-        BackupDialog.show(self.root, self.db)
+        BackupDialog.show(self.root, self.db, self.backups, self.on_database_restored,
+                          self.begin_restore)
+
+    def begin_restore(self):
+        """Hold background jobs and till writes while a restore copies into Data.db
+
+        Returns the function that ends the hold, or None if a background
+        job still has the database and the restore must wait.
+        """
+        busy = self.scheduler.running or \
+            (self.migration_thread and self.migration_thread.is_alive() and "database upgrade")
+        if busy:
+            messagebox.showwarning("Restore", f"The background {busy} job is still running.\n"
+                                   "Try the restore again in a minute.")
+            return None
+        self.restoring = True
+        self.scheduler.pause()
+
+        def end():
+            self.restoring = False
+            self.scheduler.resume()
+        return end
+
+    def restore_in_progress(self):
+        """Warn and return True while a restore has the database locked"""
+        if self.restoring:
+            messagebox.showwarning("Restore in Progress",
+                                   "The database is being restored. Try again when it finishes.")
+        return self.restoring
 
     def open_help_popup(self):
         """Open help dialog"""
-        HelpDialog.show(self.root)
+        HelpDialog.show(self.root, self.watchdog, REGISTRY)
 
     def select_printer_gui(self):
         """Open printer configuration dialog"""
@@ -186,11 +337,22 @@ class ShopApp:
                                    highlightbackground="#2b2b2b", highlightcolor="#ffffff",
                                    highlightthickness=2, bd=0)
         self.item_entry.place(x=150, y=20)
-        self.item_entry.bind("<Return>", self.on_item_entered)
+        self.hide_item_suggestions = SuggestionDropdown.attach(
+            self.item_entry, lambda text: self.billing.search_index.suggest(text), self.on_item_entered)
 
         tk.Button(manual_frame, text="Add to Cart", command=self.on_item_entered,
                  bg="#4CAF50", fg="white", font=("Arial", 11, "bold")).place(x=220, y=70, width=200, height=35)
 
+        # Quick keys: the best sellers, one press adds one at the shelf price
+        self.quick_frame = tk.LabelFrame(main_frame, text="QUICK KEYS (Ctrl+1 ... Ctrl+0)",
+                                         font=("Arial", 10, "bold"), padx=6, pady=4,
+                                         bg="#282c34", fg="#ca1616", labelanchor="n")
+        if self.quick_keys["enabled"]:
+            self.quick_frame.place(relx=0, rely=0.05, y=205, relheight=0.44, height=-210, width=680)
+            for number in range(1, 11):
+                self.root.bind(f"<Control-Key-{number % 10}>",
+                               lambda event, index=number - 1: self.quick_key_pressed(index))
+
         # Fast Billing Frame
         fast_frame = tk.LabelFrame(main_frame, text="FAST BILLING",
                                   font=("Arial", 13, "bold"), padx=15, pady=15,
@@ -249,13 +411,29 @@ class ShopApp:
                                    fg="#1e1e1e", pady=12)
         self.total_label.place(x=750, y=480, width=680)
 
+        # Hold a customer's cart while the next one is served; kept in the database
+        tk.Button(main_frame, text="HOLD CART (F8)", command=self.park_cart,
+                 bg="#795548", fg="white", font=("Arial", 12, "bold"),
+                 pady=6, cursor="hand2").place(x=750, y=540, width=335)
+        self.recall_btn = tk.Button(main_frame, text="RECALL (F9)", command=self.recall_cart,
+                                    bg="#795548", fg="white", font=("Arial", 12, "bold"),
+                                    pady=6, cursor="hand2")
+        self.recall_btn.place(x=1095, y=540, width=335)
+        self.root.bind("<F8>", lambda event: self.park_cart())
+        self.root.bind("<F9>", lambda event: self.recall_cart())
+        self.update_parked_count()
+
         tk.Button(main_frame, text="CONFIRM", command=self.checkout,
                  bg="#2196F3", fg="white", font=("Arial", 14, "bold"),
                  pady=12, cursor="hand2").place(x=750, y=600, width=680)
         
         tk.Button(main_frame, text="REPRINT LAST RECEIPT", command=self.reprint_last_receipt,
                  bg="#00d4ff", fg="white", font=("Arial", 14, "bold"),
-                 pady=12, cursor="hand2").place(x=0, y=600, width=680)
+                 pady=12, cursor="hand2").place(x=0, y=600, width=440)
+
+        tk.Button(main_frame, text="FIND BILL", command=self.find_bill,
+                 bg="#607D8B", fg="white", font=("Arial", 14, "bold"),
+                 pady=12, cursor="hand2").place(x=460, y=600, width=220)
 
         # Tooltip on hover
         def show_warning(event):
@@ -282,6 +460,8 @@ class ShopApp:
 
     def on_item_entered(self, event=None):
         """Handle manual item entry"""
+        self.scan_started = time.perf_counter()
+        self.hide_item_suggestions()
         value = self.item_entry.get().strip()
         
         if not value:
@@ -290,16 +470,9 @@ class ShopApp:
             self.item_entry.focus_set()
             return
 
-        # Match barcode
-        for name, data in self.inventory.items():
-            if data.get("barcode") == value:
-                self.manual_quantity_popup(name)
-                self.item_entry.delete(0, tk.END)
-                return
-
-        # Match item name
-        if value in self.inventory:
-            self.manual_quantity_popup(value)
+        name = self.billing.find_item(value)
+        if name is not None:
+            self.manual_quantity_popup(name)
             self.item_entry.delete(0, tk.END)
             return
 
@@ -308,6 +481,7 @@ class ShopApp:
 
     def fast_item_entered(self, event=None):
         """Handle fast billing item entry"""
+        self.scan_started = time.perf_counter()
         item = self.fast_item_entry.get().strip()
         if not item:
             messagebox.showwarning("Input Required", "Scan or enter item!")
@@ -322,39 +496,80 @@ class ShopApp:
             messagebox.showerror("Error", f"'{item}' not found in inventory!")
             return
 
+        shown = time.perf_counter()
         result = ManualQuantityDialog.show(self.root, item, self.inventory)
+        dialog_seconds = time.perf_counter() - shown
         
         if result.get("confirmed"):
             qty = result["qty"]
             price = result["price"]
             self.add_manual_item_with_price(item, qty, price)
-
-    def fast_quantity_price_popup(self, item):
-        """Show popup for fast billing quantity and price"""
-        result = FastBillingDialog.show(self.root, item, self.inventory)
+            self.record_scan_to_cart("REGULAR", dialog_seconds)
+
+    def fast_quantity_price_popup(self, item, price=None):
+        """Show popup for fast billing quantity and price, suggesting price (paise) if given"""
+        shown = time.perf_counter()
+        result = FastBillingDialog.show(self.root, item,
+                                        self.inventory if price is None else {item: {"price": price}})
+        dialog_seconds = time.perf_counter() - shown
         
         if result.get("confirmed"):
-            qty = result["qty"]
-            price = result["price"]
-            
-            for entry in self.cart:
-                if entry["item"] == item and entry["price"] == price:
-                    entry["qty"] += qty
-                    self.update_cart_display()
-                    return
-            
-            self.cart.append({"item": item, "qty": qty, "price": price, "billing_type": "FAST"})
+            self.billing.add_item(item, result["qty"], result["price"], "FAST")
             self.update_cart_display()
+            self.record_scan_to_cart("FAST", dialog_seconds)
             self.fast_item_entry.focus_set()
 
+    def refresh_quick_keys(self):
+        """Re-rank the quick keys from the sales rollup off the Tk thread; repeats every refresh_seconds"""
+        config = self.quick_keys
+        BackgroundTask.run(self.root,
+                           lambda: self.billing.quick_items(config["days"], config["count"], config["pinned"]),
+                           self.show_quick_keys,
+                           lambda e: print(f"Quick keys refresh failed: {e}"))
+        self.root.after(max(int(config["refresh_seconds"]), 10) * 1000, self.refresh_quick_keys)
+
+    def show_quick_keys(self, items):
+        """Lay out one button per quick item, five to a row"""
+        if items == self.quick_items:
+            return
+        self.quick_items = items
+        for child in self.quick_frame.winfo_children():
+            child.destroy()
+        for index, (name, _) in enumerate(items):
+            label = f"Ctrl+{(index + 1) % 10}\n{name}" if index < 10 else name
+            tk.Button(self.quick_frame, text=label, command=lambda i=index: self.quick_key_pressed(i),
+                      bg="#3a3f4b", fg="white", font=("Arial", 9), wraplength=120,
+                      cursor="hand2").grid(row=index // 5, column=index % 5, sticky="nsew", padx=2, pady=2)
+        for column in range(5):
+            self.quick_frame.columnconfigure(column, weight=1, uniform="quick")
+        for row in range((len(items) + 4) // 5):
+            self.quick_frame.rowconfigure(row, weight=1, uniform="quick")
+
+    def quick_key_pressed(self, index):
+        """Add one of quick item index; loose items still ask for quantity and price"""
+        if index >= len(self.quick_items):
+            return
+        self.scan_started = time.perf_counter()
+        name, price = self.quick_items[index]
+        if name not in self.inventory:
+            self.fast_quantity_price_popup(name, price)
+            return
+        if self.inventory[name]["stock"] < 1:
+            messagebox.showerror("Stock Error", f"'{name}' is out of stock!")
+            return
+        self.add_manual_item_with_price(name, 1, self.inventory[name]["price"])
+        self.record_scan_to_cart("REGULAR", 0)
+
+    def record_scan_to_cart(self, billing, dialog_seconds):
+        """Time from item entry to the cart showing it, less the time spent in the quantity dialog"""
+        if self.scan_started is not None:
+            SCAN_TO_CART_SECONDS.observe(time.perf_counter() - self.scan_started - dialog_seconds,
+                                         billing=billing)
+            self.scan_started = None
+
     def add_manual_item_with_price(self, item, qty, price):
         """Add item to cart"""
-        for entry in self.cart:
-            if entry["item"] == item and entry["price"] == price:
-                entry["qty"] += qty
-                self.update_cart_display()
-                return
-        self.cart.append({"item": item, "qty": qty, "price": price, "billing_type": "REGULAR"})
+        self.billing.add_item(item, qty, price)
         self.update_cart_display()
 
     def update_cart_display(self):
@@ -368,9 +583,9 @@ class ShopApp:
             billing_marker = " ⚡" if entry.get("billing_type") == "FAST" else ""
             
             self.cart_listbox.insert("end", 
-                f"{entry['qty']}x {entry['item']}{billing_marker} - ₹{subtotal:.2f}")
+                f"{entry['qty']}x {entry['item']}{billing_marker} - ₹{rupees(subtotal)}")
         
-        self.total_label.config(text=f"Total: ₹{total:.2f}")
+        self.total_label.config(text=f"Total: ₹{rupees(total)}")
 
     def remove_from_cart(self):
         """Remove selected item from cart"""
@@ -378,37 +593,70 @@ class ShopApp:
         if not selection:
             messagebox.showwarning("Warning", "Select item to remove!")
             return
-        index = selection[0]
-        self.cart.pop(index)
+        self.billing.remove_line(selection[0])
         self.update_cart_display()
 
-    def checkout(self):
-        """Process checkout"""
+    def park_cart(self):
+        """Put the current cart on hold (F8) and start an empty one"""
+        if self.restore_in_progress():
+            return
         if not self.cart:
             messagebox.showwarning("Warning", "Cart is empty!")
             return
+        self.billing.park()
+        self.update_cart_display()
+        self.update_parked_count()
+        self.item_entry.focus_set()
 
-        total = sum(entry["qty"] * entry["price"] for entry in self.cart)
+    def recall_cart(self):
+        """Bring back a held cart (F9); the current one, if any, is held in its place"""
+        if self.restore_in_progress():
+            return
+        carts = self.billing.parked()
+        if not carts:
+            messagebox.showinfo("Parked Carts", "No carts on hold.")
+            return
+        if len(carts) == 1 and not self.cart:
+            park_id = carts[0][0]
+        else:
+            park_id = ParkedCartsDialog.show(self.root, carts)
+            if park_id is None:
+                return
+        self.billing.recall(park_id)
+        self.update_cart_display()
+        self.update_parked_count()
+        self.item_entry.focus_set()
 
-        # Reduce stock and save sales
-        for entry in self.cart:
-            item = entry['item']
-            qty = entry['qty']
-            billing_type = entry.get('billing_type', 'REGULAR')
+    def recover_cart(self):
+        """Bring back the cart left unfinished when BillSoft last stopped"""
+        try:
+            lines = self.billing.recover()
+        except Exception as e:
+            print(f"Cart recovery failed: {e}")
+            return
+        if lines:
+            self.update_cart_display()
+            messagebox.showinfo("Cart Restored",
+                f"The unfinished cart ({lines} lines) from before BillSoft closed has been restored.")
 
-            if item in self.inventory and billing_type == 'REGULAR':
-                self.inventory[item]['stock'] -= qty
-                self.db.update_stock(item, self.inventory[item]['stock'])
+    def update_parked_count(self):
+        """Show how many carts are on hold on the recall button"""
+        count = len(self.billing.parked())
+        self.recall_btn.config(text=f"RECALL (F9) · {count} held" if count else "RECALL (F9)")
 
-            self.db.add_sale(item, qty, entry['price'], billing_type)
+    def checkout(self):
+        """Process checkout"""
+        if self.restore_in_progress():
+            return
+        if not self.cart:
+            messagebox.showwarning("Warning", "Cart is empty!")
+            return
 
-        # Save receipt for reprinting
-        cart_copy = self.cart.copy()
-        self.db.save_last_receipt(cart_copy, total)
+        # Journal the bill and its sale lines; the database takes the stock off
+        cart_copy, bill_no, total = self.billing.checkout()
         
         # Show preview and print
         PrintPreviewDialog.show(self.root, cart_copy, total, ReceiptPrinter.print_receipt)
-        self.cart.clear()
         self.update_cart_display()
 
     def reprint_last_receipt(self):
@@ -420,11 +668,15 @@ class ShopApp:
             return
         
         confirm = messagebox.askyesno("Reprint Receipt", 
-            f"Reprint receipt from {timestamp}?\nTotal: ₹{total:.2f}")
+            f"Reprint receipt from {timestamp}?\nTotal: ₹{rupees(total)}")
         
         if confirm:
             PrintPreviewDialog.show(self.root, cart_data, total, ReceiptPrinter.print_receipt)
 
+    def find_bill(self):
+        """Look up any past bill for reprinting"""
+        ReceiptLookupDialog.show(self.root, self.db, ReceiptPrinter.print_receipt)
+
     # ==================== Sales Report ====================
     def show_sales_report(self):
         """Show sales report dialog"""
@@ -451,84 +703,55 @@ class ShopApp:
                 messagebox.showwarning("Input Required", "Please select a date!")
                 return
 
-            cursor = self.db.conn.cursor()
-            cursor.execute("""
-                SELECT item_name, quantity, price, total, date_time, billing_type
-                FROM sales
-                WHERE date(date_time) = ?
-                ORDER BY billing_type, date_time
-            """, (date_str,))
-            rows = cursor.fetchall()
+            # Read on a pool connection off the Tk thread, so a busy day's
+            # report never holds up the till
+            generate_btn.config(state=tk.DISABLED)
+            began = time.perf_counter()
 
-            report_box.delete("1.0", tk.END)
+            def failed(error):
+                generate_btn.config(state=tk.NORMAL)
+                messagebox.showerror("Database Error", f"Failed to generate report: {error}", parent=popup)
 
-            regular_sales = []
-            fast_sales = []
-            regular_total = 0
-            fast_total = 0
-
-            for item_name, quantity, price, total, dt, billing_type in rows:
-                if billing_type == 'FAST':
-                    fast_sales.append((item_name, quantity, price, total, dt))
-                    fast_total += total
-                else:
-                    regular_sales.append((item_name, quantity, price, total, dt))
-                    regular_total += total
-
-            # Format report with sections
-            report_box.insert(tk.END, f"{'='*60}\n")
-            report_box.insert(tk.END, f"  DAILY SALES REPORT - {date_str}\n")
-            report_box.insert(tk.END, f"{'='*60}\n\n")
-
-            if regular_sales:
-                report_box.insert(tk.END, f"┌{'─'*58}┐\n")
-                report_box.insert(tk.END, f"│ 📦 REGULAR BILLING (Stock Items)".ljust(59) + "│\n")
-                report_box.insert(tk.END, f"└{'─'*58}┘\n\n")
-                
-                for item_name, quantity, price, total, dt in regular_sales:
-                    line = f"  {item_name[:30]:<30} {quantity:>3} x ₹{price:>6.2f} = ₹{total:>7.2f}\n"
-                    report_box.insert(tk.END, line)
-                
-                report_box.insert(tk.END, f"\n  {'-'*50}\n")
-                report_box.insert(tk.END, f"  Regular Subtotal: ₹{regular_total:.2f}\n")
-                report_box.insert(tk.END, f"  {'-'*50}\n\n")
-
-            if fast_sales:
-                report_box.insert(tk.END, f"┌{'─'*58}┐\n")
-                report_box.insert(tk.END, f"│ ⚡ FAST BILLING (Manual Entry)".ljust(59) + "│\n")
-                report_box.insert(tk.END, f"└{'─'*58}┘\n\n")
-                
-                for item_name, quantity, price, total, dt in fast_sales:
-                    line = f"  {item_name[:30]:<30} {quantity:>3} x ₹{price:>6.2f} = ₹{total:>7.2f}\n"
-                    report_box.insert(tk.END, line)
-                
-                report_box.insert(tk.END, f"\n  {'-'*50}\n")
-                report_box.insert(tk.END, f"  Fast Billing Subtotal: ₹{fast_total:.2f}\n")
-                report_box.insert(tk.END, f"  {'-'*50}\n\n")
-
-            grand_total = regular_total + fast_total
-            report_box.insert(tk.END, f"{'='*60}\n")
-            report_box.insert(tk.END, f"  TOTAL SALES: ₹{grand_total:.2f}\n")
-            report_box.insert(tk.END, f"  (Regular: ₹{regular_total:.2f} | Fast: ₹{fast_total:.2f})\n")
-            report_box.insert(tk.END, f"{'='*60}\n")
+            BackgroundTask.run(popup, lambda: self.billing.daily_sales(date_str),
+                               lambda data: show_report(date_str, *data, began), failed)
+
+        def show_report(date_str, rows, totals, items, began):
+            generate_btn.config(state=tk.NORMAL)
+            report_text, grand_total = format_sales_report(date_str, rows, totals, items)
+            report_box.delete("1.0", tk.END)
+            report_box.insert(tk.END, report_text)
 
             self.last_report_rows = rows
             self.last_report_date = date_str
+            self.last_report_total = grand_total
+            REPORT_SECONDS.observe(time.perf_counter() - began)
 
-        tk.Button(btn_frame, text="Generate Report", command=generate_report,
-                 bg="#4CAF50", fg="white", font=("Arial", 12, "bold"),
-                 padx=15, pady=5).pack(side=tk.LEFT, padx=5)
+        generate_btn = tk.Button(btn_frame, text="Generate Report", command=generate_report,
+                                 bg="#4CAF50", fg="white", font=("Arial", 12, "bold"),
+                                 padx=15, pady=5)
+        generate_btn.pack(side=tk.LEFT, padx=5)
 
         tk.Button(btn_frame, text="Save as PDF", 
-                 command=lambda: ReceiptPrinter.save_sales_report_pdf(self.last_report_date, self.last_report_rows),
+                 command=lambda: ReceiptPrinter.save_sales_report_pdf(
+                     self.last_report_date, self.last_report_rows, self.last_report_total),
                  bg="#FF9800", fg="white", font=("Arial", 12, "bold"),
                  padx=15, pady=5).pack(side=tk.LEFT, padx=5)
 
         tk.Button(btn_frame, text="Print Report", 
-                 command=lambda: ReceiptPrinter.print_sales_report(self.last_report_date, self.last_report_rows),
+                 command=lambda: ReceiptPrinter.print_sales_report(
+                     self.last_report_date, self.last_report_rows, self.last_report_total),
                  bg="#2196F3", fg="white", font=("Arial", 12, "bold"),
                  padx=15, pady=5).pack(side=tk.LEFT, padx=5)
 
+        extra_frame = tk.Frame(popup)
+        extra_frame.pack(pady=(0, 5))
+        tk.Button(extra_frame, text="Search Sales...",
+                 command=lambda: SalesSearchDialog.show(self.root, self.db),
+                 font=("Arial", 10), padx=10).pack(side=tk.LEFT, padx=5)
+        tk.Button(extra_frame, text="Export Sales Data...",
+                 command=lambda: SalesExportDialog.show(self.root, SalesExporter(self.db.db_name)),
+                 font=("Arial", 10), padx=10).pack(side=tk.LEFT, padx=5)
+
         report_box = tk.Text(popup, width=60, height=25)
         report_box.pack(pady=10, fill=tk.BOTH, expand=True)
 
@@ -574,6 +797,14 @@ class ShopApp:
         tk.Button(main_frame, text="Delete Item", command=self.delete_inventory_item,
                  bg="#F32121", fg="white", font=("Arial", 12, "bold"),
                  padx=20, pady=8).place(x=900, y=650)
+
+        tk.Button(main_frame, text="Import Items", command=self.import_inventory,
+                 bg="#FF9800", fg="white", font=("Arial", 12, "bold"),
+                 padx=20, pady=8).place(x=1100, y=650)
+
+        tk.Button(main_frame, text="Stock History", command=self.show_stock_history,
+                 bg="#607D8B", fg="white", font=("Arial", 12, "bold"),
+                 padx=20, pady=8).place(x=1300, y=650)
         
         self.update_inventory_display()
 
@@ -617,7 +848,7 @@ class ShopApp:
 
         def confirm_add():
             item = item_var.get().strip()
-            price = price_var.get()
+            price = to_paise(price_var.get())
             stock = stock_var.get()
             barcode = barcode_var.get().strip() or None
 
@@ -635,6 +866,7 @@ class ShopApp:
 
             self.inventory[item] = {"price": price, "stock": stock, "barcode": barcode}
             self.db.add_inventory_item(item, price, stock, barcode)
+            self.billing.index_item(name=item, barcode=barcode)
             self.update_inventory_display()
             messagebox.showinfo("Success", f"{item} added to inventory!", parent=popup)
             item_var.set("")
@@ -645,6 +877,37 @@ class ShopApp:
         tk.Button(popup, text="Add Item", command=confirm_add, 
                  bg="#4CAF50", fg="white", font=("Arial", 12, "bold")).place(x=200, y=320)
 
+    def import_inventory(self):
+        """Bulk import items from a CSV or Excel catalogue"""
+        filetypes = [("CSV files", "*.csv")]
+        if EXCEL_AVAILABLE:
+            filetypes.insert(0, ("Catalogue files", "*.csv *.xlsx"))
+            filetypes.append(("Excel files", "*.xlsx"))
+        path = filedialog.askopenfilename(filetypes=filetypes, title="Import Inventory")
+        if not path:
+            return
+
+        add_stock = messagebox.askyesno("Import Stock",
+            "Add the file's quantities to existing stock?\n\n"
+            "Yes = add (goods received)\nNo = replace current stock")
+        importer = InventoryImporter(self.db.db_name, add_stock=add_stock)
+
+        def finish(result):
+            self.reload_inventory()
+            self.update_inventory_display()
+            message = f"Imported or updated {result['imported']} items."
+            if result["rejected"]:
+                message += (f"\n\n{result['rejected']} rows were rejected."
+                            f"\nSee: {result['rejects_path']}")
+            messagebox.showinfo("Import Complete", message)
+
+        ProgressDialog.run(
+            self.root, "Import Inventory", "Importing items...",
+            lambda report: importer.run(path, report),
+            on_success=finish,
+            on_error=lambda e: messagebox.showerror("Import Failed", str(e))
+        )
+
     def update_inventory_item(self):
         """Update existing inventory item"""
         popup = tk.Toplevel(self.root)
@@ -710,7 +973,7 @@ class ShopApp:
                 "barcode": self.inventory[item].get("barcode", "")
             })
             name_var.set(current_item["name"])
-            price_var.set(current_item["price"])
+            price_var.set(current_item["price"] / 100)
             stock_var.set(0)
 
         def save_changes():
@@ -720,7 +983,7 @@ class ShopApp:
                 return
 
             new_name = name_var.get().strip()
-            new_price = price_var.get()
+            new_price = to_paise(price_var.get())
             stock_change = stock_var.get()
 
             if new_price < 0:
@@ -734,10 +997,9 @@ class ShopApp:
                 self.inventory[new_name] = self.inventory.pop(item)
                 self.inventory[new_name]["barcode"] = current_item["barcode"]
 
-            cursor = self.db.conn.cursor()
-            cursor.execute("UPDATE inventory SET name=?, price=?, stock=? WHERE name=?",
-                        (new_name, new_price, self.inventory[new_name]["stock"], item))
-            self.db.conn.commit()
+            self.db.edit_inventory_item(item, new_name, new_price, stock_change)
+            if new_name != item:
+                self.billing.index_item(item, new_name, current_item["barcode"])
 
             messagebox.showinfo("Success", 
                 f"'{new_name}' updated successfully!", parent=popup)
@@ -794,6 +1056,7 @@ class ShopApp:
             if confirm:
                 del self.inventory[item_to_delete]
                 self.db.delete_inventory_item(item_to_delete)
+                self.billing.index_item(old_name=item_to_delete)
                 self.update_inventory_display()
                 messagebox.showinfo("Deleted", 
                     f"'{item_to_delete}' has been deleted!", parent=popup)
@@ -803,10 +1066,25 @@ class ShopApp:
         tk.Button(popup, text="Delete Item", command=confirm_delete,
                  bg="#d50000", fg="white", font=("Arial", 12, "bold")).pack(pady=20)
 
+    def show_stock_history(self):
+        """Stock ledger of the item selected in the inventory table"""
+        selection = self.inv_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Select an item in the table first!")
+            return
+        item = self.inv_tree.item(selection[0], "values")[0]
+
+        def on_change(stock):
+            if item in self.inventory:
+                self.inventory[item]["stock"] = stock
+                self.update_inventory_display()
+
+        StockHistoryDialog.show(self.root, self.db, item, on_change)
+
     def update_inventory_display(self):
         """Update inventory table display"""
         self.inv_tree.delete(*self.inv_tree.get_children())
         for item, details in self.inventory.items():
-            self.inv_tree.insert("", "end", values=(item, f"₹{details['price']:.2f}",
+            self.inv_tree.insert("", "end", values=(item, f"₹{rupees(details['price'])}",
                                                    details['stock'], 
                                                    details.get('barcode', '')))
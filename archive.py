@@ -0,0 +1,161 @@
+"""Moves closed years of sales out of the live database for BillSoft"""
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+
+# Rows copied or deleted per transaction, and the pause between deletes
+# that lets checkout writes through
+ARCHIVE_BATCH = 2000
+ARCHIVE_PAUSE = 0.05
+
+# Archive file layout; same columns as the live tables, ids preserved
+ARCHIVE_TABLES = {
+    "sales": ("id", """
+        CREATE TABLE IF NOT EXISTS archive.sales (
+            id INTEGER PRIMARY KEY,
+            item_name TEXT,
+            quantity INTEGER,
+            price INTEGER,
+            total INTEGER,
+            date_time TEXT,
+            billing_type TEXT,
+            bill_no INTEGER,
+            item_id INTEGER
+        );
+    """, ("id", "item_name", "quantity", "price", "total", "date_time", "billing_type",
+          "bill_no", "item_id")),
+    "receipts": ("bill_no", """
+        CREATE TABLE IF NOT EXISTS archive.receipts (
+            bill_no INTEGER PRIMARY KEY,
+            date_time TEXT,
+            total INTEGER,
+            item_count INTEGER,
+            cart_data BLOB,
+            cashier TEXT
+        );
+    """, ("bill_no", "date_time", "total", "item_count", "cart_data", "cashier")),
+}
+
+ARCHIVE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS archive.idx_sales_date_time ON sales(date_time)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_sales_item_id ON sales(item_id, date_time)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_sales_bill_no ON sales(bill_no)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_receipts_date_time ON receipts(date_time)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_receipts_total ON receipts(total)",
+)
+
+
+class SalesArchiver:
+    """Keeps the live database down to the last few years of sales
+
+    Sales lines and bills of every calendar year older than keep_years go
+    to <archive_dir>/sales_<year>.db, written once. A year moves in two
+    phases: its rows are copied into the archive (the live database is
+    only read), then the year is listed in the archives table and its rows
+    are deleted here in small transactions. Reads route a listed year to
+    its archive, so reports never see a year twice or half of one; an
+    interrupted run simply picks up where it stopped.
+    """
+
+    def __init__(self, db, config):
+        self.db = db
+        self.config = config
+        os.makedirs(config["archive_dir"], exist_ok=True)
+
+    def schedule(self, scheduler):
+        """Register the archiving job with an IdleScheduler"""
+        scheduler.add_job("archive", self.is_due, self.run)
+
+    def cutoff(self):
+        """First day kept in the live database"""
+        return f"{datetime.now().year - self.config['keep_years'] + 1:04d}-01-01"
+
+    def is_due(self):
+        if not self.config["enabled"]:
+            return False
+        cutoff = self.cutoff()
+        with self.db.pool.reader() as conn:
+            return any(conn.execute(
+                f"SELECT 1 FROM {table} WHERE date_time < ? LIMIT 1", (cutoff,)).fetchone()
+                for table in ARCHIVE_TABLES)
+
+    def run(self, progress=None):
+        """Archive every closed year still in the live database
+
+        progress(year) is called as each year starts.
+        """
+        conn = sqlite3.connect(self.db.db_name, timeout=30)
+        try:
+            cutoff = self.cutoff()
+            oldest = min((conn.execute(f"SELECT MIN(date_time) FROM {table}").fetchone()[0] or cutoff
+                          for table in ARCHIVE_TABLES))
+            for year in range(int(oldest[:4]), int(cutoff[:4])):
+                if progress:
+                    progress(year)
+                self.archive_year(conn, year)
+        finally:
+            conn.close()
+
+    def archive_year(self, conn, year):
+        path = os.path.join(self.config["archive_dir"], f"sales_{year:04d}.db")
+        start, end = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+        listed = conn.execute("SELECT 1 FROM archives WHERE year = ?", (year,)).fetchone()
+        if not listed and not any(conn.execute(
+                f"SELECT 1 FROM main.{table} WHERE date_time >= ? AND date_time < ? LIMIT 1",
+                (start, end)).fetchone() for table in ARCHIVE_TABLES):
+            return  # Nothing sold that year
+
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            if not listed:
+                for table, (key, create, columns) in ARCHIVE_TABLES.items():
+                    conn.execute(create)
+                    # A file left by an older version may lack newer columns
+                    existing = {row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})")}
+                    for column in columns:
+                        if column not in existing:
+                            conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+                    self._in_chunks(conn, table, key, start, end, f"""
+                        INSERT OR REPLACE INTO archive.{table} ({', '.join(columns)})
+                        SELECT {', '.join(columns)} FROM main.{table}
+                        WHERE {key} BETWEEN ? AND ? AND date_time >= ? AND date_time < ?
+                    """)
+                for sql in ARCHIVE_INDEXES:
+                    conn.execute(sql)
+                with conn:
+                    conn.execute("""
+                        INSERT INTO archives (year, file, sales_rows, receipt_rows,
+                                              first_bill, last_bill, archived_at)
+                        SELECT ?, ?, (SELECT COUNT(*) FROM archive.sales),
+                               COUNT(*), MIN(bill_no), MAX(bill_no), ?
+                        FROM archive.receipts
+                    """, (year, path, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+            # From here on the year is read from its archive
+            for table, (key, _, _) in ARCHIVE_TABLES.items():
+                self._in_chunks(conn, table, key, start, end, f"""
+                    DELETE FROM main.{table}
+                    WHERE {key} BETWEEN ? AND ? AND date_time >= ? AND date_time < ?
+                """, pause=ARCHIVE_PAUSE)
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+    @staticmethod
+    def _in_chunks(conn, table, key, start, end, sql, pause=0):
+        """Run sql over the year's key range, ARCHIVE_BATCH keys per transaction"""
+        # Keys and timestamps are both assigned at checkout, so the first and
+        # last row of the year bound its key range
+        first = conn.execute(
+            f"SELECT {key} FROM main.{table} WHERE date_time >= ? ORDER BY date_time LIMIT 1",
+            (start,)).fetchone()
+        last = conn.execute(
+            f"SELECT {key} FROM main.{table} WHERE date_time < ? ORDER BY date_time DESC LIMIT 1",
+            (end,)).fetchone()
+        if not first or not last:
+            return
+        for low in range(first[0], last[0] + 1, ARCHIVE_BATCH):
+            with conn:
+                conn.execute(sql, (low, low + ARCHIVE_BATCH - 1, start, end))
+            time.sleep(pause)
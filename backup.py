@@ -0,0 +1,298 @@
+"""Scheduled full and incremental backups for BillSoft"""
+import base64
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database import TRACKED_TABLES, _rebuild_rollup_days, _rollup_mismatches
+
+
+MANIFEST_FILE = "manifest.json"
+ROW_FETCH_CHUNK = 500
+
+
+def _encode_value(value):
+    if isinstance(value, bytes):
+        return {"$b": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$b" in value:
+        return base64.b64decode(value["$b"])
+    return value
+
+
+def _current_seq(conn):
+    """Highest change_log sequence number ever handed out"""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name='change_log'").fetchone()
+    return row[0] if row else 0
+
+
+class BackupManager:
+    """Periodic full snapshots plus incremental change sets
+
+    A full snapshot is an online backup of the database and starts a new
+    chain. Incrementals store only the rows named in change_log since the
+    previous backup point, as gzip'd JSON lines, so most days write a small
+    fraction of the database. Any point can be restored by replaying its
+    chain onto the snapshot it is based on.
+    """
+
+    def __init__(self, db, config):
+        self.db = db
+        self.config = config
+        self.backup_dir = config["backup_dir"]
+        self.lock = threading.Lock()
+        os.makedirs(self.backup_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    # ==================== Manifest ====================
+    def _manifest_path(self):
+        return os.path.join(self.backup_dir, MANIFEST_FILE)
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return {"points": []}
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading backup manifest: {e}")
+            return {"points": []}
+
+    def _save_manifest(self):
+        path = self._manifest_path()
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _add_point(self, point):
+        with self.lock:
+            self.manifest["points"].append(point)
+            self._apply_retention()
+            self._save_manifest()
+
+    def _apply_retention(self):
+        """Drop the oldest chains beyond keep_full, with their incrementals"""
+        points = self.manifest["points"]
+        bases = [p["file"] for p in points if p["kind"] == "full"]
+        expired = set(bases[:max(0, len(bases) - self.config["keep_full"])])
+        if not expired:
+            return
+        for point in points:
+            if point["base"] in expired:
+                path = os.path.join(self.backup_dir, point["file"])
+                if os.path.exists(path):
+                    os.remove(path)
+        self.manifest["points"] = [p for p in points if p["base"] not in expired]
+
+    def points(self):
+        """Backup points, oldest first"""
+        with self.lock:
+            return list(self.manifest["points"])
+
+    # ==================== Scheduling ====================
+    def schedule(self, scheduler):
+        """Register the periodic backup job with an IdleScheduler"""
+        scheduler.add_job("backup", self.is_due, self.run_scheduled)
+
+    def _full_due(self):
+        fulls = [p for p in self.manifest["points"] if p["kind"] == "full"]
+        if not fulls:
+            return True
+        return time.time() - fulls[-1]["time"] >= self.config["full_interval_hours"] * 3600
+
+    def is_due(self):
+        if not self.config["enabled"]:
+            return False
+        if self._full_due():
+            return True
+        last = self.manifest["points"][-1]
+        return time.time() - last["time"] >= self.config["incremental_interval_minutes"] * 60
+
+    def run_scheduled(self):
+        if self._full_due():
+            self.take_full()
+        else:
+            self.take_incremental()
+
+    # ==================== Backups ====================
+    def take_full(self):
+        """Snapshot the whole database and start a new chain"""
+        created = datetime.now()
+        name = f"full_{created.strftime('%Y%m%d_%H%M%S')}.db"
+        path = os.path.join(self.backup_dir, name)
+
+        conn = sqlite3.connect(self.db.db_name)
+        try:
+            # Tag the live database so incrementals can tell it still matches this chain
+            conn.execute("INSERT OR REPLACE INTO backup_state (key, value) VALUES ('chain', ?)",
+                         (name,))
+            conn.commit()
+
+            self.db.online_backup(path)
+
+            snapshot = sqlite3.connect(path)
+            try:
+                seq = _current_seq(snapshot)
+                snapshot.execute("DELETE FROM change_log")
+                snapshot.commit()
+            finally:
+                snapshot.close()
+
+            conn.execute("DELETE FROM change_log WHERE seq <= ?", (seq,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._add_point({
+            "file": name, "kind": "full", "base": name, "seq": seq,
+            "time": created.timestamp(), "created": created.strftime('%Y-%m-%d %H:%M:%S'),
+            "size": os.path.getsize(path)
+        })
+        return name
+
+    def take_incremental(self):
+        """Write the rows changed since the last backup point
+
+        Falls back to a full snapshot when there is no chain yet or the
+        live database no longer matches it (for example after a restore).
+        Returns None when nothing changed.
+        """
+        points = self.points()
+        if not points:
+            return self.take_full()
+        last = points[-1]
+
+        created = datetime.now()
+        name = f"incr_{created.strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        path = os.path.join(self.backup_dir, name)
+
+        conn = sqlite3.connect(self.db.db_name, isolation_level=None)
+        try:
+            # One read snapshot for both the change list and the row data
+            conn.execute("BEGIN")
+            chain = conn.execute("SELECT value FROM backup_state WHERE key='chain'").fetchone()
+            seq = _current_seq(conn)
+            if not chain or chain[0] != last["base"] or seq < last["seq"]:
+                conn.execute("COMMIT")
+                conn.close()
+                return self.take_full()
+            if seq == last["seq"]:
+                conn.execute("COMMIT")
+                return None
+
+            latest = {}
+            for table, row_id, op in conn.execute(
+                    "SELECT table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq",
+                    (last["seq"],)):
+                latest[(table, row_id)] = op
+
+            with gzip.open(path + ".part", "wt", encoding="utf-8") as f:
+                f.write(json.dumps({"base": last["base"], "from_seq": last["seq"],
+                                    "to_seq": seq}) + "\n")
+                for table in TRACKED_TABLES:
+                    deletes = [rid for (t, rid), op in latest.items() if t == table and op == "D"]
+                    upserts = [rid for (t, rid), op in latest.items() if t == table and op == "U"]
+                    for rid in deletes:
+                        f.write(json.dumps({"t": table, "op": "D", "id": rid}) + "\n")
+                    for i in range(0, len(upserts), ROW_FETCH_CHUNK):
+                        chunk = upserts[i:i + ROW_FETCH_CHUNK]
+                        cursor = conn.execute(
+                            f"SELECT rowid, * FROM {table} WHERE rowid IN ({','.join('?' * len(chunk))})",
+                            chunk)
+                        columns = [d[0] for d in cursor.description[1:]]
+                        for row in cursor:
+                            f.write(json.dumps({
+                                "t": table, "op": "U", "id": row[0], "cols": columns,
+                                "v": [_encode_value(v) for v in row[1:]]
+                            }) + "\n")
+            conn.execute("COMMIT")
+            os.replace(path + ".part", path)
+
+            conn.execute("DELETE FROM change_log WHERE seq <= ?", (seq,))
+        finally:
+            conn.close()
+
+        self._add_point({
+            "file": name, "kind": "incremental", "base": last["base"], "seq": seq,
+            "time": created.timestamp(), "created": created.strftime('%Y-%m-%d %H:%M:%S'),
+            "size": os.path.getsize(path)
+        })
+        return name
+
+    # ==================== Restore ====================
+    def materialize(self, point, progress=None):
+        """Rebuild the database as of point into a standalone file
+
+        Copies the chain's full snapshot and replays its incrementals up to
+        and including point, then recounts the item sales rollup for the
+        days replayed and checks it against the sales lines.
+        progress(done, total) is called per file. Returns the path of the
+        rebuilt database.
+        """
+        points = self.points()
+        index = next(i for i, p in enumerate(points) if p["file"] == point["file"])
+        chain = [p for p in points[:index + 1] if p["base"] == point["base"]]
+
+        restored_path = os.path.join(self.backup_dir, "restore_point.db")
+        shutil.copy(os.path.join(self.backup_dir, point["base"]), restored_path)
+
+        conn = sqlite3.connect(restored_path)
+        try:
+            # Replayed rows already carry what triggers derived from them
+            # (item links, stock movements); only the full-text index
+            # triggers may run, and REPLACE must fire their delete side so
+            # the index drops the old version of a replayed row. The item
+            # sales rollup is not backed up; its days are recounted after
+            triggers = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name NOT LIKE '%fts%'"
+            ).fetchall()
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.execute("PRAGMA recursive_triggers = ON")
+            # Days of replayed sales lines, recounted in the rollup afterwards
+            sale_days = set()
+            for done, incremental in enumerate(chain[1:], start=1):
+                with gzip.open(os.path.join(self.backup_dir, incremental["file"]),
+                               "rt", encoding="utf-8") as f:
+                    next(f)  # Header
+                    for line in f:
+                        change = json.loads(line)
+                        if change["op"] == "D":
+                            conn.execute(f"DELETE FROM {change['t']} WHERE rowid=?",
+                                         (change["id"],))
+                        else:
+                            if change["t"] == "sales" and "date_time" in change["cols"]:
+                                date_time = change["v"][change["cols"].index("date_time")]
+                                if date_time:
+                                    sale_days.add(date_time[:10])
+                            columns = ", ".join(change["cols"])
+                            marks = ", ".join("?" * (len(change["cols"]) + 1))
+                            conn.execute(
+                                f"INSERT OR REPLACE INTO {change['t']} (rowid, {columns}) VALUES ({marks})",
+                                [change["id"]] + [_decode_value(v) for v in change["v"]])
+                if progress:
+                    progress(done, len(chain) - 1)
+            for _, sql in triggers:
+                conn.execute(sql)
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'item_daily_sales'").fetchone():
+                _rebuild_rollup_days(conn, sale_days)
+                mismatched = _rollup_mismatches(conn)
+                if mismatched:
+                    raise sqlite3.DatabaseError(
+                        f"Restored sales rollup does not match its sales lines on {', '.join(mismatched[:5])}")
+            conn.execute("DELETE FROM change_log")
+            conn.execute("DROP TABLE IF EXISTS backup_state")
+            conn.commit()
+        finally:
+            conn.close()
+        return restored_path
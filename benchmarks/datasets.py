@@ -0,0 +1,151 @@
+"""Fixed synthetic datasets for the BillSoft benchmarks
+
+Everything is generated from a seeded random.Random, so every run (and
+every machine) benchmarks exactly the same carts, inventories and sales.
+Database files are built once and cached in the temp folder.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+from database import DatabaseManager
+
+
+SEED = 2024
+
+# Cart lines: a counter customer and a wholesale order
+SMALL_CART_LINES = 5
+WHOLESALE_CART_LINES = 500
+
+# Sale lines in one day's report
+SALES_SIZES = (10_000, 100_000, 1_000_000)
+
+# Items in the inventory table
+INVENTORY_SIZES = (5_000, 50_000)
+
+REPORT_DATE = "2024-03-15"
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "billsoft_bench")
+
+_WORDS = ("Basmati", "Rice", "Toor", "Dal", "Sugar", "Atta", "Sunflower", "Oil", "Tea",
+          "Coffee", "Soap", "Shampoo", "Biscuit", "Salt", "Masala", "Ghee", "Paneer",
+          "Milk", "Curd", "Namkeen", "Detergent", "Toothpaste", "Jaggery", "Poha")
+_PACKS = ("100g", "250g", "500g", "1kg", "5kg", "200ml", "500ml", "1L", "Pack of 4")
+
+
+def item_names(count, seed=SEED):
+    """count distinct, realistic-looking item names"""
+    rng = random.Random(seed)
+    names = []
+    for number in range(count):
+        words = rng.sample(_WORDS, rng.randint(1, 3))
+        names.append(f"{' '.join(words)} {rng.choice(_PACKS)} #{number}")
+    return names
+
+
+def cart(lines, seed=SEED):
+    """A cart as checkout builds it, with about one line in ten fast-billed"""
+    rng = random.Random(seed + lines)
+    names = item_names(max(lines, 50), seed)
+    return [{"item": rng.choice(names), "qty": rng.randint(1, 24),
+             "price": rng.randint(500, 250_000),
+             "billing_type": "FAST" if rng.random() < 0.1 else "REGULAR"}
+            for _ in range(lines)]
+
+
+def cart_total(cart_data):
+    return sum(entry["qty"] * entry["price"] for entry in cart_data)
+
+
+def sales_rows(count, seed=SEED):
+    """One day's fetch_sales() rows, ordered as the query returns them"""
+    rng = random.Random(seed + count)
+    names = item_names(2_000, seed)
+    start = datetime.strptime(REPORT_DATE, "%Y-%m-%d") + timedelta(hours=8)
+    rows = []
+    for line in range(count):
+        qty = rng.randint(1, 12)
+        price = rng.randint(500, 150_000)
+        dt = (start + timedelta(seconds=line * 50_000 // count)).strftime("%Y-%m-%d %H:%M:%S")
+        rows.append((rng.choice(names), qty, price, qty * price, dt,
+                     "FAST" if rng.random() < 0.1 else "REGULAR"))
+    rows.sort(key=lambda row: (row[5], row[4]))
+    return rows
+
+
+def sales_totals(rows):
+    totals = {}
+    for _, _, _, total, _, billing_type in rows:
+        totals[billing_type] = totals.get(billing_type, 0) + total
+    return totals
+
+
+def item_summary(rows):
+    summary = {}
+    for name, qty, _, total, _, _ in rows:
+        entry = summary.setdefault(name, [0, 0])
+        entry[0] += qty
+        entry[1] += total
+    return sorted(((name, qty, total) for name, (qty, total) in summary.items()),
+                  key=lambda row: row[2], reverse=True)
+
+
+def _cached_db(name, build):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, name)
+    if not os.path.exists(path):
+        building = path + ".building"
+        for leftover in (building, building + "-wal", building + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        db = DatabaseManager(building)
+        build(db)
+        db.pool.close()
+        os.replace(building, path)
+    return DatabaseManager(path)
+
+
+def inventory_db(count):
+    """DatabaseManager over an inventory of count items"""
+    def build(db):
+        rng = random.Random(SEED + count)
+        with db.pool.writer() as conn:
+            conn.executemany(
+                "INSERT INTO inventory (name, price, stock, barcode) VALUES (?, ?, ?, ?)",
+                [(name, rng.randint(500, 250_000), rng.randint(0, 500), f"89{number:011d}")
+                 for number, name in enumerate(item_names(count))])
+    return _cached_db(f"inventory_{count}.db", build)
+
+
+def sales_db(count):
+    """DatabaseManager holding count sale lines on REPORT_DATE, in bills of 10 lines"""
+    def build(db):
+        rows = sales_rows(count)
+        with db.pool.writer() as conn:
+            conn.executemany("INSERT OR IGNORE INTO item_names (name) VALUES (?)",
+                             [(name,) for name in {row[0] for row in rows}])
+            for first in range(0, count, 10):
+                bill = rows[first:first + 10]
+                bill_no = conn.execute(
+                    "INSERT INTO receipts (date_time, total, item_count, cart_data) VALUES (?, ?, ?, ?)",
+                    (bill[0][4], sum(row[3] for row in bill), len(bill), b"")).lastrowid
+                conn.executemany(
+                    "INSERT INTO sales (item_id, quantity, price, total, date_time, billing_type, bill_no) "
+                    "VALUES ((SELECT id FROM item_names WHERE name = ?), ?, ?, ?, ?, ?, ?)",
+                    [row + (bill_no,) for row in bill])
+    return _cached_db(f"sales_{count}.db", build)
+
+
+def scratch_copy(db, name):
+    """Fresh copy of a cached database for benchmarks that write to it; returns its path"""
+    path = os.path.join(CACHE_DIR, f"scratch_{name}.db")
+    for leftover in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    target = sqlite3.connect(path)
+    with db.pool.reader() as conn:
+        conn.backup(target)
+    target.close()
+    return path
@@ -0,0 +1,241 @@
+"""Build realistic BillSoft databases for scale testing
+
+    python benchmarks/generate.py --out shop              a shop: 2k SKUs, 3 years, 1M lines
+    python benchmarks/generate.py --out chain --skus 50000 --years 5 --lines 10000000
+
+Writes <out>/Data.db and <out>/users.db with the current schema. Sales
+follow the calendar: a yearly season (peaking in --peak-month), busier
+weekends, popular items selling far more than the long tail, and a
+share of fast-billed loose items. Generation is seeded, so the same
+options always give the same files.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import datasets  # noqa: E402
+from database import DatabaseManager, AuthDB, _restart_backup_chain, _roll_up_lines  # noqa: E402
+
+
+BARCODE_FORMATS = ("ean13", "upc", "code128", "none")
+PRICE_DISTRIBUTIONS = ("lognormal", "uniform")
+
+# Bills are written in transactions of this many sale lines
+CHUNK_LINES = 200_000
+
+# Shop hours; bills are spread between opening and closing
+OPEN_HOUR, CLOSE_HOUR = 9, 21
+
+# Relative traffic per weekday, Monday first
+WEEKDAY_TRAFFIC = (0.9, 0.85, 0.9, 0.95, 1.05, 1.3, 1.2)
+
+_LOOSE_ITEMS = ("Loose Sugar", "Loose Rice", "Loose Dal", "Carry Bag", "Eggs", "Bread",
+                "Vegetables", "Fruits", "Flowers", "Misc")
+
+
+def _check_digit(digits):
+    """GS1 check digit (EAN-13, UPC-A) of the digits before it"""
+    total = sum(int(d) * (3 if position % 2 == 0 else 1)
+                for position, d in enumerate(reversed(digits)))
+    return str(-total % 10)
+
+
+def barcode(number, fmt):
+    """Barcode of the number'th SKU in the given format, or None"""
+    if fmt == "ean13":
+        body = f"890{number:09d}"  # 890: GS1 India
+    elif fmt == "upc":
+        body = f"0{number:010d}"
+    elif fmt == "code128":
+        return f"SKU-{number:06d}"
+    else:
+        return None
+    return body + _check_digit(body)
+
+
+def price(rng, options):
+    """Shelf price in paise, ending in a whole rupee or 50 paise"""
+    if options.prices == "uniform":
+        rupees = rng.uniform(options.price_min, options.price_max)
+    else:
+        rupees = rng.lognormvariate(math.log(options.price_median), options.price_spread)
+        rupees = min(max(rupees, options.price_min), options.price_max)
+    return max(50, round(rupees * 2) * 50)
+
+
+def day_weights(days, options):
+    """Relative traffic of each day: yearly season times weekday pattern"""
+    weights = []
+    for day in days:
+        # Cosine season: 1 + amplitude in the peak month, 1 - amplitude six months later
+        phase = 2 * math.pi * ((day.timetuple().tm_yday - 15) / 365.25 - (options.peak_month - 1) / 12)
+        weights.append((1 + options.seasonality * math.cos(phase)) * WEEKDAY_TRAFFIC[day.weekday()])
+    return weights
+
+
+def build_users(path, options):
+    users = AuthDB(path)
+    created = sum(users.signup(f"cashier{number:02d}", options.password)
+                  for number in range(1, options.users + 1))
+    users.conn.close()
+    return created
+
+
+def build_inventory(db, rng, options):
+    """Insert the SKUs; returns [(item_id, name, price)] in popularity order and the loose items"""
+    names = datasets.item_names(options.skus, options.seed)
+    rows = [(name, price(rng, options), rng.randint(0, 500), barcode(number, options.barcode))
+            for number, name in enumerate(names)]
+    with db.pool.writer() as conn:
+        conn.executemany("INSERT INTO inventory (name, price, stock, barcode) VALUES (?, ?, ?, ?)", rows)
+        conn.executemany("INSERT OR IGNORE INTO item_names (name) VALUES (?)",
+                         [(name,) for name in _LOOSE_ITEMS])
+        ids = dict(conn.execute("SELECT name, id FROM item_names"))
+    skus = [(ids[name], name, shelf_price) for name, shelf_price, _, _ in rows]
+    rng.shuffle(skus)
+    loose = [(ids[name], name) for name in _LOOSE_ITEMS]
+    return skus, loose
+
+
+def _drop_bulk_overheads(conn):
+    """Drop indexes, change-log and rollup triggers on sales and receipts; returns their SQL"""
+    saved = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name IN ('sales', 'receipts') AND sql IS NOT NULL
+          AND (type = 'index' OR name = 'sales_item_rollup'
+               OR (type = 'trigger' AND name LIKE '%\\_log' ESCAPE '\\'))
+    """).fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in saved]
+
+
+def build_sales(db, rng, skus, loose, options, report):
+    """Write options.lines sale lines across options.years, in bills"""
+    last_day = date.fromisoformat(options.end) if options.end else date.today() - timedelta(days=1)
+    days = [last_day - timedelta(days=offset) for offset in range(round(options.years * 365.25) - 1, -1, -1)]
+    weights = day_weights(days, options)
+    lines_per_day = options.lines / sum(weights)
+    # Zipf-like popularity: the SKU at rank r sells in proportion to 1 / r^skew
+    popularity, running = [], 0.0
+    for rank in range(1, len(skus) + 1):
+        running += rank ** -options.skew
+        popularity.append(running)
+    open_seconds = (CLOSE_HOUR - OPEN_HOUR) * 3600
+
+    conn = db.pool.conn
+    # Nothing to lose if the build dies half way, so skip the fsyncs
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA synchronous=OFF")
+    with db.pool.writer():
+        restore = _drop_bulk_overheads(conn)
+    bill_no = (conn.execute("SELECT MAX(bill_no) FROM receipts").fetchone()[0] or 0)
+    receipts, sales, written, carry = [], [], 0, 0.0
+    for day, weight in zip(days, weights):
+        carry += lines_per_day * weight
+        day_lines = int(carry)
+        carry -= day_lines
+        opening = datetime(day.year, day.month, day.day, OPEN_HOUR)
+        bills = []
+        while day_lines > 0:
+            size = min(day_lines, 1 + int(rng.expovariate(1 / (options.lines_per_bill - 1))))
+            bills.append(size)
+            day_lines -= size
+        times = sorted(rng.randrange(open_seconds) for _ in bills)
+        for size, second in zip(bills, times):
+            bill_no += 1
+            stamp = (opening + timedelta(seconds=second)).strftime("%Y-%m-%d %H:%M:%S")
+            cart = []
+            for item_id, name, shelf_price in rng.choices(skus, cum_weights=popularity, k=size):
+                qty = 1 if rng.random() < 0.7 else rng.randint(2, 6)
+                if rng.random() < options.fast_share:
+                    (item_id, name), shelf_price = rng.choice(loose), rng.randint(1, 40) * 1000
+                    kind = "FAST"
+                else:
+                    kind = "REGULAR"
+                cart.append({"item": name, "qty": qty, "price": shelf_price, "billing_type": kind})
+                sales.append((item_id, qty, shelf_price, qty * shelf_price, stamp, kind, bill_no))
+            receipts.append((bill_no, stamp, sum(entry["qty"] * entry["price"] for entry in cart), size,
+                             DatabaseManager.pack_cart(cart)))
+        if len(sales) >= CHUNK_LINES or day == days[-1]:
+            with db.pool.writer():
+                conn.executemany("INSERT INTO receipts (bill_no, date_time, total, item_count, cart_data) "
+                                 "VALUES (?, ?, ?, ?, ?)", receipts)
+                conn.executemany("INSERT INTO sales (item_id, quantity, price, total, date_time, "
+                                 "billing_type, bill_no) VALUES (?, ?, ?, ?, ?, ?, ?)", sales)
+            written += len(sales)
+            receipts, sales = [], []
+            report(f"{day}: {written:,} lines")
+
+    report("Rebuilding indexes")
+    with db.pool.writer():
+        for sql in restore:
+            conn.execute(sql)
+        # The rollup trigger was dropped; total the new lines in one pass
+        _roll_up_lines(conn, 1, conn.execute("SELECT MAX(id) FROM sales").fetchone()[0] or 0)
+        _restart_backup_chain(conn)
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build synthetic BillSoft databases")
+    parser.add_argument("--out", required=True, help="folder for Data.db and users.db (must not hold them yet)")
+    parser.add_argument("--skus", type=int, default=2_000, help="inventory items (default 2000)")
+    parser.add_argument("--barcode", choices=BARCODE_FORMATS, default="ean13", help="barcode format")
+    parser.add_argument("--prices", choices=PRICE_DISTRIBUTIONS, default="lognormal",
+                        help="shelf price distribution")
+    parser.add_argument("--price-median", type=float, default=120, help="median price in rupees (lognormal)")
+    parser.add_argument("--price-spread", type=float, default=0.9, help="sigma of log price (lognormal)")
+    parser.add_argument("--price-min", type=float, default=5, help="lowest price in rupees")
+    parser.add_argument("--price-max", type=float, default=5_000, help="highest price in rupees")
+    parser.add_argument("--years", type=float, default=3, help="years of sales history")
+    parser.add_argument("--end", help="last day of sales, YYYY-MM-DD (default yesterday)")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="sale lines in total")
+    parser.add_argument("--lines-per-bill", type=float, default=4, help="mean lines per bill")
+    parser.add_argument("--seasonality", type=float, default=0.3,
+                        help="traffic swing over the year, 0 for none (default 0.3)")
+    parser.add_argument("--peak-month", type=int, default=10, help="busiest month (default 10, Diwali)")
+    parser.add_argument("--skew", type=float, default=1.0, help="popularity skew, 0 for every SKU alike")
+    parser.add_argument("--fast-share", type=float, default=0.1, help="share of lines fast-billed")
+    parser.add_argument("--users", type=int, default=3, help="cashier accounts in users.db")
+    parser.add_argument("--password", default="billsoft", help="password of every cashier account")
+    parser.add_argument("--seed", type=int, default=datasets.SEED)
+    options = parser.parse_args(argv)
+    if options.lines_per_bill <= 1:
+        parser.error("--lines-per-bill must be more than 1")
+    if not 1 <= options.peak_month <= 12:
+        parser.error("--peak-month must be 1-12")
+
+    data_path = os.path.join(options.out, "Data.db")
+    users_path = os.path.join(options.out, "users.db")
+    for path in (data_path, users_path):
+        if os.path.exists(path):
+            parser.error(f"{path} already exists")
+    os.makedirs(options.out, exist_ok=True)
+
+    began = time.perf_counter()
+
+    def report(message):
+        print(f"[{time.perf_counter() - began:7.1f}s] {message}")
+
+    rng = random.Random(options.seed)
+    report(f"{build_users(users_path, options)} users in {users_path}")
+    db = DatabaseManager(data_path)
+    skus, loose = build_inventory(db, rng, options)
+    report(f"{len(skus):,} items")
+    written = build_sales(db, rng, skus, loose, options, report)
+    db.pool.close()
+    report(f"Done: {written:,} sale lines in {data_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
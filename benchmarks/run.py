@@ -0,0 +1,218 @@
+"""Benchmark regression suite for BillSoft's hot paths
+
+    python benchmarks/run.py                    compare against baseline.json
+    python benchmarks/run.py --update-baseline  record new baselines
+    python benchmarks/run.py --only receipt     run benchmarks whose name contains "receipt"
+    python benchmarks/run.py --full             include the 1M-line reports
+
+Times are divided by a fixed pure-Python calibration loop, timed in
+samples interleaved with the benchmark's, so a baseline recorded on one
+PC still means something on another and a busy spell slows both alike. A benchmark fails when its score is more than --threshold times
+its baseline; the exit status is 1 if any fails.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import datasets  # noqa: E402
+from headless import HeadlessTill  # noqa: E402
+from printing import ReceiptPrinter  # noqa: E402
+from utils import format_enhanced_receipt, format_sales_report, inventory_cache  # noqa: E402
+
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Allowed slowdown against the baseline before a benchmark fails
+DEFAULT_THRESHOLD = 1.25
+
+# Each timing sample runs the benchmark for at least this long
+MIN_SAMPLE_SECONDS = 0.2
+
+
+def _receipt_text(lines):
+    cart = datasets.cart(lines)
+    total = datasets.cart_total(cart)
+    return lambda: format_enhanced_receipt(cart, total)
+
+
+def _thermal_bytes(lines):
+    cart = datasets.cart(lines)
+    total = datasets.cart_total(cart)
+    return lambda: ReceiptPrinter.thermal_receipt_bytes(cart, total)
+
+
+def _inventory_load(count):
+    db = datasets.inventory_db(count)
+    return lambda: inventory_cache(db.fetch_inventory())
+
+
+def _report_text(count):
+    rows = datasets.sales_rows(count)
+    totals = datasets.sales_totals(rows)
+    items = datasets.item_summary(rows)
+    return lambda: format_sales_report(datasets.REPORT_DATE, rows, totals, items)
+
+
+def _report_queries(count):
+    db = datasets.sales_db(count)
+    date = datasets.REPORT_DATE
+    return lambda: (db.fetch_sales(date), db.sales_totals(date), db.item_sales_summary(date))
+
+
+def _till_flow(lines, journal=False):
+    """Scan a cart by barcode, check it out and render its receipt, as a cashier would"""
+    name = f"till_{lines}{'_journal' if journal else ''}"
+    till = HeadlessTill(datasets.scratch_copy(datasets.inventory_db(datasets.INVENTORY_SIZES[0]), name),
+                        os.path.join(datasets.CACHE_DIR, f"{name}.journal") if journal else None)
+    # The scratch copy is thrown away; without fsyncs on commit the flow
+    # measures BillSoft's work rather than the disk
+    till.db.pool.conn.execute("PRAGMA synchronous=OFF")
+    codes = [entry["barcode"] for entry in till.billing.inventory.values()][:lines]
+
+    def flow():
+        for code in codes:
+            till.scan(code)
+        till.checkout()
+    return flow
+
+
+# (name, setup returning the function to time, only with --full)
+BENCHMARKS = [
+    ("receipt_text_small", lambda: _receipt_text(datasets.SMALL_CART_LINES), False),
+    ("receipt_text_wholesale", lambda: _receipt_text(datasets.WHOLESALE_CART_LINES), False),
+    ("thermal_bytes_small", lambda: _thermal_bytes(datasets.SMALL_CART_LINES), False),
+    ("thermal_bytes_wholesale", lambda: _thermal_bytes(datasets.WHOLESALE_CART_LINES), False),
+]
+BENCHMARKS += [
+    ("till_flow_small", lambda: _till_flow(datasets.SMALL_CART_LINES), False),
+    ("till_flow_wholesale", lambda: _till_flow(datasets.WHOLESALE_CART_LINES), False),
+    ("till_flow_wholesale_journal", lambda: _till_flow(datasets.WHOLESALE_CART_LINES, True), False),
+]
+BENCHMARKS += [(f"inventory_load_{count // 1000}k", lambda count=count: _inventory_load(count), False)
+               for count in datasets.INVENTORY_SIZES]
+BENCHMARKS += [(f"report_text_{count // 1000}k", lambda count=count: _report_text(count),
+                count >= 1_000_000)
+               for count in datasets.SALES_SIZES]
+BENCHMARKS += [(f"report_queries_{count // 1000}k", lambda count=count: _report_queries(count),
+                count >= 1_000_000)
+               for count in datasets.SALES_SIZES]
+
+
+def calibration_loop():
+    """Fixed mix of the work the benchmarks do: formatting, dicts and list building"""
+    parts = []
+    table = {}
+    for number in range(20_000):
+        table[number % 997] = table.get(number % 997, 0) + number
+        parts.append(f"{number:>8} {number * 7 % 1000:>5}")
+    return len("".join(parts))
+
+
+def measure(func, repeat):
+    """Best seconds per call of func and of the calibration loop, sampled alternately
+
+    The garbage collector is off while timing, as in timeit, so a large
+    dataset left on the heap does not bill its collections to the benchmark.
+    """
+    func()  # warm caches and the page cache
+    gc.collect()
+    gc.disable()
+    try:
+        numbers = [_calls_per_sample(calibration_loop), _calls_per_sample(func)]
+        best = [float("inf"), float("inf")]
+        for _ in range(repeat):
+            for slot, timed in enumerate((calibration_loop, func)):
+                best[slot] = min(best[slot], _sample(timed, numbers[slot]))
+        return best[1], best[0]
+    finally:
+        gc.enable()
+
+
+def _calls_per_sample(func):
+    """Calls needed for one sample to last MIN_SAMPLE_SECONDS"""
+    number = 1
+    while _sample(func, number) * number < MIN_SAMPLE_SECONDS:
+        number *= 2
+    return number
+
+
+def _sample(func, number):
+    """Seconds per call over number calls"""
+    began = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - began) / number
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, "r") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BillSoft benchmark regression suite")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run's scores as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed score / baseline ratio (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--full", action="store_true", help="include the largest datasets")
+    parser.add_argument("--repeat", type=int, default=3, help="timing samples per benchmark and round")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the suite; each score is the median")
+    args = parser.parse_args(argv)
+
+    selected = [(name, setup) for name, setup, full_only in BENCHMARKS
+                if (args.full or not full_only) and (not args.only or args.only in name)]
+    if not selected:
+        print("No benchmarks selected")
+        return 1
+
+    baseline = load_baseline()
+    scores = {}
+    failed = []
+    print(f"{'BENCHMARK':<26} {'TIME':>11} {'SCORE':>9} {'BASELINE':>9} {'RATIO':>6}")
+    funcs = {name: setup() for name, setup in selected}
+    # Whole passes rather than back-to-back rounds, so a slow spell lands
+    # on one sample of several benchmarks instead of every sample of one
+    samples = {name: [] for name in funcs}
+    for _ in range(max(args.rounds, 1)):
+        for name, func in funcs.items():
+            samples[name].append(measure(func, args.repeat))
+    for name in funcs:
+        seconds, unit = sorted(samples[name], key=lambda pair: pair[0] / pair[1])[len(samples[name]) // 2]
+        scores[name] = score = seconds / unit
+        line = f"{name:<26} {seconds * 1000:>8.2f} ms {score:>9.4g}"
+        if name in baseline:
+            ratio = score / baseline[name]
+            status = "FAIL" if ratio > args.threshold else "ok"
+            if status == "FAIL":
+                failed.append(name)
+            line += f" {baseline[name]:>9.4g} {ratio:>6.2f} {status}"
+        else:
+            line += f" {'-':>9} {'-':>6} new"
+        print(line)
+
+    if args.update_baseline:
+        baseline.update(scores)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {BASELINE_FILE}")
+        return 0
+    if failed:
+        print(f"{len(failed)} benchmark(s) slower than {args.threshold:g}x baseline: {', '.join(failed)}")
+        return 1
+    print("All benchmarks within threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
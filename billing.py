@@ -0,0 +1,215 @@
+"""Till operations for BillSoft, without any UI
+
+ShopApp's screens and the headless driver (headless.py) both call these,
+so a scripted flow runs the same lookup, cart, checkout and report code
+as a cashier at the till.
+"""
+import threading
+from datetime import datetime
+
+from metrics import CHECKOUT_SECONDS, BILL_LINES, BILLS
+from search import ItemSearchIndex
+from utils import inventory_cache
+
+
+class BillingEngine:
+    """Inventory cache, item lookup, cart and checkout for one till"""
+
+    def __init__(self, db, terminal="1", journal=None, cashier=None):
+        self.db = db
+        self.terminal = terminal
+        # Username bills are put down to; changes when cashiers switch at the till
+        self.cashier = cashier
+        # Optional CartJournal; every cart change is logged to it
+        self.journal = journal
+        self.inventory = {}
+        self.search_index = ItemSearchIndex()
+        self.index_lock = threading.Lock()
+        self.index_edits = None
+        self.cart = []
+
+    # ==================== Inventory ====================
+    def reload_inventory(self):
+        """Rebuild the in-memory inventory cache from the database"""
+        self.inventory = inventory_cache(self.db.fetch_inventory())
+
+    def rebuild_search_index(self):
+        """Index the inventory for item suggestions on a background thread
+
+        A large catalogue takes a second or two to index. Until the new index
+        is swapped in, lookups use the previous one; edits made meanwhile are
+        applied to both. Returns the thread, for callers that must wait.
+        """
+        inventory = dict(self.inventory)
+        with self.index_lock:
+            self.index_edits = []
+
+        def build():
+            index = ItemSearchIndex(inventory)
+            with self.index_lock:
+                for old_name, name, barcode in self.index_edits:
+                    self._apply_index_edit(index, old_name, name, barcode)
+                self.index_edits = None
+                self.search_index = index
+
+        thread = threading.Thread(target=build, daemon=True)
+        thread.start()
+        return thread
+
+    def index_item(self, old_name=None, name=None, barcode=None):
+        """Keep the search index in step with one added, renamed or deleted item"""
+        with self.index_lock:
+            self._apply_index_edit(self.search_index, old_name, name, barcode)
+            if self.index_edits is not None:
+                self.index_edits.append((old_name, name, barcode))
+
+    @staticmethod
+    def _apply_index_edit(index, old_name, name, barcode):
+        if old_name:
+            index.remove(old_name)
+        if name:
+            index.add(name, barcode)
+
+    def find_item(self, value):
+        """Inventory item for a scanned barcode or typed name, or None
+
+        Tries the barcode, then the exact name; a partial or misspelt name
+        with a single candidate is taken as is.
+        """
+        name = self.search_index.find_barcode(value)
+        if name is None and self.index_edits is not None:
+            # Index still building; scan the cache instead
+            name = next((n for n, data in self.inventory.items()
+                         if data.get("barcode") == value), None)
+        if name in self.inventory:
+            return name
+        if value in self.inventory:
+            return value
+        matches = self.search_index.suggest(value, limit=2)
+        if len(matches) == 1 and matches[0] in self.inventory:
+            return matches[0]
+        return None
+
+    def quick_items(self, days, count, pinned=()):
+        """Items for the quick keys as (name, price in paise): pinned first, then best sellers
+
+        Inventory items carry their shelf price; loose items the average
+        price they sold at. Safe to call off the Tk thread.
+        """
+        sold = {name: price for name, _, price in self.db.top_items(days, count + len(pinned))}
+        ranked = list(dict.fromkeys(pinned)) + [name for name in sold if name not in pinned]
+        return [(name, self.inventory[name]["price"] if name in self.inventory else sold.get(name))
+                for name in ranked[:count]]
+
+    # ==================== Cart ====================
+    def add_item(self, item, qty, price, billing_type="REGULAR"):
+        """Add a line to the cart, or to the quantity of a line with the same item and price"""
+        if self.journal:
+            self.journal.append({"op": "add", "item": item, "qty": qty, "price": price,
+                                 "billing_type": billing_type})
+        for entry in self.cart:
+            if entry["item"] == item and entry["price"] == price:
+                entry["qty"] += qty
+                return
+        self.cart.append({"item": item, "qty": qty, "price": price, "billing_type": billing_type})
+
+    def remove_line(self, index):
+        if self.journal:
+            self.journal.append({"op": "remove", "index": index})
+        self.cart.pop(index)
+
+    def cart_total(self):
+        return sum(entry["qty"] * entry["price"] for entry in self.cart)
+
+    def park(self, label=None):
+        """Put the cart on hold and start an empty one; returns the parked cart id
+
+        Parked carts are labelled with their first item unless given a label.
+        """
+        park_id = self.db.park_cart(self.terminal, self.cart, self._park_label(label))
+        self.cart.clear()
+        self._reset_journal()
+        return park_id
+
+    def parked(self):
+        """Carts on hold at this terminal as (id, label, parked_at, item_count, total)"""
+        return self.db.parked_carts(self.terminal)
+
+    def recall(self, park_id):
+        """Make a parked cart the current one; a non-empty current cart is parked in its place
+
+        Returns False if the cart was already recalled.
+        """
+        cart = self.db.recall_cart(park_id, self.terminal, self.cart, self._park_label(None))
+        if cart is None:
+            return False
+        self.cart[:] = cart
+        self._reset_journal()
+        return True
+
+    def _park_label(self, label):
+        if label is None:
+            return self.cart[0]["item"] if self.cart else ""
+        return label
+
+    def checkout(self):
+        """Save the cart as a bill and empty it; returns (cart, bill_no, total)
+
+        The database takes the stock off; the cache follows it here.
+        """
+        cart = self.cart.copy()
+        if self.journal:
+            # Lets recovery tell a bill that was saved from one that was not
+            self.journal.append({"op": "checkout", "at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        with CHECKOUT_SECONDS.time():
+            bill_no, total = self.db.save_receipt(cart, self.cashier)
+
+            for entry in cart:
+                item = entry['item']
+                if item in self.inventory and entry.get('billing_type', 'REGULAR') == 'REGULAR':
+                    self.inventory[item]['stock'] -= entry['qty']
+        BILLS.inc()
+        BILL_LINES.observe(len(cart))
+        self.cart.clear()
+        self._reset_journal()
+        return cart, bill_no, total
+
+    def _reset_journal(self):
+        """Compact the journal to the cart as it now is"""
+        if self.journal:
+            self.journal.reset(self.cart)
+
+    def recover(self):
+        """Rebuild the cart left unfinished by a crash from the journal; returns its line count
+
+        A checkout that was under way is finished if its bill made it to
+        the database, so the cart is not billed twice.
+        """
+        if not self.journal:
+            return 0
+        journal, self.journal = self.journal, None
+        checkout_at = None
+        try:
+            for record in journal.records():
+                op = record["op"]
+                checkout_at = record["at"] if op == "checkout" else None
+                if op == "add":
+                    self.add_item(record["item"], record["qty"], record["price"], record["billing_type"])
+                elif op == "remove":
+                    self.remove_line(record["index"])
+                elif op == "set":
+                    self.cart[:] = record["cart"]
+            if checkout_at and self.cart:
+                last_cart, _, timestamp = self.db.get_last_receipt()
+                if last_cart == self.cart and timestamp and timestamp >= checkout_at:
+                    self.cart.clear()
+        finally:
+            self.journal = journal
+        self._reset_journal()
+        return len(self.cart)
+
+    # ==================== Reports ====================
+    def daily_sales(self, date_str):
+        """(rows, totals, items) for format_sales_report; safe to call off the Tk thread"""
+        return (self.db.fetch_sales(date_str), self.db.sales_totals(date_str),
+                self.db.item_sales_summary(date_str))
@@ -0,0 +1,104 @@
+"""Crash-safe journal of the cart in progress
+
+Every cart change is appended to a small file as one checksummed JSON
+line. The append is a single os.write, which reaches the OS straight
+away (so a crash of BillSoft loses nothing); a background thread fsyncs
+the file a few times a second, so a power cut loses at most the last
+SYNC_INTERVAL of scans without any scan waiting on the disk. When the
+cart is emptied or replaced (checkout, hold, recall) the file is
+rewritten to hold just the new cart.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+
+
+JOURNAL_FILE = "cart_journal.log"
+
+# Seconds between fsyncs of appended changes
+SYNC_INTERVAL = 0.2
+
+
+def _encode(record):
+    payload = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n".encode("utf-8")
+
+
+class CartJournal:
+    """Append-only cart change log with batched fsync"""
+
+    def __init__(self, path=JOURNAL_FILE, sync_interval=SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()  # appends; held only for the write itself
+        self.sync_lock = threading.Lock()  # keeps the file open while an fsync runs
+        self.dirty = False
+        self.fd = self._open()
+        threading.Thread(target=self._sync_loop, daemon=True).start()
+
+    def _open(self):
+        return os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+
+    def append(self, record):
+        """Log one cart change; returns without waiting for the disk"""
+        data = _encode(record)
+        with self.lock:
+            os.write(self.fd, data)
+            self.dirty = True
+
+    def reset(self, cart):
+        """Replace the log with just the given cart and wait for it to reach the disk"""
+        data = _encode({"op": "set", "cart": cart}) if cart else b""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        with self.sync_lock, self.lock:
+            # Windows cannot replace a file that is still open
+            os.close(self.fd)
+            os.replace(temp_path, self.path)
+            self.fd = self._open()
+            self.dirty = False
+
+    def records(self):
+        """Logged changes in order, up to the first torn or corrupt line"""
+        records = []
+        try:
+            with open(self.path, "rb") as f:
+                lines = f.read().split(b"\n")
+        except OSError:
+            return records
+        for line in lines:
+            checksum, _, payload = line.partition(b" ")
+            try:
+                if int(checksum, 16) != zlib.crc32(payload):
+                    break
+                records.append(json.loads(payload))
+            except ValueError:
+                break
+        return records
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            self.sync()
+
+    def sync(self):
+        """fsync changes appended since the last sync, without holding up appends"""
+        with self.sync_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                self.dirty = False
+            try:
+                os.fsync(self.fd)
+            except OSError as e:
+                print(f"Cart journal sync failed: {e}")
+
+    def close(self):
+        self.sync()
+        with self.sync_lock, self.lock:
+            os.close(self.fd)
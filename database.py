@@ -3,25 +3,323 @@ import sqlite3
 from datetime import datetime
 import json
 import os
-import shutil
-from tkinter import messagebox, filedialog
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import migrations
+import sql_trace
+from migrations import DataMigration
+from utils import to_paise
+
+
+# Pages copied per step of the online backup; small enough that progress
+# updates stay smooth, large enough that a multi-GB file finishes quickly.
+BACKUP_PAGES_PER_STEP = 1024
+
+# Tables whose row changes are recorded in change_log for incremental backups
+TRACKED_TABLES = ("inventory", "sales", "receipts", "item_names",
+                  "stock_movements", "stock_snapshots", "parked_carts")
+
+# Sales lines moved to the item name dictionary per transaction, and the
+# pause between transactions that lets checkout writes through
+ITEM_BACKFILL_BATCH = 2000
+ITEM_BACKFILL_PAUSE = 0.05
+
+# Why stock changed: opening balance, sold, goods received, customer return,
+# manual correction
+STOCK_REASONS = ("OPENING", "SALE", "RECEIPT", "RETURN", "ADJUST")
+
+# Archive files kept attached to the main connection at once; SQLite allows 10
+ARCHIVE_ATTACH_LIMIT = 8
+
+# Idle read-only connections kept open for reuse
+READER_POOL_SIZE = 4
+
+# Hours between stock snapshots
+STOCK_SNAPSHOT_HOURS = 24
+
+# Sale lines reference their item's dictionary entry instead of the name
+SALE_INSERT = (
+    "INSERT INTO sales (item_id, quantity, price, total, date_time, billing_type, bill_no) "
+    "VALUES ((SELECT id FROM item_names WHERE name = ?), ?, ?, ?, ?, ?, ?)"
+)
+
+
+def date_sources(archived, date_from=None, date_to=None):
+    """Split a date range into (year, date_from, date_to) pieces, newest first
+
+    year is an archived year whose archive file holds that piece, or None
+    for the main database. Pieces are clipped to the dates their database
+    is authoritative for; with nothing archived the range is returned as is.
+    """
+    if not archived:
+        return [(None, date_from, date_to)]
+    low, high = date_from or "0000-01-01", date_to or "9999-12-30"
+    hot_from = f"{max(archived) + 1:04d}-01-01"
+    pieces = [(None, max(low, hot_from), high)] if high >= hot_from else []
+    for year in sorted(archived, reverse=True):
+        start, end = f"{year:04d}-01-01", f"{year:04d}-12-31"
+        if start <= high and end >= low:
+            pieces.append((year, max(low, start), min(high, end)))
+    return pieces
+
+
+def sales_lines_from(schema="main"):
+    """FROM source with the columns of the sales_lines view for any attached schema
+
+    Views cannot reach into attached archives, so reads that may hit one
+    spell the join out.
+    """
+    return (f"(SELECT s.id, s.bill_no, s.item_id, COALESCE(n.name, s.item_name) AS item_name, "
+            f"s.quantity, s.price, s.total, s.date_time, s.billing_type "
+            f"FROM {schema}.sales s LEFT JOIN main.item_names n ON n.id = s.item_id)")
+
+
+def _move_lines_to_item_ids(conn, low, high):
+    """Point sales lines low..high written before the name dictionary at it"""
+    # The unary + keeps SQLite on the id range; every unmoved line shares
+    # item_id NULL in idx_sales_item_id
+    conn.execute("""
+        INSERT OR IGNORE INTO item_names (name)
+        SELECT item_name FROM sales
+        WHERE id BETWEEN ? AND ? AND +item_id IS NULL AND item_name IS NOT NULL
+    """, (low, high))
+    conn.execute("""
+        UPDATE sales
+        SET item_id = (SELECT id FROM item_names WHERE name = sales.item_name),
+            item_name = NULL
+        WHERE id BETWEEN ? AND ? AND +item_id IS NULL AND item_name IS NOT NULL
+    """, (low, high))
+
+
+def _roll_up_lines(conn, low, high):
+    """Add sales lines low..high, written before the rollup existed, to item_daily_sales"""
+    conn.execute("""
+        INSERT INTO item_daily_sales (day, item_id, lines, quantity, total)
+        SELECT date(date_time), item_id, COUNT(*), SUM(quantity), SUM(total) FROM sales
+        WHERE id BETWEEN ? AND ? AND item_id IS NOT NULL
+        GROUP BY date(date_time), item_id
+        ON CONFLICT(day, item_id) DO UPDATE SET
+            lines = lines + excluded.lines,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total
+    """, (low, high))
+
+
+def _rollup_pending_range(conn):
+    """Sales ids the item_rollup migration has still to add, as (low, high); empty when done"""
+    row = conn.execute("SELECT next_key, last_key FROM data_migrations "
+                       "WHERE name = 'item_rollup' AND finished_at IS NULL").fetchone()
+    return row or (1, 0)
+
+
+def _rebuild_rollup_days(conn, days):
+    """Recount item_daily_sales for days from the sales lines on file
+
+    Used after replaying backed-up sales rows, which bypasses the rollup
+    trigger. Lines the item_rollup migration has still to add are left to it.
+    """
+    low, high = _rollup_pending_range(conn)
+    for day in sorted(days):
+        conn.execute("DELETE FROM item_daily_sales WHERE day = ?", (day,))
+        conn.execute("""
+            INSERT INTO item_daily_sales (day, item_id, lines, quantity, total)
+            SELECT ?, item_id, COUNT(*), SUM(quantity), SUM(total) FROM sales
+            WHERE date_time >= ? AND date_time < date(?, '+1 day')
+              AND item_id IS NOT NULL AND id NOT BETWEEN ? AND ?
+            GROUP BY item_id
+        """, (day, day, day, low, high))
+
+
+def _rollup_mismatches(conn):
+    """Days whose item_daily_sales rows differ from a fresh count of their sales lines
+
+    Days with no lines left (archived years) are skipped; the rollup keeps
+    counting those.
+    """
+    low, high = _rollup_pending_range(conn)
+    return [row[0] for row in conn.execute("""
+        WITH fresh AS (
+            SELECT date(date_time) AS day, item_id, COUNT(*) AS lines,
+                   SUM(quantity) AS quantity, SUM(total) AS total
+            FROM sales WHERE item_id IS NOT NULL AND id NOT BETWEEN ? AND ?
+            GROUP BY date(date_time), item_id
+        ), kept AS (
+            SELECT day, item_id, lines, quantity, total FROM item_daily_sales
+            WHERE day IN (SELECT DISTINCT date(date_time) FROM sales)
+        )
+        SELECT DISTINCT day FROM (
+            SELECT * FROM (SELECT * FROM fresh EXCEPT SELECT * FROM kept)
+            UNION ALL
+            SELECT * FROM (SELECT * FROM kept EXCEPT SELECT * FROM fresh)
+        ) ORDER BY day
+    """, (low, high))]
+
+
+def _log_changes(cursor, table):
+    """Record inserts, updates and deletes on table in change_log"""
+    for event, op, row in (("INSERT", "U", "NEW"), ("UPDATE", "U", "NEW"),
+                           ("DELETE", "D", "OLD")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_log
+            AFTER {event} ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES ('{table}', {row}.rowid, '{op}');
+            END;
+        """)
+
+
+def _restart_backup_chain(conn):
+    # Every line changed; start the next backup chain from a full copy
+    # rather than an incremental holding the whole table
+    conn.execute("DELETE FROM backup_state WHERE key='chain'")
+    conn.execute("DELETE FROM change_log")
+
+
+# Row rewrites finished in the background after a schema upgrade, by the
+# name item_names_table() schedules them under
+DATA_MIGRATIONS = {
+    "item_ids": DataMigration("item_ids", "Moving sales lines to item ids",
+                              _move_lines_to_item_ids, _restart_backup_chain,
+                              ITEM_BACKFILL_BATCH, ITEM_BACKFILL_PAUSE),
+    # Scheduled after item_ids, so it sees those lines with their ids
+    "item_rollup": DataMigration("item_rollup", "Totalling past sales per item",
+                                 _roll_up_lines, None, ITEM_BACKFILL_BATCH * 5, ITEM_BACKFILL_PAUSE),
+}
+
+
+class ReadConnection(sqlite3.Connection):
+    """Read-only connection that remembers which archive files it has attached"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attached = OrderedDict()  # schema alias -> archive file
+        self.execute("PRAGMA query_only=ON")
+
+
+class ConnectionPool:
+    """One writer connection and a pool of read-only connections
+
+    Writes from any thread go through writer(), which serialises them
+    under a lock. Reads borrow a connection of their own through reader(),
+    so a long report on a worker thread reads its WAL snapshot while
+    checkout commits, and neither waits for the other.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.conn = sql_trace.connect(db_name, check_same_thread=False)
+        self.write_lock = threading.RLock()
+        self.idle_lock = threading.Lock()
+        self.idle = []
+        self.closed = False
+
+    @contextmanager
+    def writer(self):
+        """The writer connection in a transaction; commits on success, rolls back on error"""
+        with self.write_lock:
+            with self.conn:
+                yield self.conn
+
+    @contextmanager
+    def reader(self):
+        """A read-only connection, returned to the pool afterwards"""
+        with self.idle_lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = sql_trace.connect(self.db_name, factory=ReadConnection, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            with self.idle_lock:
+                if not self.closed and len(self.idle) < READER_POOL_SIZE:
+                    self.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        """Close the writer and idle readers; readers in use close when returned"""
+        with self.idle_lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+        with self.write_lock:
+            self.conn.close()
 
 
 class DatabaseManager:
     """Manages inventory and sales data"""
     
     def __init__(self, db_name="Data.db"):
-        self.conn = sqlite3.connect(db_name)
-        self.create_tables()
-        self.last_receipt_table()
+        self.db_name = db_name
+        self.last_stock_snapshot = 0
+        self.open()
+
+    def open(self):
+        """Connect to the database and make sure the schema is current"""
+        self.pool = ConnectionPool(self.db_name)
+        # The writer; reads borrow pool.reader() connections instead
+        self.conn = self.pool.conn
+        # Lets maintenance hand free pages back a few at a time; only takes
+        # effect on a new file (maintenance.py converts existing ones)
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL lets a backup (or any reader) hold a snapshot while checkout keeps writing
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        migrations.upgrade(self.conn, self.schema_steps())
+        self.sales_fts = self.search_tokenizer()
+        pending = migrations.pending(self.conn)
+        self.item_backfill_pending = "item_ids" in pending
+        self.data_migrations_pending = bool(pending)
+
+    def schema_steps(self):
+        """Schema versions in order; PRAGMA user_version holds the last one applied
+
+        A database from before versioning (user_version 0) runs every step;
+        each is written to be safe on a database it has already upgraded.
+        Add new steps at the end, never renumber.
+        """
+        return [
+            (1, "inventory and sales tables", self.create_tables),
+            (2, "money in paise", self.paise_migration),
+            (3, "receipts", self.receipts_table),
+            (4, "item name dictionary", self.item_names_table),
+            (5, "stock ledger", self.stock_ledger_tables),
+            (6, "sales archives", self.archives_table),
+            (7, "maintenance log", self.maintenance_table),
+            (8, "change log", self.change_log_table),
+            (9, "item name search", self.sales_search_table),
+            (10, "parked carts", self.parked_carts_table),
+            (11, "daily item sales rollup", self.item_sales_rollup_table),
+            (12, "cashier on receipts", self.receipt_cashier_column),
+            (13, "parked carts in backups", self.parked_carts_backup),
+        ]
+
+    def run_data_migrations(self, progress=None):
+        """Finish row rewrites left by schema upgrades; see migrations.run_data_migrations"""
+        migrations.run_data_migrations(self.db_name, DATA_MIGRATIONS, progress)
+        self.item_backfill_pending = False
+        self.data_migrations_pending = False
+
+    def reopen(self):
+        """Reconnect after the database file was replaced underneath us"""
+        self.pool.close()
+        self.open()
 
     def create_tables(self):
+        # Money columns hold integer paise
         cursor = self.conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS inventory (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT UNIQUE,
-                price REAL,
+                price INTEGER,
                 stock INTEGER,
                 barcode TEXT UNIQUE
             );
@@ -31,145 +329,1033 @@ class DatabaseManager:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 item_name TEXT,
                 quantity INTEGER,
-                price REAL,
-                total REAL,
+                price INTEGER,
+                total INTEGER,
                 date_time TEXT,
                 billing_type TEXT DEFAULT 'REGULAR'
             );
         """)
         self.conn.commit()
 
-    def last_receipt_table(self):
+    def paise_migration(self):
+        """Convert databases that kept money as REAL rupees to INTEGER paise
+
+        Column types cannot be altered in SQLite, so each table is rebuilt
+        with its rows copied across, in one transaction. Triggers and indexes
+        on the rebuilt tables are recreated by the setup steps that follow.
+        """
+        cursor = self.conn.cursor()
+        types = {row[1]: row[2].upper() for row in cursor.execute("PRAGMA table_info(inventory)")}
+        if types.get("price") != "REAL":
+            return
+
+        def paise(column):
+            return f"CAST(ROUND({column} * 100) AS INTEGER)"
+
+        sales_columns = {row[1] for row in cursor.execute("PRAGMA table_info(sales)")}
+        receipts = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='receipts'").fetchone()
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute("""
+                CREATE TABLE inventory_new (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE,
+                    price INTEGER,
+                    stock INTEGER,
+                    barcode TEXT UNIQUE
+                );
+            """)
+            cursor.execute(f"""
+                INSERT INTO inventory_new (id, name, price, stock, barcode)
+                SELECT id, name, {paise('price')}, stock, barcode FROM inventory
+            """)
+            cursor.execute("DROP TABLE inventory")
+            cursor.execute("ALTER TABLE inventory_new RENAME TO inventory")
+
+            cursor.execute("""
+                CREATE TABLE sales_new (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    item_name TEXT,
+                    quantity INTEGER,
+                    price INTEGER,
+                    total INTEGER,
+                    date_time TEXT,
+                    billing_type TEXT DEFAULT 'REGULAR',
+                    bill_no INTEGER
+                );
+            """)
+            bill_no = "bill_no" if "bill_no" in sales_columns else "NULL"
+            cursor.execute(f"""
+                INSERT INTO sales_new (id, item_name, quantity, price, total, date_time, billing_type, bill_no)
+                SELECT id, item_name, quantity, {paise('price')}, {paise('total')}, date_time,
+                       billing_type, {bill_no}
+                FROM sales
+            """)
+            cursor.execute("DROP TABLE sales")
+            cursor.execute("ALTER TABLE sales_new RENAME TO sales")
+
+            if receipts:
+                cursor.execute("""
+                    CREATE TABLE receipts_new (
+                        bill_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                        date_time TEXT,
+                        total INTEGER,
+                        item_count INTEGER,
+                        cart_data BLOB
+                    );
+                """)
+                rows = cursor.execute(
+                    "SELECT bill_no, date_time, total, item_count, cart_data FROM receipts")
+                self.conn.executemany(
+                    "INSERT INTO receipts_new (bill_no, date_time, total, item_count, cart_data) VALUES (?, ?, ?, ?, ?)",
+                    ((bill, dt, to_paise(total), count, self.pack_cart(self.paise_cart(self.unpack_cart(blob))))
+                     for bill, dt, total, count, blob in rows.fetchall()))
+                cursor.execute("DROP TABLE receipts")
+                cursor.execute("ALTER TABLE receipts_new RENAME TO receipts")
+
+            # Rebuilt tables are not in the incremental chain; force a full backup
+            if cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='backup_state'").fetchone():
+                cursor.execute("DELETE FROM backup_state WHERE key='chain'")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    @staticmethod
+    def paise_cart(cart_data):
+        """Cart entries priced in rupees, as saved by older versions, repriced in paise"""
+        return [dict(entry, price=to_paise(entry["price"])) for entry in cart_data]
+
+    def receipts_table(self):
+        """Journal of every bill; sale lines point at their bill number"""
         cursor = self.conn.cursor()
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS last_receipt (
-                id INTEGER PRIMARY KEY,
-                cart_data TEXT,
-                total REAL,
-                timestamp TEXT
+            CREATE TABLE IF NOT EXISTS receipts (
+                bill_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                date_time TEXT,
+                total INTEGER,
+                item_count INTEGER,
+                cart_data BLOB
             );
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_date_time ON receipts(date_time)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_total ON receipts(total)")
+
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(sales)")]
+        if "bill_no" not in columns:
+            cursor.execute("ALTER TABLE sales ADD COLUMN bill_no INTEGER")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_bill_no ON sales(bill_no)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_date_time ON sales(date_time)")
+
+        # Carry the single receipt kept by older versions into the journal
+        legacy = cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='last_receipt'").fetchone()
+        if legacy:
+            row = cursor.execute("SELECT cart_data, total, timestamp FROM last_receipt WHERE id=1").fetchone()
+            if row and not cursor.execute("SELECT 1 FROM receipts LIMIT 1").fetchone():
+                cart_data = self.paise_cart(json.loads(row[0]))
+                cursor.execute(
+                    "INSERT INTO receipts (date_time, total, item_count, cart_data) VALUES (?, ?, ?, ?)",
+                    (row[2], to_paise(row[1]), len(cart_data), self.pack_cart(cart_data)))
+            cursor.execute("DROP TABLE last_receipt")
         self.conn.commit()
 
-    # Inventory Operations
-    def add_inventory_item(self, name, price, stock, barcode):
+    @staticmethod
+    def pack_cart(cart_data):
+        """Compact cart payload: minified JSON, zlib-compressed"""
+        return zlib.compress(json.dumps(cart_data, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def unpack_cart(blob):
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def change_log_table(self):
+        """Record which rows change so incremental backups copy only those"""
         cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO inventory (name, price, stock, barcode) VALUES (?, ?, ?, ?)",
-                       (name, price, stock, barcode))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT,
+                row_id INTEGER,
+                op TEXT
+            );
+        """)
+        # Identifies the backup chain this database belongs to; restores drop it
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS backup_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        # Tables created by later steps start logging in their own step
+        existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table in TRACKED_TABLES:
+            if table in existing:
+                _log_changes(cursor, table)
         self.conn.commit()
 
-    def update_inventory_item(self, name, price, stock):
+    def item_names_table(self):
+        """Name dictionary that sales lines and inventory rows point at by id
+
+        Sales lines store item_id instead of repeating the name. Renaming an
+        inventory item renames its dictionary entry, so its history follows;
+        renaming it to a name that already has history joins that history.
+        Lines written before the dictionary existed are moved over in chunks
+        by the item_ids data migration; read sales through the sales_lines
+        view, which resolves the name either way.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("UPDATE inventory SET price=?, stock=?  WHERE name=?",
-                       (price, stock, name))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS item_names (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL
+            );
+        """)
+        for table in ("inventory", "sales"):
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+            if "item_id" not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN item_id INTEGER")
+                # Existing names enter the dictionary now; the sales lines
+                # themselves are rewritten later, a chunk at a time
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO item_names (name)
+                    SELECT DISTINCT {'item_name' if table == 'sales' else 'name'} FROM {table}
+                    WHERE {'item_name' if table == 'sales' else 'name'} IS NOT NULL
+                """)
+        cursor.execute("""
+            UPDATE inventory SET item_id = (SELECT id FROM item_names WHERE name = inventory.name)
+            WHERE item_id IS NULL
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_item_id ON sales(item_id, date_time)")
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS inventory_link_item AFTER INSERT ON inventory
+            BEGIN
+                INSERT OR IGNORE INTO item_names (name) VALUES (NEW.name);
+                UPDATE inventory SET item_id = (SELECT id FROM item_names WHERE name = NEW.name)
+                WHERE id = NEW.id;
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS inventory_rename_item AFTER UPDATE OF name ON inventory
+            WHEN NOT EXISTS (SELECT 1 FROM item_names WHERE name = NEW.name)
+            BEGIN
+                UPDATE item_names SET name = NEW.name WHERE id = OLD.item_id;
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS inventory_relink_item AFTER UPDATE OF name ON inventory
+            WHEN EXISTS (SELECT 1 FROM item_names WHERE name = NEW.name AND id IS NOT OLD.item_id)
+            BEGIN
+                UPDATE inventory SET item_id = (SELECT id FROM item_names WHERE name = NEW.name)
+                WHERE id = NEW.id;
+            END;
+        """)
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS sales_lines AS
+            SELECT s.id, s.bill_no, s.item_id, COALESCE(n.name, s.item_name) AS item_name,
+                   s.quantity, s.price, s.total, s.date_time, s.billing_type
+            FROM sales s LEFT JOIN item_names n ON n.id = s.item_id
+        """)
         self.conn.commit()
+        low, high = cursor.execute(
+            "SELECT MIN(id), MAX(id) FROM sales WHERE item_id IS NULL").fetchone()
+        migrations.schedule(self.conn, "item_ids", low, high)
 
-    def delete_inventory_item(self, name):
+    def stock_ledger_tables(self):
+        """Append-only record of every stock change, with periodic snapshots
+
+        inventory.stock stays the current balance; triggers append a
+        stock_movements row whenever it changes, whoever changes it. Writers
+        that know why stock moved say so in stock_context within the same
+        transaction (see set_stock_context); anything else is logged as
+        ADJUST. snapshot_stock() checkpoints each item's balance so
+        stock_as_of() never has to add up more than one period of movements.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM inventory WHERE name=?", (name,))
+        created = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name='stock_movements'").fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id INTEGER NOT NULL,
+                date_time TEXT NOT NULL,
+                change INTEGER NOT NULL,
+                reason TEXT NOT NULL,
+                ref INTEGER
+            );
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id INTEGER NOT NULL,
+                movement_id INTEGER NOT NULL,
+                date_time TEXT NOT NULL,
+                stock INTEGER NOT NULL
+            );
+        """)
+        # One row at most, and only inside a writing transaction
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_context (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                reason TEXT,
+                ref INTEGER
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements(item_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_snapshots_item ON stock_snapshots(item_id, date_time)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_snapshots_movement ON stock_snapshots(movement_id)")
+        if created:
+            # Whatever is on the shelf today is where the ledger starts
+            cursor.execute("""
+                INSERT INTO stock_movements (item_id, date_time, change, reason)
+                SELECT item_id, datetime('now', 'localtime'), stock, 'OPENING'
+                FROM inventory WHERE stock != 0 AND item_id IS NOT NULL
+            """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS inventory_stock_opening AFTER INSERT ON inventory
+            WHEN NEW.stock != 0
+            BEGIN
+                INSERT OR IGNORE INTO item_names (name) VALUES (NEW.name);
+                INSERT INTO stock_movements (item_id, date_time, change, reason)
+                VALUES ((SELECT id FROM item_names WHERE name = NEW.name),
+                        datetime('now', 'localtime'), NEW.stock, 'OPENING');
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS inventory_stock_movement AFTER UPDATE OF stock ON inventory
+            WHEN NEW.stock IS NOT OLD.stock
+            BEGIN
+                INSERT INTO stock_movements (item_id, date_time, change, reason, ref)
+                VALUES (COALESCE(NEW.item_id, (SELECT id FROM item_names WHERE name = NEW.name)),
+                        datetime('now', 'localtime'),
+                        COALESCE(NEW.stock, 0) - COALESCE(OLD.stock, 0),
+                        COALESCE((SELECT reason FROM stock_context), 'ADJUST'),
+                        (SELECT ref FROM stock_context));
+            END;
+        """)
+        for event in ("UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS stock_movements_no_{event.lower()}
+                BEFORE {event} ON stock_movements
+                BEGIN
+                    SELECT RAISE(ABORT, 'stock movements are append-only');
+                END;
+            """)
         self.conn.commit()
 
-    def fetch_inventory(self):
+    @staticmethod
+    def set_stock_context(cursor, reason=None, ref=None):
+        """Label the stock changes that follow in this transaction; no reason clears it"""
+        cursor.execute("DELETE FROM stock_context")
+        if reason:
+            cursor.execute("INSERT INTO stock_context (id, reason, ref) VALUES (1, ?, ?)",
+                           (reason, ref))
+
+    def snapshot_stock(self):
+        """Checkpoint the balance of every item that moved since the last run
+
+        Runs on a worker thread from the idle scheduler with its own
+        connection. Each run only reads movements newer than the previous
+        one, so its cost follows the period's activity, not the ledger size.
+        """
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            with conn:
+                # Grouping must not pick the item index: that would walk the
+                # whole ledger instead of the id range since the last run
+                conn.execute("""
+                    INSERT INTO stock_snapshots (item_id, movement_id, date_time, stock)
+                    SELECT m.item_id, MAX(m.id), MAX(m.date_time),
+                           COALESCE((SELECT stock FROM stock_snapshots p
+                                     WHERE p.item_id = m.item_id
+                                     ORDER BY p.date_time DESC, p.movement_id DESC LIMIT 1), 0)
+                           + SUM(m.change)
+                    FROM stock_movements m
+                    WHERE m.id > (SELECT COALESCE(MAX(movement_id), 0) FROM stock_snapshots)
+                    GROUP BY +m.item_id
+                """)
+            self.last_stock_snapshot = time.time()
+        finally:
+            conn.close()
+
+    def stock_snapshot_due(self):
+        return time.time() - self.last_stock_snapshot >= STOCK_SNAPSHOT_HOURS * 3600
+
+    def record_stock_movement(self, item_name, change, reason="ADJUST", ref=None):
+        """Add change (negative to remove) to an item's stock; returns the new stock"""
+        if reason not in STOCK_REASONS:
+            raise ValueError(f"Unknown stock reason: {reason}")
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            self.set_stock_context(cursor, reason, ref)
+            cursor.execute("UPDATE inventory SET stock = stock + ? WHERE name = ?", (change, item_name))
+            self.set_stock_context(cursor)
+            row = cursor.execute("SELECT stock FROM inventory WHERE name = ?", (item_name,)).fetchone()
+        return row[0] if row else None
+
+    def stock_as_of(self, item_name, date_str):
+        """Stock of an item at the end of date_str (yyyy-mm-dd)
+
+        Starts from the item's last snapshot on or before that day and adds
+        the movements after it, stopping at the next snapshot.
+        """
+        with self.pool.reader() as conn:
+            return self._stock_as_of(conn.cursor(), item_name, date_str)
+
+    @staticmethod
+    def _stock_as_of(cursor, item_name, date_str):
+        row = cursor.execute("SELECT id FROM item_names WHERE name = ?", (item_name,)).fetchone()
+        if not row:
+            return 0
+        item_id = row[0]
+        snapshot = cursor.execute("""
+            SELECT movement_id, date_time, stock FROM stock_snapshots
+            WHERE item_id = ? AND date_time < date(?, '+1 day')
+            ORDER BY date_time DESC, movement_id DESC LIMIT 1
+        """, (item_id, date_str)).fetchone()
+        after_id, after_time, stock = snapshot or (0, "", 0)
+        following = cursor.execute("""
+            SELECT movement_id FROM stock_snapshots
+            WHERE item_id = ? AND date_time >= ? AND movement_id > ?
+            ORDER BY date_time LIMIT 1
+        """, (item_id, after_time, after_id)).fetchone()
+        conditions, params = ["item_id = ?", "id > ?", "date_time < date(?, '+1 day')"], [item_id, after_id, date_str]
+        if following:
+            conditions.append("id <= ?")
+            params.append(following[0])
+        change = cursor.execute(f"""
+            SELECT COALESCE(SUM(change), 0) FROM stock_movements WHERE {' AND '.join(conditions)}
+        """, params).fetchone()[0]
+        return stock + change
+
+    def stock_history(self, item_name, limit=200):
+        """Latest stock movements of an item as (date_time, change, reason, ref), newest first"""
+        with self.pool.reader() as conn:
+            return conn.execute("""
+                SELECT m.date_time, m.change, m.reason, m.ref FROM stock_movements m
+                WHERE m.item_id = (SELECT id FROM item_names WHERE name = ?)
+                ORDER BY m.id DESC LIMIT ?
+            """, (item_name, limit)).fetchall()
+
+    def archives_table(self):
+        """Closed years moved to archive files (see archive.py)
+
+        A year is listed once its archive file is complete; from then on its
+        sales and bills are read from the archive, even while the archiver
+        is still deleting them here.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("SELECT name, price, stock, barcode FROM inventory")
-        return cursor.fetchall()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archives (
+                year INTEGER PRIMARY KEY,
+                file TEXT NOT NULL,
+                sales_rows INTEGER,
+                receipt_rows INTEGER,
+                first_bill INTEGER,
+                last_bill INTEGER,
+                archived_at TEXT
+            );
+        """)
+        self.conn.commit()
 
-    # Sales Operations
-    def add_sale(self, item_name, quantity, price, billing_type='REGULAR'):
-        total = quantity * price
-        dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def archived_years(self):
+        """{year: archive file} for every archived year"""
+        with self.pool.reader() as conn:
+            return dict(conn.execute("SELECT year, file FROM archives"))
+
+    @staticmethod
+    def _attach(conn, year, path):
+        """Schema alias of a year's archive on a reader, attaching it if needed; None if the file is missing"""
+        alias = f"archive_{year}"
+        if alias in conn.attached:
+            conn.attached.move_to_end(alias)
+            return alias
+        if not os.path.exists(path):
+            print(f"Archive for {year} not found: {path}")
+            return None
+        if len(conn.attached) >= ARCHIVE_ATTACH_LIMIT:
+            oldest, _ = conn.attached.popitem(last=False)
+            conn.execute(f"DETACH DATABASE {oldest}")
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+        conn.attached[alias] = path
+        return alias
+
+    def _sources(self, conn, date_from=None, date_to=None):
+        """(schema, date_from, date_to) pieces covering a date range on a reader, newest first
+
+        A year's archive is attached only when the caller reaches it, so
+        finish each piece's query before taking the next: attaching may
+        detach the least recently used archive.
+        """
+        archived = dict(conn.execute("SELECT year, file FROM archives"))
+        for year, source_from, source_to in date_sources(archived, date_from, date_to):
+            schema = "main" if year is None else self._attach(conn, year, archived[year])
+            if schema:
+                yield schema, source_from, source_to
+
+    def maintenance_table(self):
+        """What each maintenance task did and how long it took (see maintenance.py)"""
         cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO sales (item_name, quantity, price, total, date_time, billing_type) VALUES (?, ?, ?, ?, ?, ?)",
-                       (item_name, quantity, price, total, dt, billing_type))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS maintenance_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started TEXT,
+                task TEXT,
+                seconds REAL,
+                result TEXT
+            );
+        """)
         self.conn.commit()
 
-    def update_stock(self, item_name, new_stock):
+    def sales_search_table(self):
+        """Full-text index over item names, kept current by triggers
+
+        Indexes the name dictionary rather than every sales line; searches
+        find matching item ids here and then read their lines through
+        idx_sales_item_id. Uses the trigram tokenizer where available so
+        any part of a name matches ("shir" finds "Blue Shirt"); older SQLite
+        builds fall back to word-prefix matching, builds without FTS5 to a
+        LIKE scan.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("UPDATE inventory SET stock=? WHERE name=?", (new_stock, item_name))
+        # Earlier versions indexed every sales line
+        for trigger in ("sales_fts_insert", "sales_fts_delete", "sales_fts_update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE IF EXISTS sales_fts")
+
+        if not self.search_tokenizer():
+            for tokenizer in ("trigram", "unicode61"):
+                try:
+                    cursor.execute(f"""
+                        CREATE VIRTUAL TABLE item_names_fts USING fts5(
+                            name, content='item_names', content_rowid='id',
+                            tokenize='{tokenizer}'
+                        );
+                    """)
+                except sqlite3.OperationalError:
+                    continue
+                cursor.execute("INSERT INTO item_names_fts(item_names_fts) VALUES ('rebuild')")
+                break
+            else:
+                self.conn.commit()
+                return
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS item_names_fts_insert AFTER INSERT ON item_names
+            BEGIN
+                INSERT INTO item_names_fts (rowid, name) VALUES (NEW.id, NEW.name);
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS item_names_fts_delete AFTER DELETE ON item_names
+            BEGIN
+                INSERT INTO item_names_fts (item_names_fts, rowid, name)
+                VALUES ('delete', OLD.id, OLD.name);
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS item_names_fts_update AFTER UPDATE OF name ON item_names
+            BEGIN
+                INSERT INTO item_names_fts (item_names_fts, rowid, name)
+                VALUES ('delete', OLD.id, OLD.name);
+                INSERT INTO item_names_fts (rowid, name) VALUES (NEW.id, NEW.name);
+            END;
+        """)
         self.conn.commit()
 
-    def save_last_receipt(self, cart_data, total):
-        """Save the last receipt for reprinting"""
+    def parked_carts_table(self):
+        """Carts put on hold at a terminal, kept until recalled"""
         cursor = self.conn.cursor()
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cart_json = json.dumps(cart_data)
-        cursor.execute("DELETE FROM last_receipt")  # Keep only one receipt
-        cursor.execute("INSERT INTO last_receipt (id, cart_data, total, timestamp) VALUES (1, ?, ?, ?)",
-                       (cart_json, total, timestamp))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS parked_carts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                terminal TEXT,
+                label TEXT,
+                parked_at TEXT,
+                item_count INTEGER,
+                total INTEGER,
+                cart_data BLOB
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_parked_carts_terminal ON parked_carts(terminal)")
+        _log_changes(cursor, "parked_carts")
         self.conn.commit()
 
-    def get_last_receipt(self):
-        """Retrieve the last saved receipt"""
+    def receipt_cashier_column(self):
+        """Username of the cashier logged in when each bill was saved; empty on older bills"""
+        cursor = self.conn.cursor()
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(receipts)")]
+        if "cashier" not in columns:
+            cursor.execute("ALTER TABLE receipts ADD COLUMN cashier TEXT")
+            # Backups taken before have no such column to apply changes to
+            _restart_backup_chain(self.conn)
+        self.conn.commit()
+
+    def parked_carts_backup(self):
+        """Log parked cart changes for incremental backups, on databases parked before they were"""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT cart_data, total, timestamp FROM last_receipt WHERE id=1")
-        row = cursor.fetchone()
+        if not cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'parked_carts_insert_log'").fetchone():
+            _log_changes(cursor, "parked_carts")
+            # Carts held or recalled since the last full backup were not logged
+            _restart_backup_chain(self.conn)
+        self.conn.commit()
+
+    def item_sales_rollup_table(self):
+        """Sale lines, quantity and takings per item per day, kept current by a trigger
+
+        Best sellers over any recent window are read from here instead of
+        the sales table. Lines already on file are added in the background
+        by the item_rollup data migration. Lines later moved to an archive
+        stay counted.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS item_daily_sales (
+                day TEXT,
+                item_id INTEGER,
+                lines INTEGER,
+                quantity INTEGER,
+                total INTEGER,
+                PRIMARY KEY (day, item_id)
+            ) WITHOUT ROWID;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS sales_item_rollup AFTER INSERT ON sales
+            WHEN NEW.item_id IS NOT NULL
+            BEGIN
+                INSERT INTO item_daily_sales (day, item_id, lines, quantity, total)
+                VALUES (date(NEW.date_time), NEW.item_id, 1, NEW.quantity, NEW.total)
+                ON CONFLICT(day, item_id) DO UPDATE SET
+                    lines = lines + 1,
+                    quantity = quantity + excluded.quantity,
+                    total = total + excluded.total;
+            END;
+        """)
+        self.conn.commit()
+        low, high = cursor.execute("SELECT MIN(id), MAX(id) FROM sales").fetchone()
+        migrations.schedule(self.conn, "item_rollup", low, high)
+
+    def search_tokenizer(self):
+        """Tokenizer of the item name index, or None when searches fall back to LIKE"""
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name='item_names_fts'").fetchone()
+        if not row:
+            return None
+        return "trigram" if "trigram" in row[0] else "unicode61"
+
+    # Inventory Operations
+    def add_inventory_item(self, name, price, stock, barcode):
+        with self.pool.writer() as conn:
+            conn.execute("INSERT INTO inventory (name, price, stock, barcode) VALUES (?, ?, ?, ?)",
+                         (name, price, stock, barcode))
+
+    def update_inventory_item(self, name, price, stock):
+        with self.pool.writer() as conn:
+            conn.execute("UPDATE inventory SET price=?, stock=?  WHERE name=?",
+                         (price, stock, name))
+
+    def edit_inventory_item(self, name, new_name, price, stock_change):
+        """Rename and reprice an item and add stock_change to its stock
+
+        Added stock is logged as goods received, removed stock as an adjustment.
+        """
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            self.set_stock_context(cursor, "RECEIPT" if stock_change > 0 else "ADJUST")
+            cursor.execute("UPDATE inventory SET name=?, price=?, stock=stock+? WHERE name=?",
+                           (new_name, price, stock_change, name))
+            self.set_stock_context(cursor)
+
+    def delete_inventory_item(self, name):
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM inventory WHERE name=?", (name,))
+
+    def fetch_inventory(self):
+        with self.pool.reader() as conn:
+            return conn.execute("SELECT name, price, stock, barcode FROM inventory").fetchall()
+
+    # Sales Operations
+    def add_sale(self, item_name, quantity, price, billing_type='REGULAR', bill_no=None):
+        total = quantity * price
+        dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self.pool.writer() as conn:
+            conn.execute("INSERT OR IGNORE INTO item_names (name) VALUES (?)", (item_name,))
+            conn.execute(SALE_INSERT, (item_name, quantity, price, total, dt, billing_type, bill_no))
+
+    def update_stock(self, item_name, new_stock):
+        with self.pool.writer() as conn:
+            conn.execute("UPDATE inventory SET stock=? WHERE name=?", (new_stock, item_name))
+
+    def save_receipt(self, cart_data, cashier=None):
+        """Journal a bill, its sale lines and their stock in one transaction
+
+        Returns (bill_no, total); the bill total is summed from its lines
+        in SQLite, in paise. cashier is the username the bill is put down to.
+        """
+        dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO receipts (date_time, total, item_count, cart_data, cashier) VALUES (?, 0, ?, ?, ?)",
+                (dt, len(cart_data), self.pack_cart(cart_data), cashier))
+            bill_no = cursor.lastrowid
+            cursor.executemany("INSERT OR IGNORE INTO item_names (name) VALUES (?)",
+                               [(entry['item'],) for entry in cart_data])
+            cursor.executemany(
+                SALE_INSERT,
+                [(entry['item'], entry['qty'], entry['price'], entry['qty'] * entry['price'],
+                  dt, entry.get('billing_type', 'REGULAR'), bill_no) for entry in cart_data])
+            # Stock items leave the shelf with the bill; fast-billed lines carry no stock
+            self.set_stock_context(cursor, "SALE", bill_no)
+            cursor.executemany(
+                "UPDATE inventory SET stock = stock - ? WHERE name = ?",
+                [(entry['qty'], entry['item']) for entry in cart_data
+                 if entry.get('billing_type', 'REGULAR') == 'REGULAR'])
+            self.set_stock_context(cursor)
+            cursor.execute(
+                "UPDATE receipts SET total = (SELECT COALESCE(SUM(total), 0) FROM sales WHERE bill_no = ?) "
+                "WHERE bill_no = ?", (bill_no, bill_no))
+            total = cursor.execute("SELECT total FROM receipts WHERE bill_no = ?", (bill_no,)).fetchone()[0]
+        return bill_no, total
+
+    def get_receipt(self, bill_no):
+        """Retrieve a bill by number as (cart_data, total, timestamp)"""
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT cart_data, total, date_time FROM receipts WHERE bill_no=?",
+                               (bill_no,)).fetchone()
+            if not row:
+                archive = conn.execute(
+                    "SELECT year, file FROM archives WHERE ? BETWEEN first_bill AND last_bill",
+                    (bill_no,)).fetchone()
+                schema = self._attach(conn, *archive) if archive else None
+                if schema:
+                    row = conn.execute(
+                        f"SELECT cart_data, total, date_time FROM {schema}.receipts WHERE bill_no=?",
+                        (bill_no,)).fetchone()
         if row:
-            cart_data = json.loads(row[0])
-            return cart_data, row[1], row[2]
+            return self.unpack_cart(row[0]), row[1], row[2]
         return None, None, None
-    
-    def backup_database(self):
-        if not os.path.exists("Data.db"):
-            messagebox.showerror("Error", "Database file not found!")
-            return
 
-        backup_path = filedialog.asksaveasfilename(
-            defaultextension=".db",
-            filetypes=[("Database Backup", "*.db")],
-            title="Save Backup As"
-        )
+    def get_last_receipt(self):
+        """Retrieve the most recent bill"""
+        with self.pool.reader() as conn:
+            bill_no = conn.execute("SELECT MAX(bill_no) FROM receipts").fetchone()[0]
+        return self.get_receipt(bill_no)
 
-        if not backup_path:
-            return
+    def top_items(self, days, limit):
+        """Most often sold items over the last days days as (name, lines, average price in paise)"""
+        with self.pool.reader() as conn:
+            return conn.execute("""
+                SELECT n.name, SUM(r.lines), SUM(r.total) / MAX(SUM(r.quantity), 1)
+                FROM item_daily_sales r JOIN item_names n ON n.id = r.item_id
+                WHERE r.day > date('now', 'localtime', ?)
+                GROUP BY r.item_id
+                ORDER BY SUM(r.lines) DESC, SUM(r.total) DESC
+                LIMIT ?
+            """, (f"-{int(days)} days", limit)).fetchall()
+
+    # Parked Carts
+    def park_cart(self, terminal, cart_data, label=""):
+        """Hold a cart for later; returns its parked cart id"""
+        with self.pool.writer() as conn:
+            return self._park(conn, terminal, cart_data, label)
+
+    def _park(self, conn, terminal, cart_data, label):
+        dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        total = sum(entry['qty'] * entry['price'] for entry in cart_data)
+        return conn.execute(
+            "INSERT INTO parked_carts (terminal, label, parked_at, item_count, total, cart_data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (terminal, label, dt, len(cart_data), total, self.pack_cart(cart_data))).lastrowid
+
+    def parked_carts(self, terminal):
+        """Carts held at a terminal as (id, label, parked_at, item_count, total), oldest first"""
+        with self.pool.reader() as conn:
+            return conn.execute(
+                "SELECT id, label, parked_at, item_count, total FROM parked_carts "
+                "WHERE terminal = ? ORDER BY id", (terminal,)).fetchall()
+
+    def recall_cart(self, park_id, terminal=None, current=None, label=""):
+        """Take a parked cart off hold; returns its cart data, or None if already recalled
+
+        A current cart given with its terminal is parked in the same
+        transaction, so a crash mid-swap loses neither.
+        """
+        with self.pool.writer() as conn:
+            row = conn.execute("SELECT cart_data FROM parked_carts WHERE id = ?", (park_id,)).fetchone()
+            if not row:
+                return None
+            conn.execute("DELETE FROM parked_carts WHERE id = ?", (park_id,))
+            if current:
+                self._park(conn, terminal, current, label)
+        return self.unpack_cart(row[0])
+
+    def find_receipts(self, date_str=None, amount=None, limit=200):
+        """Bill headers (bill_no, date_time, total, item_count), newest first
+
+        Filters by calendar day (yyyy-mm-dd) and/or bill amount in paise;
+        both are answered from indexes.
+        """
+        rows = []
+        with self.pool.reader() as conn:
+            for schema, date_from, date_to in self._sources(conn, date_str, date_str):
+                conditions, params = [], []
+                if date_from:
+                    conditions.append("date_time >= ?")
+                    params.append(date_from)
+                if date_to:
+                    conditions.append("date_time < date(?, '+1 day')")
+                    params.append(date_to)
+                if amount is not None:
+                    conditions.append("total = ?")
+                    params.append(amount)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT bill_no, date_time, total, item_count FROM {schema}.receipts
+                    {where} ORDER BY bill_no DESC LIMIT ?
+                """, params + [limit - len(rows)])
+                rows += cursor.fetchall()
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def fetch_sales(self, date_str):
+        """Sale lines of one day as (item_name, quantity, price, total, date_time, billing_type)"""
+        rows = []
+        with self.pool.reader() as conn:
+            for schema, _, _ in self._sources(conn, date_str, date_str):
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT item_name, quantity, price, total, date_time, billing_type
+                    FROM {sales_lines_from(schema)}
+                    WHERE date_time >= ? AND date_time < date(?, '+1 day')
+                    ORDER BY billing_type, date_time
+                """, (date_str, date_str))
+                rows += cursor.fetchall()
+        return rows
+
+    def sales_totals(self, date_str):
+        """Total paise taken on one day per billing type, e.g. {'REGULAR': 129950}"""
+        totals = {}
+        with self.pool.reader() as conn:
+            for schema, _, _ in self._sources(conn, date_str, date_str):
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT billing_type, SUM(total) FROM {schema}.sales
+                    WHERE date_time >= ? AND date_time < date(?, '+1 day')
+                    GROUP BY billing_type
+                """, (date_str, date_str))
+                for billing_type, amount in cursor:
+                    totals[billing_type] = totals.get(billing_type, 0) + amount
+        return totals
+
+    def item_sales_summary(self, date_str):
+        """(item_name, quantity, total paise) per item sold on one day, best sellers first"""
+        rows = []
+        with self.pool.reader() as conn:
+            for schema, _, _ in self._sources(conn, date_str, date_str):
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT COALESCE(n.name, s.item_name), SUM(s.quantity), SUM(s.total)
+                    FROM {schema}.sales s LEFT JOIN main.item_names n ON n.id = s.item_id
+                    WHERE s.date_time >= ? AND s.date_time < date(?, '+1 day')
+                    GROUP BY COALESCE(s.item_id, s.item_name)
+                    ORDER BY SUM(s.total) DESC
+                """, (date_str, date_str))
+                rows += cursor.fetchall()
+        return rows
+
+    def _sales_search_query(self, conn, text, date_from, date_to, schema="main"):
+        """WHERE conditions and parameters shared by search_sales and its totals"""
+        terms, likes = [], []
+        for word in text.split():
+            if self.sales_fts == "trigram" and len(word) >= 3:
+                terms.append('"' + word.replace('"', '""') + '"')
+            elif self.sales_fts == "unicode61":
+                terms.append('"' + word.replace('"', '""') + '"*')
+            else:
+                # Too short for trigrams, or no FTS5 at all
+                escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                likes.append(f"%{escaped}%")
+
+        conditions, params = [], []
+        if terms or likes:
+            # Match against the name dictionary, then read the lines of the
+            # matching items
+            names, name_params = [], []
+            if terms:
+                names.append("id IN (SELECT rowid FROM item_names_fts WHERE item_names_fts MATCH ?)")
+                name_params.append(" ".join(terms))
+            for pattern in likes:
+                names.append("name LIKE ? ESCAPE '\\'")
+                name_params.append(pattern)
+            matching = f"SELECT id FROM item_names WHERE {' AND '.join(names)}"
+            if self.item_backfill_pending:
+                # Lines not yet moved to the dictionary still carry their name
+                conditions.append(f"""(s.item_id IN ({matching}) OR (s.item_id IS NULL AND
+                    s.item_name IN (SELECT name FROM item_names WHERE id IN ({matching}))))""")
+                params += name_params * 2
+            else:
+                conditions.append(f"s.item_id IN ({matching})")
+                params += name_params
+        if date_from or date_to:
+            date_from, date_to = date_from or "0000-01-01", date_to or "9999-12-30"
+            # Ids and timestamps are both assigned at checkout, so the first
+            # and last sale of the range (two index probes) bound an id range
+            # to seek on; rows are still filtered by date
+            first = conn.execute(
+                f"SELECT id FROM {schema}.sales WHERE date_time >= ? ORDER BY date_time LIMIT 1",
+                (date_from,)).fetchone()
+            last = conn.execute(
+                f"SELECT id FROM {schema}.sales WHERE date_time < date(?, '+1 day') ORDER BY date_time DESC LIMIT 1",
+                (date_to,)).fetchone()
+            conditions.append("s.id BETWEEN ? AND ?")
+            params += [first[0], last[0]] if first and last else [0, -1]
+            conditions.append("s.date_time >= ? AND s.date_time < date(?, '+1 day')")
+            params += [date_from, date_to]
+        return conditions, params
+
+    def search_sales(self, text, date_from=None, date_to=None, before_id=None, limit=50):
+        """Sale lines whose item name contains every word of text, newest first
+
+        Rows are (id, bill_no, date_time, item_name, quantity, price, total).
+        Dates are yyyy-mm-dd and inclusive. Pass the last id of a page as
+        before_id to fetch the next one.
+        """
+        rows = []
+        # Archived years hold older, hence lower, ids than the years after them
+        with self.pool.reader() as conn:
+            for schema, source_from, source_to in self._sources(conn, date_from, date_to):
+                conditions, params = self._sales_search_query(conn, text, source_from, source_to, schema)
+                if before_id is not None:
+                    conditions.append("s.id < ?")
+                    params.append(before_id)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT s.id, s.bill_no, s.date_time, COALESCE(n.name, s.item_name), s.quantity, s.price, s.total
+                    FROM {schema}.sales s LEFT JOIN main.item_names n ON n.id = s.item_id
+                    {where} ORDER BY s.id DESC LIMIT ?
+                """, params + [limit - len(rows)])
+                rows += cursor.fetchall()
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def search_sales_totals(self, text, date_from=None, date_to=None):
+        """(lines, quantity, amount in paise) over everything search_sales would page through"""
+        totals = [0, 0, 0]
+        with self.pool.reader() as conn:
+            for schema, source_from, source_to in self._sources(conn, date_from, date_to):
+                conditions, params = self._sales_search_query(conn, text, source_from, source_to, schema)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT COUNT(*), COALESCE(SUM(s.quantity), 0), COALESCE(SUM(s.total), 0)
+                    FROM {schema}.sales s {where}
+                """, params)
+                totals = [a + b for a, b in zip(totals, cursor.fetchone())]
+        return tuple(totals)
 
+    def online_backup(self, backup_path, progress=None):
+        """Copy the live database to backup_path using SQLite's online backup API.
+
+        Safe to call from a worker thread: it opens its own connection and
+        pins a read snapshot, so the copy is consistent even while checkout
+        keeps committing. progress(done_pages, total_pages) is called after
+        every batch. The copy is integrity-checked before it replaces
+        backup_path; a failed check raises sqlite3.DatabaseError.
+        """
+        temp_path = backup_path + ".part"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        src = sqlite3.connect(self.db_name, isolation_level=None)
+        dst = sqlite3.connect(temp_path)
         try:
-            shutil.copy("Data.db", backup_path)
-            messagebox.showinfo(
-                "Backup Successful",
-                f"Backup saved successfully:\n{backup_path}"
-            )
-        except Exception as e:
-            messagebox.showerror("Backup Failed", str(e))
+            # Holding a read transaction keeps the WAL snapshot fixed, so
+            # concurrent commits never force the backup to restart.
+            src.execute("BEGIN")
+            src.execute("SELECT count(*) FROM sqlite_master").fetchone()
 
-    def restore_database(self):
-        restore_path = filedialog.askopenfilename(
-            filetypes=[("Database Backup", "*.db")],
-            title="Select Backup File"
-        )
+            def on_step(status, remaining, total):
+                if progress:
+                    progress(total - remaining, total)
 
-        if not restore_path:
-            return
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=on_step)
+            src.execute("COMMIT")
 
-        confirm = messagebox.askyesno(
-            "Confirm Restore",
-            "Restoring will OVERWRITE current data.\n\nContinue?"
-        )
+            # Single self-contained file, no -wal sidecar
+            dst.execute("PRAGMA journal_mode=DELETE")
+            result = dst.execute("PRAGMA integrity_check").fetchone()[0]
+        except Exception:
+            dst.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            dst.close()
+            src.close()
 
-        if not confirm:
-            return
+        if result != "ok":
+            os.remove(temp_path)
+            raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+        os.replace(temp_path, backup_path)
+        return backup_path
 
+    def validate_backup(self, path):
+        """Raise sqlite3.DatabaseError unless path is a healthy BillSoft database"""
+        conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
         try:
-            self.conn.close()
-            shutil.copy(restore_path, "Data.db")
-            messagebox.showinfo(
-                "Restore Successful",
-                "Database restored successfully.\n\nApp will restart now."
-            )
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            tables = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'")}
+        finally:
+            conn.close()
+
+        if result != "ok":
+            raise sqlite3.DatabaseError(f"Backup is damaged: {result}")
+        missing = {"inventory", "sales"} - tables
+        if missing:
+            raise sqlite3.DatabaseError(
+                f"Not a BillSoft backup (missing tables: {', '.join(sorted(missing))})")
+
+    def hot_restore(self, restore_path, progress=None):
+        """Copy restore_path over the live database without restarting
+
+        Validates the backup, then writes it into Data.db with SQLite's
+        backup API on a separate connection, so it can run on a worker
+        thread. Call reopen() on the Tk thread afterwards.
+        progress(done_pages, total_pages) is called after every batch.
+        """
+        self.validate_backup(restore_path)
+
+        src = sqlite3.connect(Path(restore_path).resolve().as_uri() + "?mode=ro", uri=True)
+        dst = sqlite3.connect(self.db_name)
+        try:
+            def on_step(status, remaining, total):
+                if progress:
+                    progress(total - remaining, total)
 
-            # Restart app
-            import sys
-            python = sys.executable
-            os.execl(python, python, *sys.argv)
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=on_step)
 
-        except Exception as e:
-            messagebox.showerror("Restore Failed", str(e))
+            # A restored database no longer matches the incremental backup chain
+            dst.execute("DROP TABLE IF EXISTS backup_state")
+            dst.commit()
+        finally:
+            dst.close()
+            src.close()
 
 
 class AuthDB:
     """Manages user authentication"""
     
     def __init__(self, db_name="users.db"):
-        self.conn = sqlite3.connect(db_name)
+        self.conn = sql_trace.connect(db_name)
         self.create_table()
 
     def create_table(self):
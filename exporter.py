@@ -0,0 +1,229 @@
+"""Streaming sales export for BillSoft"""
+import csv
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from database import date_sources, sales_lines_from
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+# Rows fetched from SQLite per round trip
+EXPORT_BATCH_SIZE = 5000
+
+# Rows between checkpoints; also the row count of each Parquet part file
+CHECKPOINT_ROWS = 100000
+
+EXPORT_COLUMNS = ("id", "bill_no", "date_time", "item_name", "quantity",
+                  "price", "total", "billing_type")
+
+# Money is stored in paise and exported in rupees
+EXPORT_SELECT = ", ".join(f"{column} / 100.0 AS {column}" if column in ("price", "total") else column
+                          for column in EXPORT_COLUMNS)
+
+EXPORT_FORMATS = ["CSV", "JSON Lines"] + (["Parquet"] if PARQUET_AVAILABLE else [])
+
+
+class SalesExporter:
+    """Streams sales lines for a date range into CSV, JSON Lines or Parquet
+
+    Rows are read in id order on a read-only connection with fetchmany, so
+    memory stays bounded for multi-year ranges. Progress is checkpointed to
+    a <path>.progress file every CHECKPOINT_ROWS rows; an interrupted export
+    resumes from the last checkpoint instead of starting over. Parquet
+    output is a directory of part files, one per checkpoint, which pandas,
+    pyarrow and DuckDB read as a single dataset.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+
+    @staticmethod
+    def checkpoint_path(path):
+        return path + ".progress"
+
+    def can_resume(self, path, fmt, date_from, date_to):
+        """True if path holds an interrupted export with the same settings"""
+        state = self._load_checkpoint(path)
+        return bool(state) and state["format"] == fmt and \
+            state["date_from"] == date_from and state["date_to"] == date_to
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(self.checkpoint_path(path), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self, path, state):
+        tmp = self.checkpoint_path(path) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path(path))
+
+    def run(self, path, fmt, date_from, date_to, progress=None, resume=False):
+        """Export sales dated date_from..date_to (yyyy-mm-dd, inclusive) to path
+
+        Returns the number of rows in the finished export.
+        progress(done, total) is called after every batch.
+        """
+        if fmt == "Parquet" and not PARQUET_AVAILABLE:
+            raise RuntimeError("Install pyarrow to export Parquet files")
+
+        state = self._load_checkpoint(path) if resume else None
+        if not state or not self.can_resume(path, fmt, date_from, date_to):
+            state = {"format": fmt, "date_from": date_from, "date_to": date_to,
+                     "last_id": 0, "rows": 0, "offset": 0, "parts": 0}
+
+        conn = sqlite3.connect(Path(self.db_name).resolve().as_uri() + "?mode=ro", uri=True)
+        try:
+            archived = dict(conn.execute("SELECT year, file FROM archives"))
+            sources, total = [], 0
+            # Oldest first: archived years hold lower ids than later years,
+            # so the last exported id still marks where to resume
+            for year, source_from, source_to in reversed(date_sources(archived, date_from, date_to)):
+                schema = self._attach(conn, year, archived)
+                # Map the date range to an id range through the date_time
+                # index, then stream by primary key
+                first_id, last_id, count = conn.execute(f"""
+                    SELECT MIN(id), MAX(id), COUNT(*) FROM {schema}.sales
+                    WHERE date_time >= ? AND date_time < date(?, '+1 day')
+                """, (source_from, source_to)).fetchone()
+                self._detach(conn, schema)
+                total += count
+                sources.append((year, source_from, source_to, first_id, last_id))
+
+            def cursors():
+                # One year attached at a time; SQLite allows only ten
+                for year, source_from, source_to, first_id, last_id in sources:
+                    schema = self._attach(conn, year, archived)
+                    yield conn.execute(f"""
+                        SELECT {EXPORT_SELECT} FROM {sales_lines_from(schema)}
+                        WHERE id > ? AND id <= ?
+                          AND date_time >= ? AND date_time < date(?, '+1 day')
+                        ORDER BY id
+                    """, (max(state["last_id"], (first_id or 1) - 1), last_id or 0, source_from, source_to))
+                    self._detach(conn, schema)
+
+            writer = {"CSV": self._write_csv, "JSON Lines": self._write_jsonl,
+                      "Parquet": self._write_parquet}[fmt]
+            writer(path, cursors(), state, total, progress)
+        finally:
+            conn.close()
+
+        if os.path.exists(self.checkpoint_path(path)):
+            os.remove(self.checkpoint_path(path))
+        return state["rows"]
+
+    @staticmethod
+    def _attach(conn, year, archived):
+        """Schema of one source: main for the live years, else the year's archive attached read-only"""
+        if year is None:
+            return "main"
+        schema = f"archive_{year}"
+        conn.execute(f"ATTACH DATABASE ? AS {schema}",
+                     (Path(archived[year]).resolve().as_uri() + "?mode=ro",))
+        return schema
+
+    @staticmethod
+    def _detach(conn, schema):
+        if schema != "main":
+            conn.execute(f"DETACH DATABASE {schema}")
+
+    def _batches(self, cursors, state, total, progress):
+        for cursor in cursors:
+            yield from self._cursor_batches(cursor, state, total, progress)
+
+    def _cursor_batches(self, cursor, state, total, progress):
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                return
+            # State describes everything handed to the writer, so a
+            # checkpoint taken after writing this batch is exact
+            state["last_id"] = rows[-1][0]
+            state["rows"] += len(rows)
+            yield rows
+            if progress:
+                progress(state["rows"], total)
+
+    def _open_text(self, path, state):
+        """Open a text export for appending from the last checkpoint"""
+        if state["rows"] and os.path.exists(path):
+            f = open(path, "r+", newline="", encoding="utf-8")
+            f.seek(state["offset"])
+            f.truncate()  # Drop anything written after the checkpoint
+            return f
+        return open(path, "w", newline="", encoding="utf-8")
+
+    def _checkpoint_text(self, path, f, state):
+        f.flush()
+        os.fsync(f.fileno())
+        state["offset"] = f.tell()
+        self._save_checkpoint(path, state)
+
+    def _write_csv(self, path, cursors, state, total, progress):
+        with self._open_text(path, state) as f:
+            writer = csv.writer(f)
+            if not state["rows"]:
+                writer.writerow(EXPORT_COLUMNS)
+            since_checkpoint = 0
+            for rows in self._batches(cursors, state, total, progress):
+                writer.writerows(rows)
+                since_checkpoint += len(rows)
+                if since_checkpoint >= CHECKPOINT_ROWS:
+                    self._checkpoint_text(path, f, state)
+                    since_checkpoint = 0
+
+    def _write_jsonl(self, path, cursors, state, total, progress):
+        with self._open_text(path, state) as f:
+            since_checkpoint = 0
+            for rows in self._batches(cursors, state, total, progress):
+                f.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+                             for row in rows)
+                since_checkpoint += len(rows)
+                if since_checkpoint >= CHECKPOINT_ROWS:
+                    self._checkpoint_text(path, f, state)
+                    since_checkpoint = 0
+
+    def _write_parquet(self, path, cursors, state, total, progress):
+        schema = pa.schema([
+            ("id", pa.int64()), ("bill_no", pa.int64()), ("date_time", pa.string()),
+            ("item_name", pa.string()), ("quantity", pa.int64()), ("price", pa.float64()),
+            ("total", pa.float64()), ("billing_type", pa.string()),
+        ])
+        os.makedirs(path, exist_ok=True)
+        # Parts after the checkpoint may be incomplete; they are rewritten
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) > state["parts"]:
+                os.remove(os.path.join(path, name))
+
+        writer = None
+        since_checkpoint = 0
+        try:
+            for rows in self._batches(cursors, state, total, progress):
+                if writer is None:
+                    part_path = os.path.join(path, f"part-{state['parts'] + 1:05d}.parquet")
+                    writer = pq.ParquetWriter(part_path, schema, compression="zstd")
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                    schema=schema))
+                since_checkpoint += len(rows)
+                if since_checkpoint >= CHECKPOINT_ROWS:
+                    writer.close()
+                    writer = None
+                    state["parts"] += 1
+                    self._save_checkpoint(path, state)
+                    since_checkpoint = 0
+        finally:
+            if writer is not None:
+                writer.close()
+                state["parts"] += 1
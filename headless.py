@@ -0,0 +1,168 @@
+"""Run till flows without a display, for scripting and timing
+
+HeadlessTill drives BillingEngine, the code behind ShopApp's screens, and
+answers the quantity and print-preview dialogs the way a cashier taking
+the defaults would:
+
+    python headless.py --db test/Data.db --bills 500 --lines 5
+
+scans, checks out and prints that many bills, generates the day's report
+and prints the latency of each step. It writes real bills, so point it
+at a copy (benchmarks/generate.py builds one), never the shop's Data.db.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from billing import BillingEngine
+from cart_journal import CartJournal
+from database import DatabaseManager
+from metrics import SCAN_TO_CART_SECONDS, REPORT_SECONDS
+from printing import ReceiptPrinter
+from utils import format_enhanced_receipt, format_sales_report
+
+
+class DialogStandIns:
+    """What the modal dialogs return when a cashier accepts them"""
+
+    @staticmethod
+    def manual_quantity(item, inventory, qty=1, price=None):
+        """ManualQuantityDialog: quantity 1 at the shelf price unless told otherwise"""
+        return {"confirmed": True, "qty": qty,
+                "price": inventory[item]["price"] if price is None else price}
+
+    @staticmethod
+    def fast_billing(item, qty, price):
+        """FastBillingDialog: the cashier types both quantity and price"""
+        return {"confirmed": True, "qty": qty, "price": price}
+
+    @staticmethod
+    def print_preview(cart, total):
+        """PrintPreviewDialog then Print: the preview text and the thermal printer's bytes"""
+        return format_enhanced_receipt(cart, total), ReceiptPrinter.thermal_receipt_bytes(cart, total)
+
+
+class HeadlessTill:
+    """A till without Tk: scan, fast-bill, checkout, receipt and report, each timed"""
+
+    STEPS = ("scan", "fast", "checkout", "receipt", "report")
+
+    def __init__(self, db_name, journal_path=None):
+        self.db = DatabaseManager(db_name)
+        self.journal = CartJournal(journal_path) if journal_path else None
+        self.billing = BillingEngine(self.db, journal=self.journal)
+        self.billing.reload_inventory()
+        self.billing.rebuild_search_index().join()
+        self.timings = {step: [] for step in self.STEPS}
+
+    def scan(self, value, qty=1, price=None):
+        """Enter a barcode or item name, as on_item_entered does; returns the item"""
+        began = time.perf_counter()
+        item = self.billing.find_item(value)
+        if item is None:
+            raise LookupError(f"Item or barcode not found: {value}")
+        result = DialogStandIns.manual_quantity(item, self.billing.inventory, qty, price)
+        self.billing.add_item(item, result["qty"], result["price"])
+        self._record("scan", began)
+        SCAN_TO_CART_SECONDS.observe(self.timings["scan"][-1], billing="REGULAR")
+        return item
+
+    def fast(self, item, qty, price):
+        """Fast-bill a line with a typed price in paise"""
+        began = time.perf_counter()
+        result = DialogStandIns.fast_billing(item, qty, price)
+        self.billing.add_item(item, result["qty"], result["price"], "FAST")
+        self._record("fast", began)
+        SCAN_TO_CART_SECONDS.observe(self.timings["fast"][-1], billing="FAST")
+
+    def checkout(self):
+        """Save the cart and render its receipt; returns (bill_no, total, preview lines, printer bytes)"""
+        if not self.billing.cart:
+            raise ValueError("Cart is empty")
+        began = time.perf_counter()
+        cart, bill_no, total = self.billing.checkout()
+        self._record("checkout", began)
+        began = time.perf_counter()
+        lines, data = DialogStandIns.print_preview(cart, total)
+        self._record("receipt", began)
+        return bill_no, total, lines, data
+
+    def report(self, date_str=None):
+        """The daily sales report text, as the report window shows it"""
+        date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+        began = time.perf_counter()
+        text, _ = format_sales_report(date_str, *self.billing.daily_sales(date_str))
+        self._record("report", began)
+        REPORT_SECONDS.observe(self.timings["report"][-1])
+        return text
+
+    def _record(self, step, began):
+        self.timings[step].append(time.perf_counter() - began)
+
+    def latency_rows(self):
+        """(step, count, mean ms, p50 ms, p95 ms, max ms) per step that ran"""
+        rows = []
+        for step in self.STEPS:
+            samples = [seconds * 1000 for seconds in self.timings[step]]
+            if not samples:
+                continue
+            if len(samples) > 1:
+                cuts = statistics.quantiles(samples, n=20, method="inclusive")
+                p50, p95 = cuts[9], cuts[18]
+            else:
+                p50 = p95 = samples[0]
+            rows.append((step, len(samples), statistics.fmean(samples), p50, p95, max(samples)))
+        return rows
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+        self.db.pool.close()
+
+
+def run_flow(till, bills, lines, fast_share=0.1, seed=1):
+    """Check out bills of about lines lines, scanning barcodes where items have them"""
+    rng = random.Random(seed)
+    items = sorted(till.billing.inventory.items())
+    if not items:
+        raise ValueError("The inventory is empty; build a database with benchmarks/generate.py")
+    for _ in range(bills):
+        for _ in range(max(1, round(rng.gauss(lines, lines / 3)))):
+            if rng.random() < fast_share:
+                till.fast("Loose Items", rng.randint(1, 3), rng.randint(1, 40) * 1000)
+                continue
+            name, data = rng.choice(items)
+            till.scan(data["barcode"] or name, qty=1 if rng.random() < 0.7 else rng.randint(2, 6))
+        till.checkout()
+    till.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run and time till flows without a display")
+    parser.add_argument("--db", required=True, help="database to bill into (a copy, not the shop's)")
+    parser.add_argument("--bills", type=int, default=100, help="bills to check out (default 100)")
+    parser.add_argument("--lines", type=int, default=5, help="mean lines per bill (default 5)")
+    parser.add_argument("--fast-share", type=float, default=0.1, help="share of lines fast-billed")
+    parser.add_argument("--journal", help="journal cart changes to this file, as the till does")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    till = HeadlessTill(args.db, args.journal)
+    try:
+        began = time.perf_counter()
+        run_flow(till, args.bills, args.lines, args.fast_share, args.seed)
+        elapsed = time.perf_counter() - began
+    finally:
+        till.close()
+    print(f"{args.bills} bills in {elapsed:.2f}s")
+    print(f"{'STEP':<10} {'COUNT':>7} {'MEAN ms':>9} {'P50 ms':>9} {'P95 ms':>9} {'MAX ms':>9}")
+    for step, count, mean, p50, p95, worst in till.latency_rows():
+        print(f"{step:<10} {count:>7} {mean:>9.2f} {p50:>9.2f} {p95:>9.2f} {worst:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Bulk inventory import from CSV and Excel files for BillSoft"""
+import csv
+import io
+import os
+import sqlite3
+
+from database import DatabaseManager
+from utils import to_paise
+
+try:
+    import openpyxl
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+
+
+# Rows validated and written per transaction
+IMPORT_BATCH_SIZE = 5000
+
+# Accepted header spellings for each inventory column
+COLUMN_ALIASES = {
+    "name": ("name", "item", "item name", "item_name", "product", "description"),
+    "price": ("price", "mrp", "rate", "selling price"),
+    "stock": ("stock", "qty", "quantity", "stock qty"),
+    "barcode": ("barcode", "ean", "upc", "code", "sku"),
+}
+
+UPSERT_SQL = """
+    INSERT INTO inventory (name, price, stock, barcode) VALUES (?, ?, ?, ?)
+    ON CONFLICT(barcode) DO UPDATE SET
+        name=excluded.name, price=excluded.price, stock={stock}
+    ON CONFLICT(name) DO UPDATE SET
+        price=excluded.price, stock={stock}, barcode=COALESCE(excluded.barcode, barcode)
+"""
+
+
+def _cell_text(value):
+    """Normalise a CSV/Excel cell to a stripped string"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # Excel stores numeric barcodes and quantities as floats
+        return str(int(value))
+    return str(value).strip()
+
+
+class InventoryImporter:
+    """Streams a supplier catalogue into the inventory table
+
+    Rows are matched on barcode first and item name second. Matches are
+    updated, new items inserted. Rows are validated and upserted in
+    batches of IMPORT_BATCH_SIZE, one transaction per batch, so memory stays
+    flat however large the file is. Rows that fail validation or clash with
+    an existing item are collected as rejects instead of aborting the import.
+    """
+
+    def __init__(self, db_name, add_stock=False):
+        self.db_name = db_name
+        # Add file quantities to current stock (goods received) instead of replacing it
+        self.add_stock = add_stock
+
+    def run(self, path, progress=None):
+        """Import path and return {"imported", "rejected", "rejects_path"}
+
+        progress(done, total) is called after every batch; for CSV files
+        done/total are bytes, for Excel files rows.
+        """
+        rejects = []
+        imported = 0
+        stock_expr = "stock + excluded.stock" if self.add_stock else "excluded.stock"
+        sql = UPSERT_SQL.format(stock=stock_expr)
+
+        conn = sqlite3.connect(self.db_name)
+        try:
+            batch = []
+            for line_no, raw, position, total in self.read_rows(path):
+                record, reason = self.validate(raw)
+                if reason:
+                    rejects.append((line_no, reason, raw))
+                else:
+                    batch.append((line_no, raw, record))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    imported += self._write_batch(conn, sql, batch, rejects)
+                    batch = []
+                    if progress:
+                        progress(position, total)
+            if batch:
+                imported += self._write_batch(conn, sql, batch, rejects)
+        finally:
+            conn.close()
+
+        rejects_path = self.write_rejects(path, rejects) if rejects else None
+        return {"imported": imported, "rejected": len(rejects), "rejects_path": rejects_path}
+
+    def _write_batch(self, conn, sql, batch, rejects):
+        # Label the stock changes in the ledger
+        reason = "RECEIPT" if self.add_stock else "ADJUST"
+        try:
+            with conn:
+                DatabaseManager.set_stock_context(conn, reason)
+                conn.executemany(sql, [record for _, _, record in batch])
+                DatabaseManager.set_stock_context(conn)
+            return len(batch)
+        except sqlite3.IntegrityError:
+            pass
+
+        # Some row clashes (e.g. barcode of one item, name of another);
+        # redo this batch row by row so only the offending rows are rejected
+        written = 0
+        with conn:
+            DatabaseManager.set_stock_context(conn, reason)
+            for line_no, raw, record in batch:
+                try:
+                    conn.execute(sql, record)
+                    written += 1
+                except sqlite3.IntegrityError as e:
+                    rejects.append((line_no, f"Conflicts with existing item: {e}", raw))
+            DatabaseManager.set_stock_context(conn)
+        return written
+
+    def read_rows(self, path):
+        """Yield (line_no, {column: text}, position, total) for every data row"""
+        if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+            yield from self._read_excel(path)
+        else:
+            yield from self._read_csv(path)
+
+    def _read_csv(self, path):
+        total = os.path.getsize(path)
+        with open(path, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            reader = csv.reader(text)
+            columns = self.map_header(next(reader, []))
+            for line_no, values in enumerate(reader, start=2):
+                if not any(v.strip() for v in values):
+                    continue
+                yield line_no, self._row_dict(columns, values), raw.tell(), total
+
+    def _read_excel(self, path):
+        if not EXCEL_AVAILABLE:
+            raise RuntimeError("Install openpyxl to import Excel files")
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            total = sheet.max_row or 0
+            rows = sheet.iter_rows(values_only=True)
+            columns = self.map_header([_cell_text(v) for v in next(rows, ())])
+            for line_no, values in enumerate(rows, start=2):
+                values = [_cell_text(v) for v in values]
+                if not any(values):
+                    continue
+                yield line_no, self._row_dict(columns, values), line_no, total
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def map_header(header):
+        """Map inventory fields to column positions; raise ValueError if unusable"""
+        names = [h.strip().lower() for h in header]
+        columns = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            for position, name in enumerate(names):
+                if name in aliases:
+                    columns[field] = position
+                    break
+        missing = {"name", "price"} - set(columns)
+        if missing:
+            raise ValueError(f"File has no column for: {', '.join(sorted(missing))}")
+        return columns
+
+    @staticmethod
+    def _row_dict(columns, values):
+        return {field: values[position].strip() if position < len(values) else ""
+                for field, position in columns.items()}
+
+    @staticmethod
+    def validate(raw):
+        """Return ((name, price in paise, stock, barcode), None) or (None, reason)"""
+        name = raw.get("name", "")
+        if not name:
+            return None, "Missing item name"
+        try:
+            price = to_paise(raw.get("price", "").replace(",", ""))
+        except ArithmeticError:
+            return None, f"Invalid price '{raw.get('price')}'"
+        if price <= 0:
+            return None, "Price must be positive"
+        stock_text = raw.get("stock", "") or "0"
+        try:
+            stock_value = float(stock_text.replace(",", ""))
+        except ValueError:
+            return None, f"Invalid stock '{stock_text}'"
+        if stock_value < 0 or not stock_value.is_integer():
+            return None, "Stock must be a whole number, not negative"
+        barcode = raw.get("barcode", "") or None
+        return (name, price, int(stock_value), barcode), None
+
+    @staticmethod
+    def write_rejects(path, rejects):
+        """Write rejected rows next to the source file and return the report path"""
+        rejects_path = os.path.splitext(path)[0] + "_rejects.csv"
+        with open(rejects_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "reason", "name", "price", "stock", "barcode"])
+            for line_no, reason, raw in sorted(rejects, key=lambda r: r[0]):
+                writer.writerow([line_no, reason, raw.get("name", ""), raw.get("price", ""),
+                                 raw.get("stock", ""), raw.get("barcode", "")])
+        return rejects_path
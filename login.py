@@ -127,6 +127,6 @@ class LoginWindow:
         if self.db.login(user, pwd):
             self.container.destroy()
             self.marquee_label.destroy()
-            app = ShopApp(self.root)
+            app = ShopApp(self.root, user, self.db)
         else:
             messagebox.showerror("Error", "Invalid username or password")
@@ -0,0 +1,209 @@
+"""Idle-time database maintenance for BillSoft"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+
+# Hours between maintenance runs
+MAINTENANCE_INTERVAL_HOURS = 24
+
+# Longest a run may take; whatever is left over waits for the next run
+MAINTENANCE_BUDGET_SECONDS = 30
+
+# Free pages returned to the file system per incremental_vacuum step
+VACUUM_PAGES_PER_STEP = 2000
+
+# Largest file converted to incremental auto-vacuum by the idle run; the
+# conversion is one VACUUM that cannot stop for the till, so bigger files
+# are converted only on request (python maintenance.py --convert)
+VACUUM_CONVERT_MAX_BYTES = 64 * 1024 * 1024
+
+# SQLite virtual machine steps between checks for the deadline and the till
+PROGRESS_STEPS = 20000
+
+# Rows ANALYZE samples per index, so statistics refresh in bounded time
+ANALYSIS_LIMIT = 1000
+
+
+class Interrupted(Exception):
+    """The till became busy or the time budget ran out"""
+
+
+class DatabaseMaintenance:
+    """Keeps query plans fresh and the database file compact and healthy
+
+    Runs from the idle scheduler on its own connection: PRAGMA optimize,
+    sampled ANALYZE, incremental vacuum (converting the file to
+    auto_vacuum=INCREMENTAL with a one-off VACUUM first if the file is
+    small; convert_to_incremental does large ones), a WAL checkpoint
+    and PRAGMA quick_check. A progress handler aborts the statement in hand as
+    soon as someone touches the till or the run goes over its budget, so
+    maintenance never holds the database while a bill is being rung up.
+    Every task is recorded in maintenance_log with its duration and result.
+    """
+
+    TASKS = ("optimize", "analyze", "vacuum", "checkpoint", "quick_check")
+
+    def __init__(self, db):
+        self.db = db
+        self.scheduler = None
+        self.last_run = None
+
+    def schedule(self, scheduler):
+        """Register the maintenance job with an IdleScheduler, which also says when the till is busy"""
+        self.scheduler = scheduler
+        scheduler.add_job("maintenance", self.is_due, self.run)
+
+    def is_due(self):
+        if self.last_run is None:
+            with self.db.pool.reader() as conn:
+                row = conn.execute("SELECT MAX(started) FROM maintenance_log").fetchone()
+            self.last_run = datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S").timestamp() if row[0] else 0
+        return time.time() - self.last_run >= MAINTENANCE_INTERVAL_HOURS * 3600
+
+    def run(self):
+        """Run the tasks in order until done, interrupted or out of time"""
+        self.last_run = time.time()
+        started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        deadline = time.monotonic() + MAINTENANCE_BUDGET_SECONDS
+
+        def check():
+            # Non-zero aborts the running statement
+            return time.monotonic() > deadline or \
+                (self.scheduler is not None and not self.scheduler.is_idle())
+
+        conn = sqlite3.connect(self.db.db_name, timeout=1, isolation_level=None)
+        try:
+            for task in self.TASKS:
+                if check():
+                    self._log(conn, started, task, 0, "skipped: till busy or out of time")
+                    continue
+                began = time.monotonic()
+                conn.set_progress_handler(check, PROGRESS_STEPS)
+                try:
+                    result = getattr(self, f"_{task}")(conn, check)
+                except Interrupted:
+                    result = "stopped: till busy or out of time"
+                except sqlite3.OperationalError as e:
+                    result = "stopped: till busy or out of time" if "interrupt" in str(e) \
+                        else f"failed: {e}"
+                finally:
+                    conn.set_progress_handler(None, 0)
+                self._log(conn, started, task, time.monotonic() - began, result)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _log(conn, started, task, seconds, result):
+        print(f"Maintenance {task}: {result} ({seconds:.2f}s)")
+        try:
+            conn.execute("INSERT INTO maintenance_log (started, task, seconds, result) VALUES (?, ?, ?, ?)",
+                         (started, task, round(seconds, 3), result))
+        except sqlite3.OperationalError as e:
+            print(f"Could not record maintenance result: {e}")
+
+    def history(self, limit=50):
+        """Latest maintenance_log rows as (started, task, seconds, result), newest first"""
+        with self.db.pool.reader() as conn:
+            return conn.execute("""
+                SELECT started, task, seconds, result FROM maintenance_log
+                ORDER BY id DESC LIMIT ?
+            """, (limit,)).fetchall()
+
+    # ==================== Tasks ====================
+    @staticmethod
+    def _optimize(conn, check):
+        conn.execute("PRAGMA optimize")
+        return "ok"
+
+    @staticmethod
+    def _analyze(conn, check):
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        return "statistics refreshed"
+
+    @staticmethod
+    def _checkpoint(conn, check):
+        busy, wal_pages, copied = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return f"{copied} of {wal_pages} WAL pages copied" + (", readers still active" if busy else "")
+
+    @staticmethod
+    def _vacuum(conn, check):
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Incremental vacuum needs auto_vacuum=INCREMENTAL, which only
+            # a full VACUUM can switch on; it also returns every free page
+            size = conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+            if size > VACUUM_CONVERT_MAX_BYTES:
+                return (f"skipped: {size // (1024 * 1024)} MB file needs a one-off conversion, "
+                        f"run python maintenance.py --convert with BillSoft closed")
+            _convert(conn)
+            return f"converted to incremental auto-vacuum, {free * page_size // 1024} KB freed"
+        released = 0
+        while free:
+            if check():
+                raise Interrupted
+            # The pragma frees one page per step of its statement, and
+            # execute() steps it only once; executescript() runs it to the
+            # end. One transaction, hence one commit, per batch
+            try:
+                conn.executescript(f"BEGIN IMMEDIATE; PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP}); COMMIT;")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            released += free - left
+            free = left if left < free else 0
+        return f"{released * page_size // 1024} KB freed"
+
+    @staticmethod
+    def _quick_check(conn, check):
+        problems = [row[0] for row in conn.execute("PRAGMA quick_check(20)")]
+        if problems == ["ok"]:
+            return "ok"
+        return "PROBLEMS: " + "; ".join(problems)
+
+
+def _convert(conn):
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def convert_to_incremental(db_name):
+    """Switch a database to incremental auto-vacuum with a full VACUUM; returns the KB freed
+
+    Holds the write lock until done, which takes minutes on a large file,
+    so run it with BillSoft closed.
+    """
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        _convert(conn)
+    finally:
+        conn.close()
+    return free * page_size // 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One-off BillSoft database maintenance")
+    parser.add_argument("--db", default="Data.db", help="database file (default Data.db)")
+    parser.add_argument("--convert", action="store_true",
+                        help="switch to incremental auto-vacuum (close BillSoft first)")
+    args = parser.parse_args(argv)
+    if not args.convert:
+        parser.error("nothing to do; pass --convert")
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found")
+    freed = convert_to_incremental(args.db)
+    print(f"{args.db}: converted to incremental auto-vacuum, {freed} KB freed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
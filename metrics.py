@@ -0,0 +1,238 @@
+"""Lane performance metrics for BillSoft, in Prometheus text format"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Upper bounds of the lines-per-bill buckets
+LINE_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """A count that only goes up, per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self, const_labels):
+        with self.lock:
+            values = dict(self.values)
+        return [f"{self.name}{_label_text(self.labels, key, const_labels)} {value}"
+                for key, value in sorted(values.items())]
+
+    def rows(self):
+        """(label values, value) per series, for the stats panel"""
+        with self.lock:
+            return sorted(self.values.items())
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, with sum, count and max"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [bucket counts..., sum, count, max]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * len(self.buckets) + [0, 0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+                    break
+            series[-3] += value
+            series[-2] += 1
+            series[-1] = max(series[-1], value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the with block takes"""
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - began, **labels)
+
+    def samples(self, const_labels):
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        lines = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = _label_text(self.labels + ("le",), key + (f"{bound:g}",), const_labels)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _label_text(self.labels + ("le",), key + ("+Inf",), const_labels)
+            lines.append(f"{self.name}_bucket{le} {values[-2]}")
+            labels = _label_text(self.labels, key, const_labels)
+            lines.append(f"{self.name}_sum{labels} {values[-3]:g}")
+            lines.append(f"{self.name}_count{labels} {values[-2]}")
+        return lines
+
+    def rows(self):
+        """(label values, count, mean, p50, p95, max) per series, for the stats panel
+
+        Percentiles are the upper bound of the bucket they fall in.
+        """
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        rows = []
+        for key, values in sorted(series.items()):
+            count = values[-2]
+            rows.append((key, count, values[-3] / count if count else 0,
+                         self._percentile(values, 0.5), self._percentile(values, 0.95), values[-1]))
+        return rows
+
+    def _percentile(self, values, fraction):
+        target = values[-2] * fraction
+        cumulative = 0
+        for bound, count in zip(self.buckets, values):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return values[-1]
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered together"""
+
+    def __init__(self):
+        self.metrics = []
+        self.const_labels = ()
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += metric.samples(self.const_labels)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CHECKOUT_SECONDS = REGISTRY.histogram(
+    "billsoft_checkout_seconds", "Time to save a bill and update stock at checkout")
+BILL_LINES = REGISTRY.histogram(
+    "billsoft_bill_lines", "Cart lines per bill", buckets=LINE_BUCKETS)
+BILLS = REGISTRY.counter(
+    "billsoft_bills_total", "Bills checked out")
+SCAN_TO_CART_SECONDS = REGISTRY.histogram(
+    "billsoft_scan_to_cart_seconds",
+    "Time from item entry to the cart showing it, not counting the quantity dialog",
+    labels=("billing",))
+PRINT_SECONDS = REGISTRY.histogram(
+    "billsoft_print_seconds", "Time to send a receipt to the printer",
+    labels=("method", "result"))
+REPORT_SECONDS = REGISTRY.histogram(
+    "billsoft_report_seconds", "Time to generate the daily sales report")
+
+
+class MetricsExporter:
+    """Publishes REGISTRY as a node-exporter text file and, optionally, over HTTP
+
+    The text file is rewritten every interval_seconds on a daemon thread
+    (atomically, so a scrape never sees half a file). With port set, the
+    same text is served at http://host:port/metrics. Every series carries
+    a lane label, so one monitoring box can tell the tills apart.
+    """
+
+    def __init__(self, config, registry=REGISTRY):
+        self.config = config
+        self.registry = registry
+        registry.const_labels = (("lane", config["lane"]),)
+        self.server = None
+        if not config["enabled"]:
+            return
+        if config["textfile"]:
+            threading.Thread(target=self._write_loop, daemon=True).start()
+        if config["port"]:
+            self._serve()
+
+    def _write_loop(self):
+        while True:
+            try:
+                self.write_textfile()
+            except OSError as e:
+                print(f"Could not write metrics file: {e}")
+            time.sleep(self.config["interval_seconds"])
+
+    def write_textfile(self):
+        path = self.config["textfile"]
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.registry.render())
+        os.replace(temp_path, path)
+
+    def _serve(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        try:
+            self.server = ThreadingHTTPServer((self.config["host"], self.config["port"]), Handler)
+        except OSError as e:
+            print(f"Metrics endpoint unavailable: {e}")
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
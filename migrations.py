@@ -0,0 +1,122 @@
+"""Versioned schema migrations for BillSoft"""
+import sqlite3
+import time
+
+
+class DataMigration:
+    """A rewrite of existing rows that runs in chunks after start-up
+
+    apply(conn, low, high) rewrites the rows whose key lies in low..high;
+    each chunk is its own transaction, committed together with the
+    position reached, so a stopped migration resumes where it left off.
+    finish(conn), if given, runs once after the last chunk. Code must cope
+    with old and new rows side by side until then.
+    """
+
+    def __init__(self, name, description, apply, finish=None, batch=2000, pause=0.05):
+        self.name = name
+        self.description = description
+        self.apply = apply
+        self.finish = finish
+        self.batch = batch
+        # Seconds between chunks, so checkout writes get the lock in between
+        self.pause = pause
+
+
+def ensure_tables(conn):
+    """Bookkeeping for data migrations"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_migrations (
+            name TEXT PRIMARY KEY,
+            first_key INTEGER,
+            next_key INTEGER,
+            last_key INTEGER,
+            finished_at TEXT
+        );
+    """)
+    conn.commit()
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def upgrade(conn, steps):
+    """Apply the schema steps newer than the database's user_version
+
+    steps are (version, description, apply) in ascending order; apply()
+    takes no arguments and commits its own work. The version is stored
+    after each step, so an interrupted upgrade repeats at most the step it
+    was in; steps must therefore be safe to run twice.
+    """
+    ensure_tables(conn)
+    version = schema_version(conn)
+    latest = steps[-1][0]
+    if version > latest:
+        print(f"Database schema version {version} is newer than this program ({latest})")
+        return
+    for number, description, apply in steps:
+        if number <= version:
+            continue
+        began = time.monotonic()
+        apply()
+        conn.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+        print(f"Schema migration {number} ({description}) applied in {time.monotonic() - began:.2f}s")
+
+
+def schedule(conn, name, first_key, last_key):
+    """Queue data migration name over keys first_key..last_key (a schema step calls this)"""
+    if first_key is None:
+        return
+    conn.execute("""
+        INSERT INTO data_migrations (name, first_key, next_key, last_key) VALUES (?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            first_key = MIN(first_key, excluded.first_key),
+            next_key = MIN(next_key, excluded.next_key),
+            last_key = MAX(last_key, excluded.last_key),
+            finished_at = NULL
+    """, (name, first_key, first_key, last_key))
+    conn.commit()
+
+
+def pending(conn):
+    """Names of data migrations not finished yet"""
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM data_migrations WHERE finished_at IS NULL ORDER BY rowid")]
+
+
+def run_data_migrations(db_name, migrations, progress=None):
+    """Run every pending data migration to completion on a connection of its own
+
+    migrations maps names to DataMigration. Meant for a worker thread;
+    progress(description, done, total) is called after every chunk.
+    """
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        for name in pending(conn):
+            migration = migrations.get(name)
+            if migration is None:
+                print(f"Unknown data migration '{name}' left pending")
+                continue
+            first, next_key, last = conn.execute(
+                "SELECT first_key, next_key, last_key FROM data_migrations WHERE name = ?",
+                (name,)).fetchone()
+            for low in range(next_key, last + 1, migration.batch):
+                high = min(low + migration.batch - 1, last)
+                with conn:
+                    migration.apply(conn, low, high)
+                    conn.execute("UPDATE data_migrations SET next_key = ? WHERE name = ?",
+                                 (high + 1, name))
+                if progress:
+                    progress(migration.description, high - first + 1, last - first + 1)
+                time.sleep(migration.pause)
+            with conn:
+                if migration.finish:
+                    migration.finish(conn)
+                conn.execute("""
+                    UPDATE data_migrations SET finished_at = datetime('now', 'localtime')
+                    WHERE name = ?
+                """, (name,))
+    finally:
+        conn.close()
@@ -3,9 +3,11 @@ import tkinter as tk
 from tkinter import messagebox
 from datetime import datetime
 import tempfile
+import time
 import webbrowser
+from metrics import PRINT_SECONDS
 from utils import (
-    format_enhanced_receipt, get_printing_config, is_printer_online,
+    format_enhanced_receipt, get_printing_config, is_printer_online, rupees,
     ESC_INIT, ESC_CUT, ESC_BOLD_ON, ESC_BOLD_OFF, ESC_ALIGN_CENTER,
     ESC_ALIGN_LEFT, ESC_DOUBLE_HEIGHT, ESC_NORMAL_SIZE, ESC_FEED_LINES,
     WINDOWS_PRINT_AVAILABLE
@@ -31,7 +33,7 @@ class ReceiptPrinter:
             method, printer_name = ReceiptPrinter.get_printing_method()
 
             if method == "Browser":
-                return ReceiptPrinter.print_to_browser(cart, total)
+                return ReceiptPrinter._timed(method, ReceiptPrinter.print_to_browser, cart, total)
 
             if not printer_name:
                 messagebox.showerror("No Printer", 
@@ -43,9 +45,11 @@ class ReceiptPrinter:
                     f"Printer '{printer_name}' is offline")
 
             if method == "Thermal Printer":
-                return ReceiptPrinter.print_thermal_receipt(printer_name, cart, total)
+                return ReceiptPrinter._timed(method, ReceiptPrinter.print_thermal_receipt,
+                                             printer_name, cart, total)
             else:
-                return ReceiptPrinter.print_windows_receipt(printer_name, cart, total)
+                return ReceiptPrinter._timed(method, ReceiptPrinter.print_windows_receipt,
+                                             printer_name, cart, total)
 
         except Exception as e:
             error_msg = f"Printing failed: {str(e)}\n\nWould you like to save as PDF instead?"
@@ -53,6 +57,18 @@ class ReceiptPrinter:
                 ReceiptPrinter.save_receipt_as_pdf(cart, total)
             return False
 
+    @staticmethod
+    def _timed(method, print_job, *args):
+        """Run a print job, recording its duration per method and outcome"""
+        began = time.perf_counter()
+        printed = False
+        try:
+            printed = print_job(*args)
+            return printed
+        finally:
+            PRINT_SECONDS.observe(time.perf_counter() - began, method=method,
+                                  result="ok" if printed else "failed")
+
     @staticmethod
     def print_to_browser(cart, total):
         """Print receipt using browser"""
@@ -97,6 +113,34 @@ class ReceiptPrinter:
         webbrowser.open(f"file://{temp_file.name}")
         return True
 
+    @staticmethod
+    def thermal_receipt_bytes(cart, total):
+        """ESC/POS bytes of the enhanced thermal receipt, sent in one write"""
+        parts = [
+            ESC_INIT,
+            # Store name - Bold, Double Height, Centered
+            ESC_ALIGN_CENTER, ESC_BOLD_ON, ESC_DOUBLE_HEIGHT, b"BillSoft\n", ESC_NORMAL_SIZE, ESC_BOLD_OFF,
+            ESC_ALIGN_CENTER, b"=" * 42 + b"\n",
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S").encode('utf-8') + b"\n",
+            b"-" * 42 + b"\n\n",
+            ESC_ALIGN_LEFT, ESC_BOLD_ON,
+            f"{'ITEM':<20} {'QTY':>4} {'PRICE':>7} {'TOTAL':>8}\n".encode('utf-8'),
+            ESC_BOLD_OFF, b"-" * 42 + b"\n",
+        ]
+        lines = [f"{entry['item'][:20]:<20} {entry['qty']:>4} {rupees(entry['price']):>7} "
+                 f"{rupees(entry['qty'] * entry['price']):>8}\n" for entry in cart]
+        parts.append("".join(lines).encode('utf-8'))
+        parts += [
+            b"-" * 42 + b"\n\n",
+            ESC_ALIGN_LEFT, f"{'SUBTOTAL:':<30} {rupees(total):>10}\n".encode('utf-8'),
+            b"=" * 42 + b"\n",
+            ESC_BOLD_ON, ESC_DOUBLE_HEIGHT, f"TOTAL: Rs{rupees(total):>10}\n".encode('utf-8'),
+            ESC_NORMAL_SIZE, ESC_BOLD_OFF, b"=" * 42 + b"\n\n",
+            ESC_ALIGN_CENTER, b"Thank you for shopping with us!\n", b"Visit us again soon!\n\n",
+            ESC_FEED_LINES(3), ESC_CUT,
+        ]
+        return b"".join(parts)
+
     @staticmethod
     def print_thermal_receipt(printer_name, cart, total):
         """Print enhanced thermal receipt with formatting"""
@@ -111,60 +155,7 @@ class ReceiptPrinter:
                 win32print.StartDocPrinter(hPrinter, 1, ("Receipt", None, "RAW"))
                 win32print.StartPagePrinter(hPrinter)
                 
-                win32print.WritePrinter(hPrinter, ESC_INIT)
-                
-                # Store name - Bold, Double Height, Centered
-                win32print.WritePrinter(hPrinter, ESC_ALIGN_CENTER)
-                win32print.WritePrinter(hPrinter, ESC_BOLD_ON)
-                win32print.WritePrinter(hPrinter, ESC_DOUBLE_HEIGHT)
-                win32print.WritePrinter(hPrinter, b"BillSoft\n")
-                win32print.WritePrinter(hPrinter, ESC_NORMAL_SIZE)
-                win32print.WritePrinter(hPrinter, ESC_BOLD_OFF)
-                
-                win32print.WritePrinter(hPrinter, ESC_ALIGN_CENTER)
-                win32print.WritePrinter(hPrinter, b"=" * 42 + b"\n")
-                
-                dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                win32print.WritePrinter(hPrinter, dt.encode('utf-8') + b"\n")
-                win32print.WritePrinter(hPrinter, b"-" * 42 + b"\n\n")
-                
-                win32print.WritePrinter(hPrinter, ESC_ALIGN_LEFT)
-                win32print.WritePrinter(hPrinter, ESC_BOLD_ON)
-                header = f"{'ITEM':<20} {'QTY':>4} {'PRICE':>7} {'TOTAL':>8}\n"
-                win32print.WritePrinter(hPrinter, header.encode('utf-8'))
-                win32print.WritePrinter(hPrinter, ESC_BOLD_OFF)
-                win32print.WritePrinter(hPrinter, b"-" * 42 + b"\n")
-                
-                for entry in cart:
-                    item_name = entry['item'][:20]
-                    qty = entry['qty']
-                    price = entry['price']
-                    item_total = qty * price
-                    
-                    line = f"{item_name:<20} {qty:>4} {price:>7.2f} {item_total:>8.2f}\n"
-                    win32print.WritePrinter(hPrinter, line.encode('utf-8'))
-                
-                win32print.WritePrinter(hPrinter, b"-" * 42 + b"\n\n")
-                
-                win32print.WritePrinter(hPrinter, ESC_ALIGN_LEFT)
-                subtotal_line = f"{'SUBTOTAL:':<30} {total:>10.2f}\n"
-                win32print.WritePrinter(hPrinter, subtotal_line.encode('utf-8'))
-                
-                win32print.WritePrinter(hPrinter, b"=" * 42 + b"\n")
-                win32print.WritePrinter(hPrinter, ESC_BOLD_ON)
-                win32print.WritePrinter(hPrinter, ESC_DOUBLE_HEIGHT)
-                total_line = f"TOTAL: Rs{total:>10.2f}\n"
-                win32print.WritePrinter(hPrinter, total_line.encode('utf-8'))
-                win32print.WritePrinter(hPrinter, ESC_NORMAL_SIZE)
-                win32print.WritePrinter(hPrinter, ESC_BOLD_OFF)
-                win32print.WritePrinter(hPrinter, b"=" * 42 + b"\n\n")
-                
-                win32print.WritePrinter(hPrinter, ESC_ALIGN_CENTER)
-                win32print.WritePrinter(hPrinter, b"Thank you for shopping with us!\n")
-                win32print.WritePrinter(hPrinter, b"Visit us again soon!\n\n")
-                
-                win32print.WritePrinter(hPrinter, ESC_FEED_LINES(3))
-                win32print.WritePrinter(hPrinter, ESC_CUT)
+                win32print.WritePrinter(hPrinter, ReceiptPrinter.thermal_receipt_bytes(cart, total))
                 
                 win32print.EndPagePrinter(hPrinter)
                 win32print.EndDocPrinter(hPrinter)
@@ -204,8 +195,8 @@ class ReceiptPrinter:
             return False
 
     @staticmethod
-    def print_sales_report(date_str, rows, parent=None):
-        """Print sales report"""
+    def print_sales_report(date_str, rows, total_sum, parent=None):
+        """Print sales report; total_sum is the day's takings in paise"""
         if not rows:
             messagebox.showinfo("No Data", f"No sales found for {date_str}")
             return False
@@ -216,14 +207,12 @@ class ReceiptPrinter:
             f"        {date_str}",
             "="*32
         ]
-        total_sum = 0
         for item_name, quantity, price, total, dt, billing_type in rows:
-            line = f"{item_name[:15]:15} {quantity:>3} x {price:>5.2f} = {total:>6.2f}"
+            line = f"{item_name[:15]:15} {quantity:>3} x {rupees(price):>5} = {rupees(total):>6}"
             report_lines.append(line)
-            total_sum += total
         report_lines += [
             "="*32,
-            f"TOTAL SALES: {total_sum:.2f}",
+            f"TOTAL SALES: {rupees(total_sum)}",
             "="*32,
             "\n\n"
         ]
@@ -305,21 +294,21 @@ class ReceiptPrinter:
             qty = entry['qty']
             price = entry['price']
             item_total = qty * price
-            c.drawString(50, y, f"{item_name}: {qty} x ₹{price:.2f} = ₹{item_total:.2f}")
+            c.drawString(50, y, f"{item_name}: {qty} x ₹{rupees(price)} = ₹{rupees(item_total)}")
             y -= 20
             if y < 50:
                 c.showPage()
                 y = height - 50
 
         c.line(50, y - 10, width - 50, y - 10)
-        c.drawString(50, y - 30, f"TOTAL: ₹{total:.2f}")
+        c.drawString(50, y - 30, f"TOTAL: ₹{rupees(total)}")
 
         c.save()
         messagebox.showinfo("Success", f"Receipt saved as {file_path}")
 
     @staticmethod
-    def save_sales_report_pdf(date_str, rows):
-        """Save sales report as PDF"""
+    def save_sales_report_pdf(date_str, rows, total_sum):
+        """Save sales report as PDF; total_sum is the day's takings in paise"""
         if not rows:
             messagebox.showinfo("No Data", f"No sales found for {date_str}")
             return
@@ -345,18 +334,16 @@ class ReceiptPrinter:
         c.line(50, height - 90, width - 50, height - 90)
 
         y = height - 120
-        total_sum = 0
         for item_name, quantity, price, total, dt, billing_type in rows:
             tag = " [FAST]" if billing_type == "FAST" else ""
-            c.drawString(50, y, f"{item_name}{tag}: {quantity} x ₹{price:.2f} = ₹{total:.2f}")
-            total_sum += total
+            c.drawString(50, y, f"{item_name}{tag}: {quantity} x ₹{rupees(price)} = ₹{rupees(total)}")
             y -= 20
             if y < 50:
                 c.showPage()
                 y = height - 50
 
         c.line(50, y - 10, width - 50, y - 10)
-        c.drawString(50, y - 30, f"TOTAL SALES: ₹{total_sum:.2f}")
+        c.drawString(50, y - 30, f"TOTAL SALES: ₹{rupees(total_sum)}")
 
         c.save()
         messagebox.showinfo("Success", f"Sales report saved as {file_path}")
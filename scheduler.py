@@ -0,0 +1,71 @@
+"""Idle-time job scheduling for BillSoft"""
+import threading
+import time
+
+
+class IdleScheduler:
+    """Runs background jobs while the till is idle
+
+    Any key press or mouse click in the app resets the idle timer. Due jobs
+    run one at a time on a worker thread, so scheduled work never competes
+    with itself for the database.
+    """
+
+    CHECK_INTERVAL_MS = 15000
+
+    def __init__(self, root, idle_seconds=60):
+        self.root = root
+        self.idle_seconds = idle_seconds
+        self.last_activity = time.monotonic()
+        self.jobs = []
+        self.running = None
+        self.paused = False
+
+        for sequence in ("<Key>", "<Button>"):
+            self.root.bind_all(sequence, self.mark_activity, add="+")
+        self.root.after(self.CHECK_INTERVAL_MS, self._tick)
+
+    def mark_activity(self, event=None):
+        """Reset the idle timer"""
+        self.last_activity = time.monotonic()
+
+    def is_idle(self):
+        """True when nobody has touched the till for idle_seconds"""
+        return time.monotonic() - self.last_activity >= self.idle_seconds
+
+    def pause(self):
+        """Start no jobs until resume(); a job already running carries on"""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def add_job(self, name, is_due, func):
+        """Run func on a worker thread whenever is_due() is True and the till is idle
+
+        is_due is polled on the Tk thread and should be cheap.
+        """
+        self.jobs.append({"name": name, "is_due": is_due, "func": func})
+
+    def _tick(self):
+        try:
+            if self.running is None and not self.paused and self.is_idle():
+                for job in self.jobs:
+                    if job["is_due"]():
+                        self._start(job)
+                        break
+        finally:
+            self.root.after(self.CHECK_INTERVAL_MS, self._tick)
+
+    def _start(self, job):
+        self.running = job["name"]
+
+        def worker():
+            try:
+                job["func"]()
+            except Exception as e:
+                print(f"Scheduled job '{job['name']}' failed: {e}")
+            finally:
+                self.running = None
+
+        threading.Thread(target=worker, daemon=True).start()
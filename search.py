@@ -0,0 +1,163 @@
+"""In-memory item search for BillSoft"""
+from bisect import bisect_left, insort
+
+
+# Upper bound on index entries examined for one lookup
+MAX_SCAN = 5000
+
+# Shortest query word that is matched with typo tolerance
+FUZZY_MIN_LENGTH = 4
+
+
+def _deletes(word):
+    """word with each single character removed"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class ItemSearchIndex:
+    """Prefix and typo-tolerant lookup over inventory names and barcodes
+
+    Full names, every word of every name, and barcodes sit in sorted lists,
+    so prefix matches are a bisect plus a short scan: "blu sh" finds
+    "Blue Shirt" and "Shirt Blue". For typos, every word in the vocabulary
+    is also filed under its single-character deletions; two words sharing a
+    deletion are at most one insert, delete, substitution or adjacent swap
+    apart, so "shrit" and "sweter" still find "Shirt" and "Sweater".
+
+    Items are numbered in the order they were indexed; remove() only marks
+    an id dead, so add() and remove() stay cheap between full rebuilds.
+    """
+
+    def __init__(self, inventory=None):
+        self.items = []       # id -> name, None once removed
+        self.ids = {}         # name -> id
+        self.item_words = []  # id -> lowercase words of the name
+        self.names = []       # sorted (lowercase name, id)
+        self.words = []       # sorted (word, id)
+        self.barcodes = []    # sorted (barcode, id)
+        self.deletes = {}     # word or single deletion of it -> {word, ...}
+
+        inventory = inventory or {}
+        for name in sorted(inventory):
+            self._index(name, inventory[name].get("barcode"), insort_lists=False)
+        self.names.sort()
+        self.words.sort()
+        self.barcodes.sort()
+
+    def _index(self, name, barcode, insort_lists=True):
+        item_id = len(self.items)
+        self.items.append(name)
+        self.ids[name] = item_id
+        lowered = name.lower()
+        words = lowered.split()
+        self.item_words.append(words)
+
+        entries = [(word, item_id) for word in set(words)]
+        barcode_entries = [(str(barcode).lower(), item_id)] if barcode else []
+        if insort_lists:
+            insort(self.names, (lowered, item_id))
+            for entry in entries:
+                insort(self.words, entry)
+            for entry in barcode_entries:
+                insort(self.barcodes, entry)
+        else:
+            self.names.append((lowered, item_id))
+            self.words.extend(entries)
+            self.barcodes.extend(barcode_entries)
+
+        for word in words:
+            # Shorter words are one edit away from too much of the vocabulary
+            if len(word) >= FUZZY_MIN_LENGTH - 1 and word not in self.deletes.get(word, ()):
+                for key in _deletes(word) | {word}:
+                    self.deletes.setdefault(key, set()).add(word)
+
+    def add(self, name, barcode=None):
+        """Index one new or changed item"""
+        self.remove(name)
+        self._index(name, barcode)
+
+    def remove(self, name):
+        """Forget an item; its stale entries are skipped at lookup"""
+        item_id = self.ids.pop(name, None)
+        if item_id is not None:
+            self.items[item_id] = None
+
+    def find_barcode(self, barcode):
+        """Name of the item with exactly this barcode, or None"""
+        barcode = str(barcode).lower()
+        start, end = self._prefix_range(self.barcodes, barcode)
+        for code, item_id in self.barcodes[start:end]:
+            if code == barcode and self.items[item_id] is not None:
+                return self.items[item_id]
+        return None
+
+    @staticmethod
+    def _prefix_range(entries, prefix):
+        return bisect_left(entries, (prefix,)), bisect_left(entries, (prefix + "￿",))
+
+    def _word_range(self, word):
+        """Range of self.words holding exactly word (words never contain spaces)"""
+        return bisect_left(self.words, (word,)), bisect_left(self.words, (word + " ",))
+
+    def _close_words(self, word):
+        """Vocabulary words within one edit or adjacent swap of word"""
+        if len(word) < FUZZY_MIN_LENGTH:
+            return set()
+        close = set()
+        for key in _deletes(word) | {word}:
+            close |= self.deletes.get(key, set())
+        return close
+
+    def suggest(self, text, limit=8):
+        """Best matching item names for text, best first"""
+        query = " ".join(text.lower().split())
+        if not query:
+            return []
+
+        found = []
+
+        def add(item_id):
+            name = self.items[item_id]
+            if name is not None and name not in found and len(found) < limit:
+                found.append(name)
+
+        start, end = self._prefix_range(self.barcodes, query)
+        for _, item_id in self.barcodes[start:min(end, start + limit * 2)]:
+            add(item_id)
+
+        # Names starting with the query, alphabetically
+        start, end = self._prefix_range(self.names, query)
+        for _, item_id in self.names[start:min(end, start + limit * 2)]:
+            add(item_id)
+
+        # Names where every query word starts some word of the name; walk
+        # the postings of the rarest query word and check the others
+        query_words = query.split()
+        ranges = [self._prefix_range(self.words, word) for word in query_words]
+        start, end = min(ranges, key=lambda r: r[1] - r[0])
+        self._scan(self.words[start:min(end, start + MAX_SCAN)], query_words, {}, add, found, limit)
+
+        # Typo tolerance: query words may also match a close spelling
+        if len(found) < limit:
+            close = {word: self._close_words(word) for word in query_words}
+            if any(close.values()):
+                # Candidates for a query word: its prefix range plus the
+                # exact ranges of its close spellings; walk the smallest
+                candidates = []
+                for word, prefix_range in zip(query_words, ranges):
+                    candidates.append([prefix_range] + [self._word_range(w) for w in close[word]])
+                spans = min(candidates, key=lambda s: sum(end - start for start, end in s))
+                postings = []
+                for start, end in spans:
+                    postings.extend(self.words[start:min(end, start + MAX_SCAN - len(postings))])
+                self._scan(postings, query_words, close, add, found, limit)
+        return found
+
+    def _scan(self, postings, query_words, close, add, found, limit):
+        for _, item_id in postings:
+            if len(found) >= limit:
+                return
+            name_words = self.item_words[item_id]
+            if all(any(w.startswith(q) or w in close.get(q, ()) for w in name_words)
+                   for q in query_words):
+                add(item_id)
@@ -0,0 +1,245 @@
+"""Opt-in SQL statement timing and slow-query log for BillSoft"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from utils import get_sql_trace_config
+
+
+# Rotating slow-query log: size of each file and rotated files kept
+SLOW_LOG_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
+# Statements listed in the statistics written at exit
+SUMMARY_STATEMENTS = 30
+
+# Statements whose slow runs are logged with their query plan
+PLANNED_STATEMENTS = ("SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE")
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _one_line(sql):
+    return " ".join(sql.split())
+
+
+class SqlTracer:
+    """Collects per-statement latency and row counts from traced connections
+
+    Statements slower than slow_ms are written to a rotating log with
+    their parameters and EXPLAIN QUERY PLAN output, so a query that fell
+    back to a full scan shows up as "SCAN sales". Totals per statement
+    are appended to the same log when the program exits.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.slow = config["slow_ms"] / 1000
+        self.lock = threading.Lock()
+        self.stats = {}  # sql -> [count, total seconds, worst seconds, rows]
+        self.logger = logging.getLogger("billsoft.sql")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            try:
+                handler = RotatingFileHandler(config["log_file"], maxBytes=SLOW_LOG_BYTES,
+                                              backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self.logger.addHandler(handler)
+            except OSError as e:
+                print(f"Slow-query log unavailable: {e}")
+        atexit.register(self.write_summary)
+
+    def record(self, conn, sql, parameters, seconds, rows, many=False):
+        key = _one_line(sql)
+        with self.lock:
+            entry = self.stats.setdefault(key, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += rows
+        if seconds >= self.slow:
+            self._log_slow(conn, sql, parameters, seconds, rows, many)
+
+    def _log_slow(self, conn, sql, parameters, seconds, rows, many):
+        lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S} {conn.db_label} {seconds * 1000:.1f} ms, "
+                 f"{rows} rows{' (executemany)' if many else ''}",
+                 f"  SQL: {_one_line(sql)}"]
+        if parameters and not many:
+            lines.append(f"  Parameters: {parameters!r}")
+        verb = sql.split(None, 1)[0].upper() if sql.strip() else ""
+        if not many and verb in PLANNED_STATEMENTS:
+            lines += self._plan(conn, sql, parameters)
+        self.logger.info("\n".join(lines))
+
+    @staticmethod
+    def _plan(conn, sql, parameters):
+        """EXPLAIN QUERY PLAN of a statement as indented lines"""
+        try:
+            # A plain cursor, so the EXPLAIN itself is not traced
+            rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        except sqlite3.Error as e:
+            return [f"  Plan unavailable: {e}"]
+        depth = {0: 0}
+        lines = ["  Plan:"]
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            lines.append("  " + "  " * depth[node] + detail)
+        return lines
+
+    def summary(self):
+        """(sql, count, total ms, worst ms, rows) per statement, most total time first"""
+        with self.lock:
+            stats = [(sql, count, total * 1000, worst * 1000, rows)
+                     for sql, (count, total, worst, rows) in self.stats.items()]
+        return sorted(stats, key=lambda s: s[2], reverse=True)
+
+    def write_summary(self):
+        stats = self.summary()[:SUMMARY_STATEMENTS]
+        if not stats:
+            return
+        lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S} Statement totals this session "
+                 f"(count, total ms, worst ms, rows):"]
+        for sql, count, total, worst, rows in stats:
+            lines.append(f"  {count:>7} {total:>10.1f} {worst:>8.1f} {rows:>9}  {sql[:200]}")
+        self.logger.info("\n".join(lines))
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including the fetching of its rows"""
+
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        began = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [sql, parameters, time.perf_counter() - began, 0]
+        if self.description is None:
+            self._finish(max(self.rowcount, 0))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        began = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self.connection.tracer.record(self.connection, sql, None, time.perf_counter() - began,
+                                      max(self.rowcount, 0), many=True)
+        return self
+
+    def _fetched(self, began, rows, done):
+        if self._pending:
+            self._pending[2] += time.perf_counter() - began
+            self._pending[3] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        began = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(began, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        began = time.perf_counter()
+        size = self.arraysize if size is None else size
+        rows = super().fetchmany(size)
+        self._fetched(began, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        began = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(began, len(rows), True)
+        return rows
+
+    def __next__(self):
+        began = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(began, 0, True)
+            raise
+        self._fetched(began, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _finish(self, rows=None):
+        """Record the statement in progress, if any"""
+        if not self._pending:
+            return
+        sql, parameters, seconds, fetched = self._pending
+        self._pending = None
+        self.connection.tracer.record(self.connection, sql, parameters, seconds,
+                                      fetched if rows is None else rows)
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors (and execute shortcuts) are timed"""
+
+    tracer = None
+
+    def cursor(self, factory=None):
+        if self.tracer is None:
+            return super().cursor(factory or sqlite3.Cursor)
+        return super().cursor(factory or TracedCursor)
+
+    # The C shortcuts create their cursor without calling cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    # Commits are timed too: under WAL they are where the disk flush happens
+    def commit(self):
+        began = time.perf_counter()
+        super().commit()
+        if self.tracer is not None:
+            self.tracer.record(self, "COMMIT", None, time.perf_counter() - began, 0)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        began = time.perf_counter()
+        result = super().__exit__(exc_type, exc_value, traceback)
+        if self.tracer is not None:
+            self.tracer.record(self, "COMMIT" if exc_type is None else "ROLLBACK", None,
+                               time.perf_counter() - began, 0)
+        return result
+
+
+_traced_classes = {}
+
+
+def get_tracer():
+    """The process-wide tracer, or None unless tracing is enabled in sql_trace_config.json"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            config = get_sql_trace_config()
+            _tracer = SqlTracer(config) if config["enabled"] else False
+        return _tracer or None
+
+
+def connect(db_name, factory=sqlite3.Connection, **kwargs):
+    """sqlite3.connect(), returning a traced connection when tracing is enabled"""
+    tracer = get_tracer()
+    if tracer is None:
+        return sqlite3.connect(db_name, factory=factory, **kwargs)
+    if factory not in _traced_classes:
+        _traced_classes[factory] = type(f"Traced{factory.__name__}", (TracedConnection, factory), {})
+    conn = sqlite3.connect(db_name, factory=_traced_classes[factory], **kwargs)
+    conn.tracer = tracer
+    conn.db_label = os.path.basename(db_name)
+    return conn
@@ -0,0 +1,156 @@
+"""Tk main-loop stall detection for BillSoft"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+# How often the Tk loop reports in, and how often the monitor thread looks
+HEARTBEAT_MS = 100
+MONITOR_INTERVAL = 0.05
+
+# Rotating stall log: size of each file and rotated files kept
+STALL_LOG_BYTES = 1024 * 1024
+STALL_LOG_BACKUPS = 3
+
+# Stalls kept in memory for the summary when nothing is logged
+RECENT_STALLS = 200
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _handler_frames(stack):
+    """BillSoft frames of the Tk callback running on the stack, outermost first"""
+    # Everything up to the innermost tkinter callback wrapper is mainloop's
+    # caller (main.py, login.py), not the handler
+    start = 0
+    for position, frame in enumerate(stack):
+        if frame.name == "__call__" and os.path.basename(os.path.dirname(frame.filename)) == "tkinter":
+            start = position + 1
+    return [frame for frame in stack[start:]
+            if os.path.dirname(os.path.abspath(frame.filename)) == APP_DIR
+            and os.path.basename(frame.filename) != "stall_watchdog.py"]
+
+
+def _frame_name(frame):
+    return f"{os.path.basename(frame.filename)}:{frame.name}"
+
+
+class StallWatchdog:
+    """Detects Tk event-loop stalls and records what the loop was doing
+
+    The Tk thread bumps a heartbeat every HEARTBEAT_MS through root.after.
+    A monitor thread notices when it stops for longer than the threshold
+    and takes the Tk thread's Python stack at that moment, so the stall is
+    attributed to the handler that was running (e.g. app.py:checkout) and
+    the line it was blocked in (e.g. printing.py:print_thermal_receipt).
+    When the loop comes back the stall is written, with its duration, as
+    one JSON line to a rotating log.
+    """
+
+    def __init__(self, root, config):
+        self.root = root
+        self.config = config
+        self.threshold = config["threshold_ms"] / 1000
+        self.thread_id = threading.get_ident()  # Created on the Tk thread
+        self.last_beat = time.monotonic()
+        self.stall = None
+        self.recent = []
+        self.logger = None
+        if config["enabled"]:
+            self.logger = self._open_log(config["log_file"])
+            self.root.after(HEARTBEAT_MS, self._beat)
+            threading.Thread(target=self._monitor, daemon=True).start()
+
+    @staticmethod
+    def _open_log(path):
+        logger = logging.getLogger("billsoft.stalls")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            try:
+                handler = RotatingFileHandler(path, maxBytes=STALL_LOG_BYTES,
+                                              backupCount=STALL_LOG_BACKUPS, encoding="utf-8")
+            except OSError as e:
+                print(f"Stall log unavailable: {e}")
+                return None
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        return logger
+
+    def _beat(self):
+        self.last_beat = time.monotonic()
+        self.root.after(HEARTBEAT_MS, self._beat)
+
+    def _monitor(self):
+        while True:
+            time.sleep(MONITOR_INTERVAL)
+            now = time.monotonic()
+            # The beat is due every HEARTBEAT_MS; anything later is a stall
+            late = now - self.last_beat - HEARTBEAT_MS / 1000
+            if self.stall is None:
+                if late >= self.threshold:
+                    self.stall = self._capture(now - late)
+            elif late < self.threshold:
+                stall, self.stall = self.stall, None
+                stall["ms"] = round((self.last_beat - stall["began"]) * 1000)
+                self._record(stall)
+
+    def _capture(self, began):
+        """Snapshot of the Tk thread's stack while it is blocked"""
+        frame = sys._current_frames().get(self.thread_id)
+        stack = traceback.extract_stack(frame) if frame else []
+        own = _handler_frames(stack)
+        return {
+            "began": began,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "handler": _frame_name(own[0]) if own else "unknown",
+            "blocked_in": _frame_name(own[-1]) if own else "unknown",
+            "stack": traceback.format_list(stack[-15:]),
+        }
+
+    def _record(self, stall):
+        del stall["began"]
+        self.recent = (self.recent + [stall])[-RECENT_STALLS:]
+        if self.logger:
+            self.logger.info(json.dumps(stall))
+
+    def stalls(self):
+        """Every stall in the log files (or this session's, without a log), oldest first"""
+        path = self.config["log_file"]
+        paths = [f"{path}.{n}" for n in range(STALL_LOG_BACKUPS, 0, -1)] + [path]
+        stalls = []
+        for log_path in paths:
+            if not os.path.exists(log_path):
+                continue
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        stalls.append(json.loads(line))
+                    except ValueError:
+                        continue
+        return stalls or list(self.recent)
+
+    def summary(self):
+        """Per-handler totals as dicts sorted by total stalled time, worst first
+
+        Each has handler, count, total_ms, worst_ms, last (time) and worst
+        (the longest stall's record, with its stack).
+        """
+        groups = {}
+        for stall in self.stalls():
+            group = groups.setdefault(stall["handler"], {
+                "handler": stall["handler"], "count": 0, "total_ms": 0,
+                "worst_ms": 0, "last": "", "worst": None})
+            group["count"] += 1
+            group["total_ms"] += stall["ms"]
+            group["last"] = max(group["last"], stall["time"])
+            if stall["ms"] >= group["worst_ms"]:
+                group["worst_ms"] = stall["ms"]
+                group["worst"] = stall
+        return sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
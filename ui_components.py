@@ -5,6 +5,7 @@ from tkcalendar import DateEntry
 from datetime import datetime
 import webbrowser
 import os
+import threading
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 import tempfile
@@ -18,7 +19,7 @@ except ImportError:
 from utils import (
     resource_path, get_printing_config, save_printing_config,
     is_printer_online, get_available_printers, format_enhanced_receipt,
-    WINDOWS_PRINT_AVAILABLE, CONFIG_FILE
+    save_backup_config, to_paise, rupees, WINDOWS_PRINT_AVAILABLE, CONFIG_FILE
 )
 
 try:
@@ -249,7 +250,7 @@ class HelpDialog:
     """Help and documentation dialog"""
     
     @staticmethod
-    def show(parent):
+    def show(parent, watchdog=None, registry=None):
         popup = tk.Toplevel(parent)
         popup.title("Help")
         popup.geometry("560x620")
@@ -296,7 +297,7 @@ class HelpDialog:
             "♻ RESTORE DATABASE\n"
             "• Restore is used only if data is lost or system is changed\n"
             "• ALWAYS take backup before restoring\n"
-            "• Restart the application after restore\n\n"
+            "• Data reloads automatically after restore, no restart needed\n\n"
             "⚠ IMPORTANT WARNINGS\n"
             "• Do NOT use Fast Billing for stock items\n"
             "• Do NOT restore without backup\n"
@@ -322,6 +323,14 @@ class HelpDialog:
         tk.Button(btn_frame, text="📘 Open User Guide", bg="#2196F3", fg="white",
                  font=("Arial", 11, "bold"), padx=12, pady=6, command=open_user_guide).pack(side=tk.LEFT, padx=10)
 
+        if watchdog is not None:
+            tk.Button(btn_frame, text="🩺 Freeze Log", font=("Arial", 11), padx=12, pady=6,
+                     command=lambda: StallReportDialog.show(popup, watchdog)).pack(side=tk.LEFT, padx=(0, 10))
+
+        if registry is not None:
+            tk.Button(btn_frame, text="📈 Lane Stats", font=("Arial", 11), padx=12, pady=6,
+                     command=lambda: LaneStatsDialog.show(popup, registry)).pack(side=tk.LEFT, padx=(0, 10))
+
         tk.Button(btn_frame, text="❌ Close", font=("Arial", 11), padx=12, pady=6,
                  command=popup.destroy).pack(side=tk.LEFT)
 
@@ -337,14 +346,209 @@ class HelpDialog:
                 font=("Arial", 10)).pack(anchor="w")
 
 
+class StallReportDialog:
+    """Summary of recorded main-loop stalls, worst handler first, with stacks"""
+
+    @staticmethod
+    def show(parent, watchdog):
+        popup = tk.Toplevel(parent)
+        popup.title("Freeze Log")
+        popup.geometry("820x560")
+        popup.transient(parent)
+        popup.grab_set()
+
+        tk.Label(popup, text=f"Screen freezes longer than {watchdog.config['threshold_ms']} ms",
+                 font=("Arial", 13, "bold")).pack(pady=10)
+
+        columns = ("handler", "count", "total", "worst", "last")
+        tree = ttk.Treeview(popup, columns=columns, show="headings", height=8)
+        for column, heading, width in zip(columns, ("Handler", "Freezes", "Total (s)", "Worst (ms)", "Last"),
+                                          (280, 80, 90, 100, 160)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor="w" if column == "handler" else "center")
+        tree.pack(fill=tk.X, padx=15)
+
+        tk.Label(popup, text="Stack of the longest freeze:", font=("Arial", 10)).pack(anchor="w", padx=15, pady=(10, 0))
+        stack_box = tk.Text(popup, font=("Courier New", 9), height=16, wrap=tk.NONE)
+        stack_box.pack(fill=tk.BOTH, expand=True, padx=15, pady=5)
+
+        groups = watchdog.summary()
+        for group in groups:
+            tree.insert("", "end", values=(group["handler"], group["count"],
+                                           f"{group['total_ms'] / 1000:.1f}", group["worst_ms"],
+                                           group["last"]))
+        if not groups:
+            stack_box.insert(tk.END, "No freezes recorded.")
+
+        def show_stack(event=None):
+            selection = tree.selection()
+            if not selection:
+                return
+            worst = groups[tree.index(selection[0])]["worst"]
+            stack_box.delete("1.0", tk.END)
+            stack_box.insert(tk.END, f"{worst['time']}  {worst['ms']} ms  in {worst['blocked_in']}\n\n")
+            stack_box.insert(tk.END, "".join(worst["stack"]))
+
+        tree.bind("<<TreeviewSelect>>", show_stack)
+        if groups:
+            tree.selection_set(tree.get_children()[0])
+
+        tk.Button(popup, text="Close", font=("Arial", 11), padx=12,
+                  command=popup.destroy).pack(pady=10)
+
+
+class LaneStatsDialog:
+    """Live view of this lane's metrics since start-up"""
+
+    REFRESH_MS = 2000
+
+    @staticmethod
+    def show(parent, registry):
+        popup = tk.Toplevel(parent)
+        popup.title("Lane Stats")
+        popup.geometry("760x420")
+        popup.transient(parent)
+
+        lane = dict(registry.const_labels).get("lane", "")
+        tk.Label(popup, text=f"Lane {lane} since start-up", font=("Arial", 13, "bold")).pack(pady=10)
+
+        columns = ("metric", "count", "mean", "p50", "p95", "max")
+        tree = ttk.Treeview(popup, columns=columns, show="headings", height=14)
+        for column, heading, width in zip(columns, ("Metric", "Count", "Mean", "p50 ≤", "p95 ≤", "Max"),
+                                          (300, 80, 90, 80, 80, 90)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor="w" if column == "metric" else "center")
+        tree.pack(fill=tk.BOTH, expand=True, padx=15)
+
+        def value_text(metric, value):
+            # Latencies are kept in seconds and shown in milliseconds
+            if metric.name.endswith("_seconds"):
+                return f"{value * 1000:.0f} ms"
+            return f"{value:g}" if isinstance(value, int) else f"{value:.1f}"
+
+        def refresh():
+            if not popup.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for metric in registry.metrics:
+                title = metric.name.replace("billsoft_", "")
+                for row in metric.rows():
+                    name = title + (f" ({', '.join(row[0])})" if row[0] else "")
+                    if metric.kind == "counter":
+                        tree.insert("", "end", values=(name, row[1], "", "", "", ""))
+                    else:
+                        _, count, mean, p50, p95, worst = row
+                        tree.insert("", "end", values=(name, count, value_text(metric, mean),
+                                                       value_text(metric, p50), value_text(metric, p95),
+                                                       value_text(metric, worst)))
+            popup.after(LaneStatsDialog.REFRESH_MS, refresh)
+
+        refresh()
+        tk.Button(popup, text="Close", font=("Arial", 11), padx=12,
+                  command=popup.destroy).pack(pady=10)
+
+
+class ProgressDialog:
+    """Progress bar for work running on a background thread; non-modal unless asked"""
+
+    @staticmethod
+    def run(parent, title, message, work, on_success=None, on_error=None, modal=False):
+        """Run work(report) on a worker thread and show its progress.
+
+        work receives a report(done, total) callback it may call from the
+        worker; the bar is refreshed from the Tk loop, so the worker never
+        touches widgets. on_success(result) or on_error(exc) is called on
+        the Tk thread once the work finishes. A modal dialog keeps the rest
+        of the app from taking input until then.
+        """
+        popup = tk.Toplevel(parent)
+        popup.title(title)
+        popup.geometry("380x140")
+        popup.resizable(False, False)
+        popup.transient(parent)
+        if modal:
+            popup.grab_set()
+        popup.protocol("WM_DELETE_WINDOW", lambda: None)  # Can't cancel mid-copy
+
+        tk.Label(popup, text=message, font=("Arial", 11)).pack(pady=(15, 8))
+        progress = ttk.Progressbar(popup, orient='horizontal', length=320,
+                                   mode='determinate', maximum=100)
+        progress.pack(pady=5)
+        percent_label = tk.Label(popup, text="0%", font=("Arial", 10))
+        percent_label.pack()
+
+        state = {"done": 0, "total": 0, "finished": False, "result": None, "error": None}
+
+        def report(done, total):
+            state["done"] = done
+            state["total"] = total
+
+        def worker():
+            try:
+                state["result"] = work(report)
+            except Exception as e:
+                state["error"] = e
+            state["finished"] = True
+
+        def poll():
+            if state["total"]:
+                percent = state["done"] * 100 / state["total"]
+                progress["value"] = percent
+                percent_label.config(text=f"{percent:.0f}%")
+            if not state["finished"]:
+                popup.after(100, poll)
+                return
+            popup.destroy()
+            if state["error"] is not None:
+                if on_error:
+                    on_error(state["error"])
+            elif on_success:
+                on_success(state["result"])
+
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+
+class BackgroundTask:
+    """Database reads that run off the Tk thread without a progress window"""
+
+    @staticmethod
+    def run(widget, work, on_success, on_error=None):
+        """Run work() on a worker thread; on_success(result) or on_error(exc) follows on the Tk thread"""
+        state = {"finished": False, "result": None, "error": None}
+
+        def worker():
+            try:
+                state["result"] = work()
+            except Exception as e:
+                state["error"] = e
+            state["finished"] = True
+
+        def poll():
+            if not widget.winfo_exists():
+                return
+            if not state["finished"]:
+                widget.after(50, poll)
+            elif state["error"] is not None:
+                if on_error:
+                    on_error(state["error"])
+                else:
+                    messagebox.showerror("Database Error", str(state["error"]), parent=widget)
+            else:
+                on_success(state["result"])
+
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+
 class BackupDialog:
     """Backup and restore dialog"""
     
     @staticmethod
-    def show(parent, db):
+    def show(parent, db, backups=None, on_restored=None, before_restore=None):
         popup = tk.Toplevel(parent)
         popup.title("Backup & Restore")
-        popup.geometry("350x220")
+        popup.geometry("350x340" if backups else "350x220")
         popup.resizable(False, False)
         popup.transient(parent)
         popup.grab_set()
@@ -354,11 +558,258 @@ class BackupDialog:
 
         tk.Button(popup, text="📦 Backup Database", font=("Arial", 11, "bold"),
                  bg="#4CAF50", fg="white", pady=10,
-                 command=db.backup_database).pack(fill=tk.X, padx=30, pady=8)
+                 command=lambda: BackupDialog.backup(parent, popup, db)).pack(fill=tk.X, padx=30, pady=8)
 
         tk.Button(popup, text="♻ Restore Database", font=("Arial", 11, "bold"),
                  bg="#F44336", fg="white", pady=10,
-                 command=db.restore_database).pack(fill=tk.X, padx=30, pady=8)
+                 command=lambda: BackupDialog.restore(parent, popup, db, on_restored, before_restore)).pack(fill=tk.X, padx=30, pady=8)
+
+        if backups:
+            tk.Button(popup, text="🕒 Restore to Point...", font=("Arial", 11, "bold"),
+                     bg="#FF9800", fg="white", pady=10,
+                     command=lambda: RestorePointDialog.show(popup, db, backups, on_restored,
+                                                              before_restore)).pack(fill=tk.X, padx=30, pady=8)
+
+            tk.Button(popup, text="⚙ Backup Schedule", font=("Arial", 10),
+                     command=lambda: BackupScheduleDialog.show(popup, backups)).pack(pady=4)
+
+    @staticmethod
+    def backup(parent, popup, db):
+        """Ask for a destination and run an online backup in the background"""
+        backup_path = filedialog.asksaveasfilename(
+            parent=popup,
+            defaultextension=".db",
+            initialfile=f"Backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db",
+            filetypes=[("Database Backup", "*.db")],
+            title="Save Backup As"
+        )
+        if not backup_path:
+            return
+
+        # Close the modal dialog so billing can continue during the copy
+        popup.destroy()
+        ProgressDialog.run(
+            parent, "Backup", "Backing up database...",
+            lambda report: db.online_backup(backup_path, report),
+            on_success=lambda path: messagebox.showinfo(
+                "Backup Successful", f"Backup saved and verified:\n{path}"),
+            on_error=lambda e: messagebox.showerror("Backup Failed", str(e))
+        )
+
+    @staticmethod
+    def restore(parent, popup, db, on_restored=None, before_restore=None):
+        """Ask for a backup file and restore it in place"""
+        restore_path = filedialog.askopenfilename(
+            parent=popup,
+            filetypes=[("Database Backup", "*.db")],
+            title="Select Backup File"
+        )
+        if not restore_path:
+            return
+
+        if not messagebox.askyesno("Confirm Restore",
+                "Restoring will OVERWRITE current data.\n\nContinue?", parent=popup):
+            return
+
+        popup.destroy()
+        BackupDialog.run_restore(parent, db, lambda: restore_path, on_restored, before_restore)
+
+    @staticmethod
+    def run_restore(parent, db, get_path, on_restored=None, before_restore=None):
+        """Restore the file returned by get_path() without restarting the app
+
+        get_path runs on the worker thread, so it may build the file first.
+        The copy write-locks Data.db until it is done, so the progress
+        dialog is modal. before_restore() may hold other writers off: it
+        returns a function that ends the hold, or None to call the
+        restore off.
+        """
+        end_hold = before_restore() if before_restore else (lambda: None)
+        if end_hold is None:
+            return
+
+        def finish(result):
+            db.reopen()
+            end_hold()
+            if on_restored:
+                on_restored()
+            messagebox.showinfo("Restore Successful", "Database restored successfully.")
+
+        def failed(e):
+            end_hold()
+            messagebox.showerror("Restore Failed", str(e))
+
+        ProgressDialog.run(
+            parent, "Restore", "Restoring database...",
+            lambda report: db.hot_restore(get_path(), report),
+            on_success=finish, on_error=failed, modal=True
+        )
+
+
+class RestorePointDialog:
+    """Pick a scheduled backup point and restore it"""
+
+    @staticmethod
+    def show(parent, db, backups, on_restored=None, before_restore=None):
+        points = backups.points()
+        if not points:
+            messagebox.showinfo("No Backups", "No scheduled backups have been taken yet.",
+                                parent=parent)
+            return
+
+        popup = tk.Toplevel(parent)
+        popup.title("Restore to Point")
+        popup.geometry("420x380")
+        popup.transient(parent)
+        popup.grab_set()
+
+        tk.Label(popup, text="Select a backup point:", font=("Arial", 12, "bold")).pack(pady=10)
+
+        listbox = tk.Listbox(popup, font=("Consolas", 10), height=14)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=15)
+        newest_first = list(reversed(points))
+        for point in newest_first:
+            kind = "FULL" if point["kind"] == "full" else "incr"
+            listbox.insert(tk.END, f"{point['created']}  {kind:<4}  {point['size'] / 1024:>9.1f} KB")
+        listbox.selection_set(0)
+
+        def restore():
+            selection = listbox.curselection()
+            if not selection:
+                return
+            point = newest_first[selection[0]]
+            if not messagebox.askyesno("Confirm Restore",
+                    f"Restore data as of {point['created']}?\n\n"
+                    "Restoring will OVERWRITE current data.", parent=popup):
+                return
+            popup.destroy()
+            BackupDialog.run_restore(parent, db, lambda: backups.materialize(point), on_restored,
+                                     before_restore)
+
+        tk.Button(popup, text="♻ Restore Selected", command=restore,
+                 bg="#F44336", fg="white", font=("Arial", 11, "bold"),
+                 pady=6).pack(fill=tk.X, padx=15, pady=10)
+
+
+class BackupScheduleDialog:
+    """Settings for automatic backups and retention"""
+
+    @staticmethod
+    def show(parent, backups):
+        popup = tk.Toplevel(parent)
+        popup.title("Backup Schedule")
+        popup.geometry("360x300")
+        popup.resizable(False, False)
+        popup.transient(parent)
+        popup.grab_set()
+
+        config = backups.config
+        enabled_var = tk.BooleanVar(value=config["enabled"])
+        full_var = tk.IntVar(value=config["full_interval_hours"])
+        incr_var = tk.IntVar(value=config["incremental_interval_minutes"])
+        keep_var = tk.IntVar(value=config["keep_full"])
+
+        tk.Checkbutton(popup, text="Automatic backups while idle", variable=enabled_var,
+                      font=("Arial", 11)).pack(anchor="w", padx=20, pady=(15, 10))
+
+        form = tk.Frame(popup)
+        form.pack(fill=tk.X, padx=20)
+        fields = [
+            ("Full backup every (hours):", full_var, 1, 168),
+            ("Incremental every (minutes):", incr_var, 5, 1440),
+            ("Full backups to keep:", keep_var, 1, 100),
+        ]
+        for row, (label, var, low, high) in enumerate(fields):
+            tk.Label(form, text=label, font=("Arial", 10)).grid(row=row, column=0, sticky="w", pady=6)
+            tk.Spinbox(form, from_=low, to=high, textvariable=var, width=8,
+                       font=("Arial", 10)).grid(row=row, column=1, padx=10)
+
+        def save():
+            try:
+                config.update({
+                    "enabled": enabled_var.get(),
+                    "full_interval_hours": full_var.get(),
+                    "incremental_interval_minutes": incr_var.get(),
+                    "keep_full": keep_var.get()
+                })
+            except tk.TclError:
+                messagebox.showwarning("Invalid", "Please enter whole numbers.", parent=popup)
+                return
+            if save_backup_config(config):
+                popup.destroy()
+            else:
+                messagebox.showerror("Save Error", "Failed to save settings", parent=popup)
+
+        tk.Button(popup, text="💾 Save", command=save, bg="#4CAF50", fg="white",
+                 font=("Arial", 11, "bold"), pady=6).pack(fill=tk.X, padx=20, pady=20)
+
+
+class SalesExportDialog:
+    """Export sales lines for a date range for accounting"""
+
+    @staticmethod
+    def show(parent, exporter):
+        from exporter import EXPORT_FORMATS
+
+        popup = tk.Toplevel(parent)
+        popup.title("Export Sales")
+        popup.geometry("380x300")
+        popup.resizable(False, False)
+        popup.transient(parent)
+        popup.grab_set()
+
+        tk.Label(popup, text="📤 Export Sales Data", font=("Arial", 14, "bold")).pack(pady=10)
+
+        form = tk.Frame(popup)
+        form.pack(padx=20, pady=5)
+        from_var = tk.StringVar()
+        to_var = tk.StringVar()
+        tk.Label(form, text="From:", font=("Arial", 11)).grid(row=0, column=0, sticky="w", pady=4)
+        DateEntry(form, textvariable=from_var, date_pattern='yyyy-mm-dd',
+                  font=("Arial", 11), width=12).grid(row=0, column=1, padx=5)
+        tk.Label(form, text="To:", font=("Arial", 11)).grid(row=1, column=0, sticky="w", pady=4)
+        DateEntry(form, textvariable=to_var, date_pattern='yyyy-mm-dd',
+                  font=("Arial", 11), width=12).grid(row=1, column=1, padx=5)
+
+        format_var = tk.StringVar(value=EXPORT_FORMATS[0])
+        tk.Label(form, text="Format:", font=("Arial", 11)).grid(row=2, column=0, sticky="w", pady=4)
+        ttk.Combobox(form, textvariable=format_var, values=EXPORT_FORMATS, state="readonly",
+                     width=12).grid(row=2, column=1, padx=5)
+
+        extensions = {"CSV": ".csv", "JSON Lines": ".jsonl", "Parquet": ".parquet"}
+
+        def export():
+            date_from, date_to = from_var.get().strip(), to_var.get().strip()
+            fmt = format_var.get()
+            if date_from > date_to:
+                messagebox.showwarning("Invalid Range", "'From' date is after 'To' date!",
+                                       parent=popup)
+                return
+            path = filedialog.asksaveasfilename(
+                parent=popup,
+                defaultextension=extensions[fmt],
+                initialfile=f"sales_{date_from}_{date_to}{extensions[fmt]}",
+                filetypes=[(fmt, "*" + extensions[fmt])],
+                title="Export Sales As"
+            )
+            if not path:
+                return
+
+            resume = exporter.can_resume(path, fmt, date_from, date_to) and messagebox.askyesno(
+                "Resume Export", "An unfinished export to this file was found.\n\n"
+                "Resume where it stopped?", parent=popup)
+
+            popup.destroy()
+            ProgressDialog.run(
+                parent, "Export Sales", f"Exporting sales {date_from} to {date_to}...",
+                lambda report: exporter.run(path, fmt, date_from, date_to, report, resume),
+                on_success=lambda rows: messagebox.showinfo(
+                    "Export Complete", f"Exported {rows} sales lines to:\n{path}"),
+                on_error=lambda e: messagebox.showerror("Export Failed", str(e))
+            )
+
+        tk.Button(popup, text="Export", command=export, bg="#4CAF50", fg="white",
+                 font=("Arial", 12, "bold"), pady=6).pack(fill=tk.X, padx=20, pady=15)
 
 
 class PrintPreviewDialog:
@@ -402,6 +853,474 @@ class PrintPreviewDialog:
                  padx=20, pady=8).pack(side=tk.LEFT, padx=5)
 
 
+class ReceiptLookupDialog:
+    """Find a past bill by number, date or amount and reprint it"""
+
+    @staticmethod
+    def show(parent, db, callback):
+        popup = tk.Toplevel(parent)
+        popup.title("Find Bill")
+        popup.geometry("520x520")
+        popup.transient(parent)
+        popup.grab_set()
+
+        form = tk.Frame(popup)
+        form.pack(fill=tk.X, padx=15, pady=10)
+
+        bill_var = tk.StringVar()
+        date_var = tk.StringVar()
+        amount_var = tk.StringVar()
+
+        tk.Label(form, text="Bill No:", font=("Arial", 11)).grid(row=0, column=0, sticky="w", pady=4)
+        bill_entry = tk.Entry(form, textvariable=bill_var, font=("Arial", 11), width=12)
+        bill_entry.grid(row=0, column=1, sticky="w", padx=5)
+        bill_entry.focus_set()
+
+        tk.Label(form, text="Date (yyyy-mm-dd):", font=("Arial", 11)).grid(row=1, column=0, sticky="w", pady=4)
+        tk.Entry(form, textvariable=date_var, font=("Arial", 11),
+                 width=12).grid(row=1, column=1, sticky="w", padx=5)
+
+        tk.Label(form, text="Amount:", font=("Arial", 11)).grid(row=2, column=0, sticky="w", pady=4)
+        tk.Entry(form, textvariable=amount_var, font=("Arial", 11),
+                 width=12).grid(row=2, column=1, sticky="w", padx=5)
+
+        listbox = tk.Listbox(popup, font=("Consolas", 11), height=14)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=15)
+        results = []
+
+        def search(event=None):
+            listbox.delete(0, tk.END)
+            results.clear()
+            bill = bill_var.get().strip()
+            amount = amount_var.get().strip()
+            try:
+                if bill:
+                    cart, total, timestamp = db.get_receipt(int(bill))
+                    rows = [(int(bill), timestamp, total, len(cart))] if cart else []
+                else:
+                    rows = db.find_receipts(date_var.get().strip() or None,
+                                            to_paise(amount) if amount else None)
+            except (ValueError, ArithmeticError):
+                messagebox.showwarning("Invalid", "Bill number and amount must be numbers.",
+                                       parent=popup)
+                return
+            for bill_no, timestamp, total, item_count in rows:
+                results.append(bill_no)
+                listbox.insert(tk.END, f"#{bill_no:<8} {timestamp}  {item_count:>3} items  ₹{rupees(total):>10}")
+            if not rows:
+                listbox.insert(tk.END, "No bills found.")
+
+        def reprint():
+            selection = listbox.curselection()
+            if not selection or selection[0] >= len(results):
+                messagebox.showwarning("Warning", "Select a bill to reprint!", parent=popup)
+                return
+            cart, total, timestamp = db.get_receipt(results[selection[0]])
+            popup.destroy()
+            PrintPreviewDialog.show(parent, cart, total, callback)
+
+        bill_entry.bind("<Return>", search)
+        btn_frame = tk.Frame(popup)
+        btn_frame.pack(fill=tk.X, padx=15, pady=10)
+        tk.Button(btn_frame, text="Search", command=search, bg="#2196F3", fg="white",
+                 font=("Arial", 11, "bold"), padx=15).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Reprint Selected", command=reprint, bg="#4CAF50", fg="white",
+                 font=("Arial", 11, "bold"), padx=15).pack(side=tk.LEFT, padx=5)
+
+
+class ParkedCartsDialog:
+    """Pick a parked cart to recall; returns its id, or None"""
+
+    @staticmethod
+    def show(parent, carts):
+        popup = tk.Toplevel(parent)
+        popup.title("Parked Carts")
+        popup.geometry("560x360")
+        popup.transient(parent)
+        popup.grab_set()
+
+        tk.Label(popup, text="Select a cart and press Enter to recall it",
+                 font=("Arial", 12)).pack(pady=10)
+
+        listbox = tk.Listbox(popup, font=("Consolas", 11), height=10)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=15)
+        for park_id, label, parked_at, item_count, total in carts:
+            listbox.insert(tk.END, f"{parked_at[11:16]}  {label[:24]:<24} {item_count:>3} items  ₹{rupees(total):>9}")
+        listbox.selection_set(0)
+        listbox.focus_set()
+
+        result = {"id": None}
+
+        def recall(event=None):
+            selection = listbox.curselection()
+            if not selection:
+                return
+            result["id"] = carts[selection[0]][0]
+            popup.destroy()
+
+        listbox.bind("<Return>", recall)
+        listbox.bind("<Double-Button-1>", recall)
+        popup.bind("<Escape>", lambda event: popup.destroy())
+        tk.Button(popup, text="Recall", command=recall, bg="#4CAF50", fg="white",
+                 font=("Arial", 11, "bold"), padx=15).pack(pady=10)
+
+        parent.wait_window(popup)
+        return result["id"]
+
+
+class LockScreen:
+    """Cover the till until a cashier logs in; returns the username that did"""
+
+    @staticmethod
+    def show(parent, auth, cashier=None):
+        popup = tk.Toplevel(parent, bg="#0a0a15")
+        popup.title("BillSoft Locked")
+        popup.geometry(f"{parent.winfo_width()}x{parent.winfo_height()}"
+                       f"+{parent.winfo_rootx()}+{parent.winfo_rooty()}")
+        popup.transient(parent)
+        popup.grab_set()
+        # Only a login closes it
+        popup.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        card = tk.Frame(popup, bg="#1a1a2e")
+        card.place(relx=0.5, rely=0.5, anchor="center", width=420, height=380)
+        tk.Label(card, text="🔒 TILL LOCKED", font=("Segoe UI", 22, "bold"),
+                 bg="#1a1a2e", fg="#00d4ff").pack(pady=(30, 5))
+        tk.Label(card, text=f"Last cashier: {cashier}" if cashier else "Log in to continue",
+                 font=("Segoe UI", 11), bg="#1a1a2e", fg="#888").pack(pady=(0, 20))
+
+        tk.Label(card, text="Username", font=("Segoe UI", 10),
+                 bg="#1a1a2e", fg="#fff", anchor="w").pack(fill="x", padx=40)
+        username = tk.Entry(card, font=("Segoe UI", 13), bg="#16213e", fg="white",
+                            insertbackground="#00d4ff", bd=0, relief=tk.FLAT)
+        username.pack(ipady=8, fill="x", padx=40, pady=(5, 10))
+        tk.Label(card, text="Password", font=("Segoe UI", 10),
+                 bg="#1a1a2e", fg="#fff", anchor="w").pack(fill="x", padx=40)
+        password = tk.Entry(card, font=("Segoe UI", 13), bg="#16213e", fg="white",
+                            insertbackground="#00d4ff", bd=0, show="●", relief=tk.FLAT)
+        password.pack(ipady=8, fill="x", padx=40, pady=5)
+
+        result = {"user": None}
+
+        def unlock(event=None):
+            user = username.get().strip()
+            if auth.login(user, password.get().strip()):
+                result["user"] = user
+                popup.destroy()
+                return
+            password.delete(0, tk.END)
+            messagebox.showerror("Error", "Invalid username or password", parent=popup)
+            password.focus_set()
+
+        if cashier:
+            username.insert(0, cashier)
+            password.focus_set()
+        else:
+            username.focus_set()
+        username.bind("<Return>", lambda event: password.focus_set())
+        password.bind("<Return>", unlock)
+        tk.Button(card, text="UNLOCK", command=unlock, bg="#00d4ff", fg="#000",
+                  font=("Segoe UI", 13, "bold"), bd=0, cursor="hand2",
+                  relief=tk.FLAT).pack(fill="x", padx=40, pady=(20, 10), ipady=8)
+
+        parent.wait_window(popup)
+        return result["user"]
+
+
+class SalesSearchDialog:
+    """Search sales lines across all dates by item name, with totals"""
+
+    PAGE_SIZE = 50
+
+    @staticmethod
+    def show(parent, db):
+        popup = tk.Toplevel(parent)
+        popup.title("Search Sales")
+        popup.geometry("820x560")
+        popup.transient(parent)
+
+        form = tk.Frame(popup)
+        form.pack(fill=tk.X, padx=15, pady=10)
+        text_var = tk.StringVar()
+        from_var = tk.StringVar()
+        to_var = tk.StringVar()
+
+        tk.Label(form, text="Item:", font=("Arial", 11)).grid(row=0, column=0, sticky="w", pady=4)
+        text_entry = tk.Entry(form, textvariable=text_var, font=("Arial", 11), width=30)
+        text_entry.grid(row=0, column=1, columnspan=3, sticky="w", padx=5)
+        text_entry.focus_set()
+        tk.Label(form, text="From (yyyy-mm-dd):", font=("Arial", 11)).grid(row=1, column=0, sticky="w", pady=4)
+        tk.Entry(form, textvariable=from_var, font=("Arial", 11),
+                 width=12).grid(row=1, column=1, sticky="w", padx=5)
+        tk.Label(form, text="To:", font=("Arial", 11)).grid(row=1, column=2, sticky="w", pady=4)
+        tk.Entry(form, textvariable=to_var, font=("Arial", 11),
+                 width=12).grid(row=1, column=3, sticky="w", padx=5)
+
+        columns = ("bill", "date", "item", "qty", "price", "total")
+        tree = ttk.Treeview(popup, columns=columns, show="headings", height=15)
+        for column, heading, width in zip(columns, ("Bill", "Date", "Item", "Qty", "Price", "Total"),
+                                          (70, 150, 300, 60, 90, 100)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor="w" if column == "item" else "center")
+        tree.pack(fill=tk.BOTH, expand=True, padx=15)
+
+        totals_label = tk.Label(popup, text="", font=("Arial", 11, "bold"))
+        totals_label.pack(pady=5)
+
+        # Keyset paging: the before_id each visited page started from
+        state = {"query": None, "pages": [], "last_id": None, "more": False}
+
+        def load_page(before_id):
+            text, date_from, date_to = state["query"]
+            query = state["query"]
+            prev_btn.config(state=tk.DISABLED)
+            next_btn.config(state=tk.DISABLED)
+            BackgroundTask.run(
+                popup,
+                lambda: db.search_sales(text, date_from, date_to, before_id,
+                                        SalesSearchDialog.PAGE_SIZE + 1),
+                lambda rows: show_page(query, rows))
+
+        def show_page(query, rows):
+            if query != state["query"]:
+                return  # A newer search replaced this one
+            state["more"] = len(rows) > SalesSearchDialog.PAGE_SIZE
+            rows = rows[:SalesSearchDialog.PAGE_SIZE]
+            tree.delete(*tree.get_children())
+            for sale_id, bill_no, date_time, item_name, qty, price, total in rows:
+                tree.insert("", "end", values=(bill_no or "", date_time, item_name, qty,
+                                               f"₹{rupees(price)}", f"₹{rupees(total)}"))
+            state["last_id"] = rows[-1][0] if rows else None
+            prev_btn.config(state=tk.NORMAL if len(state["pages"]) > 1 else tk.DISABLED)
+            next_btn.config(state=tk.NORMAL if state["more"] else tk.DISABLED)
+
+        def search(event=None):
+            text = text_var.get().strip()
+            date_from, date_to = from_var.get().strip() or None, to_var.get().strip() or None
+            for value in (date_from, date_to):
+                if value:
+                    try:
+                        datetime.strptime(value, "%Y-%m-%d")
+                    except ValueError:
+                        messagebox.showwarning("Invalid Date", "Dates must be yyyy-mm-dd.",
+                                               parent=popup)
+                        return
+            state["query"] = (text, date_from, date_to)
+            state["pages"] = [None]
+            totals_label.config(text="Searching...")
+            query = state["query"]
+
+            def show_totals(totals):
+                if query == state["query"]:
+                    lines, qty, amount = totals
+                    totals_label.config(
+                        text=f"{lines} lines   •   Qty sold: {qty}   •   Amount: ₹{rupees(amount)}")
+
+            BackgroundTask.run(popup, lambda: db.search_sales_totals(text, date_from, date_to),
+                               show_totals)
+            load_page(None)
+
+        def next_page():
+            if state["more"]:
+                state["pages"].append(state["last_id"])
+                load_page(state["last_id"])
+
+        def prev_page():
+            if len(state["pages"]) > 1:
+                state["pages"].pop()
+                load_page(state["pages"][-1])
+
+        text_entry.bind("<Return>", search)
+        btn_frame = tk.Frame(popup)
+        btn_frame.pack(fill=tk.X, padx=15, pady=10)
+        tk.Button(btn_frame, text="Search", command=search, bg="#2196F3", fg="white",
+                 font=("Arial", 11, "bold"), padx=15).pack(side=tk.LEFT, padx=5)
+        next_btn = tk.Button(btn_frame, text="Next ▶", command=next_page, state=tk.DISABLED,
+                             font=("Arial", 11), padx=10)
+        next_btn.pack(side=tk.RIGHT, padx=5)
+        prev_btn = tk.Button(btn_frame, text="◀ Prev", command=prev_page, state=tk.DISABLED,
+                             font=("Arial", 11), padx=10)
+        prev_btn.pack(side=tk.RIGHT, padx=5)
+
+
+class StockHistoryDialog:
+    """Stock movements of one item, its stock on any past day, and manual entries"""
+
+    ENTRY_REASONS = ("RECEIPT", "RETURN", "ADJUST")
+
+    @staticmethod
+    def show(parent, db, item, on_change=None):
+        popup = tk.Toplevel(parent)
+        popup.title(f"Stock History - {item}")
+        popup.geometry("640x560")
+        popup.transient(parent)
+
+        stock_label = tk.Label(popup, text="", font=("Arial", 13, "bold"))
+        stock_label.pack(pady=(10, 5))
+
+        as_of_frame = tk.Frame(popup)
+        as_of_frame.pack(fill=tk.X, padx=15, pady=5)
+        date_var = tk.StringVar(value=datetime.now().strftime("%Y-%m-%d"))
+        tk.Label(as_of_frame, text="Stock at end of (yyyy-mm-dd):",
+                 font=("Arial", 11)).pack(side=tk.LEFT)
+        date_entry = tk.Entry(as_of_frame, textvariable=date_var, font=("Arial", 11), width=12)
+        date_entry.pack(side=tk.LEFT, padx=5)
+        tk.Button(as_of_frame, text="Check", command=lambda: check_as_of(),
+                 font=("Arial", 10), padx=8).pack(side=tk.LEFT)
+        as_of_label = tk.Label(as_of_frame, text="", font=("Arial", 11, "bold"))
+        as_of_label.pack(side=tk.LEFT, padx=10)
+
+        columns = ("date", "change", "reason", "ref", "balance")
+        tree = ttk.Treeview(popup, columns=columns, show="headings", height=14)
+        for column, heading, width in zip(columns, ("Date", "Change", "Reason", "Bill", "Balance"),
+                                          (170, 80, 110, 80, 90)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor="center")
+        tree.pack(fill=tk.BOTH, expand=True, padx=15)
+
+        def refresh():
+            stock = db.stock_as_of(item, datetime.now().strftime("%Y-%m-%d"))
+            stock_label.config(text=f"Current stock: {stock}")
+            tree.delete(*tree.get_children())
+            # Walk back from today's balance to show the balance after each movement
+            balance = stock
+            for date_time, change, reason, ref in db.stock_history(item):
+                tree.insert("", "end", values=(date_time, f"{change:+d}", reason, ref or "", balance))
+                balance -= change
+
+        def check_as_of(event=None):
+            try:
+                datetime.strptime(date_var.get().strip(), "%Y-%m-%d")
+            except ValueError:
+                messagebox.showwarning("Invalid Date", "Dates must be yyyy-mm-dd.", parent=popup)
+                return
+            as_of_label.config(text=f"{db.stock_as_of(item, date_var.get().strip())}")
+
+        entry_frame = tk.Frame(popup)
+        entry_frame.pack(fill=tk.X, padx=15, pady=10)
+        qty_var = tk.StringVar()
+        reason_var = tk.StringVar(value=StockHistoryDialog.ENTRY_REASONS[0])
+        tk.Label(entry_frame, text="Quantity (+/-):", font=("Arial", 11)).pack(side=tk.LEFT)
+        tk.Entry(entry_frame, textvariable=qty_var, font=("Arial", 11), width=8).pack(side=tk.LEFT, padx=5)
+        ttk.Combobox(entry_frame, textvariable=reason_var, values=StockHistoryDialog.ENTRY_REASONS,
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+
+        def record():
+            try:
+                change = int(qty_var.get().strip())
+            except ValueError:
+                messagebox.showwarning("Invalid", "Quantity must be a whole number.", parent=popup)
+                return
+            if change == 0:
+                return
+            stock = db.record_stock_movement(item, change, reason_var.get())
+            qty_var.set("")
+            refresh()
+            if on_change and stock is not None:
+                on_change(stock)
+
+        tk.Button(entry_frame, text="Record", command=record, bg="#4CAF50", fg="white",
+                 font=("Arial", 11, "bold"), padx=10).pack(side=tk.LEFT, padx=5)
+        date_entry.bind("<Return>", check_as_of)
+        refresh()
+
+
+class SuggestionDropdown:
+    """As-you-type suggestion list under an entry
+
+    Suggestions refresh shortly after typing stops, so a barcode scanner's
+    burst of keys and Return is not slowed down. Up/Down move through the
+    list, Return or a click takes the highlighted name, Escape closes it.
+    With nothing highlighted, Return submits the entry text unchanged.
+    """
+
+    DELAY_MS = 80
+    NAV_KEYS = ("Up", "Down", "Return", "KP_Enter", "Escape", "Tab")
+
+    @staticmethod
+    def attach(entry, suggest, on_choose, rows=8):
+        state = {"popup": None, "listbox": None, "job": None}
+
+        def hide(event=None):
+            if state["popup"] is not None:
+                state["popup"].destroy()
+                state["popup"] = state["listbox"] = None
+
+        def show(names):
+            if not names:
+                hide()
+                return
+            if state["popup"] is None:
+                popup = tk.Toplevel(entry)
+                popup.wm_overrideredirect(True)
+                listbox = tk.Listbox(popup, font=("Arial", 12), bg="#2b2b2b", fg="#ffffff",
+                                     selectbackground="#4CAF50", activestyle="none",
+                                     highlightthickness=1, bd=0)
+                listbox.pack(fill=tk.BOTH, expand=True)
+                listbox.bind("<Button-1>", pick)
+                state["popup"], state["listbox"] = popup, listbox
+            listbox = state["listbox"]
+            listbox.delete(0, tk.END)
+            for name in names:
+                listbox.insert(tk.END, name)
+            listbox.configure(height=min(len(names), rows))
+            state["popup"].wm_geometry(f"{entry.winfo_width()}x{listbox.winfo_reqheight()}"
+                                       f"+{entry.winfo_rootx()}+{entry.winfo_rooty() + entry.winfo_height()}")
+            state["popup"].lift()
+
+        def refresh():
+            state["job"] = None
+            text = entry.get()
+            show(suggest(text) if text.strip() else [])
+
+        def on_key(event):
+            if event.keysym in SuggestionDropdown.NAV_KEYS:
+                return
+            if state["job"] is not None:
+                entry.after_cancel(state["job"])
+            state["job"] = entry.after(SuggestionDropdown.DELAY_MS, refresh)
+
+        def move(step):
+            listbox = state["listbox"]
+            if listbox is None:
+                return "break"
+            current = listbox.curselection()
+            index = (current[0] + step) if current else (0 if step > 0 else listbox.size() - 1)
+            index = max(0, min(index, listbox.size() - 1))
+            listbox.selection_clear(0, tk.END)
+            listbox.selection_set(index)
+            listbox.see(index)
+            return "break"
+
+        def pick(event):
+            listbox = state["listbox"]
+            listbox.selection_clear(0, tk.END)
+            listbox.selection_set(listbox.nearest(event.y))
+            return choose()
+
+        def choose(event=None):
+            if state["job"] is not None:
+                entry.after_cancel(state["job"])
+                state["job"] = None
+            listbox = state["listbox"]
+            if listbox is not None and listbox.curselection():
+                entry.delete(0, tk.END)
+                entry.insert(0, listbox.get(listbox.curselection()[0]))
+            hide()
+            on_choose()
+            return "break"
+
+        entry.bind("<KeyRelease>", on_key, add="+")
+        entry.bind("<Down>", lambda e: move(1))
+        entry.bind("<Up>", lambda e: move(-1))
+        entry.bind("<Return>", choose)
+        entry.bind("<KP_Enter>", choose)
+        entry.bind("<Escape>", hide)
+        # Delay so a click on the list lands before the list disappears
+        entry.bind("<FocusOut>", lambda e: entry.after(150, hide), add="+")
+        return hide
+
+
 class ManualQuantityDialog:
     """Dialog for selecting quantity and price"""
     
@@ -417,7 +1336,7 @@ class ManualQuantityDialog:
                 font=("Arial", 12)).pack(pady=10)
 
         qty_var = tk.IntVar(value=1)
-        price_var = tk.DoubleVar(value=inventory[item]["price"])
+        price_var = tk.DoubleVar(value=inventory[item]["price"] / 100)
 
         tk.Label(popup, text="Quantity").pack()
         tk.Entry(popup, textvariable=qty_var, width=10, font=("Arial", 12)).pack(pady=5)
@@ -441,7 +1360,7 @@ class ManualQuantityDialog:
                 return
             result["confirmed"] = True
             result["qty"] = qty
-            result["price"] = price
+            result["price"] = to_paise(price)
             popup.destroy()
 
         tk.Button(popup, text="Add to Cart", command=confirm_entry,
@@ -465,7 +1384,7 @@ class FastBillingDialog:
         tk.Label(popup, text=f"Item: {item}", font=("Arial", 12, "bold")).pack(pady=10)
 
         qty_var = tk.IntVar(value=1)
-        price_var = tk.DoubleVar(value=inventory.get(item, {}).get("price", 0))
+        price_var = tk.DoubleVar(value=inventory.get(item, {}).get("price", 0) / 100)
 
         tk.Label(popup, text="Quantity").pack()
         tk.Entry(popup, textvariable=qty_var, font=("Arial", 12), width=10).pack(pady=5)
@@ -485,7 +1404,7 @@ class FastBillingDialog:
 
             result["confirmed"] = True
             result["qty"] = qty
-            result["price"] = price
+            result["price"] = to_paise(price)
             popup.destroy()
 
         tk.Button(popup, text="Add to Cart", command=confirm_fast_bill,
@@ -2,12 +2,74 @@
 import json
 import os
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 import sys
 
 
 # Printer configuration constants
 CONFIG_FILE = "printer_config.json"
 
+# Scheduled backup configuration
+BACKUP_CONFIG_FILE = "backup_config.json"
+DEFAULT_BACKUP_CONFIG = {
+    "enabled": True,
+    "backup_dir": "Backups",
+    "full_interval_hours": 24,
+    "incremental_interval_minutes": 30,
+    "keep_full": 7,
+    "idle_seconds": 60
+}
+
+# Sales archiving: years before the last keep_years calendar years move to
+# one file per year in archive_dir
+ARCHIVE_CONFIG_FILE = "archive_config.json"
+DEFAULT_ARCHIVE_CONFIG = {
+    "enabled": True,
+    "archive_dir": "Archives",
+    "keep_years": 2
+}
+
+# Tk main-loop stall log: stalls longer than threshold_ms are written to
+# log_file with the stack of the handler that caused them
+WATCHDOG_CONFIG_FILE = "watchdog_config.json"
+DEFAULT_WATCHDOG_CONFIG = {
+    "enabled": True,
+    "threshold_ms": 250,
+    "log_file": "stalls.log"
+}
+
+# SQL tracing, off unless enabled: statements slower than slow_ms are logged
+# to log_file with their query plan
+SQL_TRACE_CONFIG_FILE = "sql_trace_config.json"
+DEFAULT_SQL_TRACE_CONFIG = {
+    "enabled": False,
+    "slow_ms": 50,
+    "log_file": "slow_queries.log"
+}
+
+# Lane metrics: written to textfile (Prometheus text format) every
+# interval_seconds, and served at http://host:port/metrics when port is set
+METRICS_CONFIG_FILE = "metrics_config.json"
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "lane": "1",
+    "textfile": "Metrics/billsoft.prom",
+    "interval_seconds": 15,
+    "host": "127.0.0.1",
+    "port": 0
+}
+
+# Quick keys on the shop page: the count best sellers of the last days days,
+# re-ranked every refresh_seconds; pinned items always come first
+QUICK_KEYS_CONFIG_FILE = "quick_keys_config.json"
+DEFAULT_QUICK_KEYS_CONFIG = {
+    "enabled": True,
+    "count": 10,
+    "days": 30,
+    "refresh_seconds": 300,
+    "pinned": []
+}
+
 # ESC/POS commands for thermal printer
 ESC_INIT = b"\x1b@"
 ESC_CUT = b"\x1dV\x00"
@@ -63,6 +125,95 @@ def save_printing_config(config):
         return False
 
 
+def get_backup_config():
+    """Load scheduled backup configuration, filling in defaults"""
+    config = dict(DEFAULT_BACKUP_CONFIG)
+    if not os.path.exists(BACKUP_CONFIG_FILE):
+        return config
+    try:
+        with open(BACKUP_CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading backup config: {e}")
+    return config
+
+
+def save_backup_config(config):
+    """Save scheduled backup configuration to file"""
+    try:
+        with open(BACKUP_CONFIG_FILE, "w") as f:
+            json.dump(config, f, indent=4)
+        return True
+    except Exception as e:
+        print(f"Error saving backup config: {e}")
+        return False
+
+
+def get_archive_config():
+    """Load sales archiving configuration, filling in defaults"""
+    config = dict(DEFAULT_ARCHIVE_CONFIG)
+    if not os.path.exists(ARCHIVE_CONFIG_FILE):
+        return config
+    try:
+        with open(ARCHIVE_CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading archive config: {e}")
+    return config
+
+
+def get_watchdog_config():
+    """Load stall watchdog configuration, filling in defaults"""
+    config = dict(DEFAULT_WATCHDOG_CONFIG)
+    if not os.path.exists(WATCHDOG_CONFIG_FILE):
+        return config
+    try:
+        with open(WATCHDOG_CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading watchdog config: {e}")
+    return config
+
+
+def get_sql_trace_config():
+    """Load SQL tracing configuration, filling in defaults"""
+    config = dict(DEFAULT_SQL_TRACE_CONFIG)
+    if not os.path.exists(SQL_TRACE_CONFIG_FILE):
+        return config
+    try:
+        with open(SQL_TRACE_CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading SQL trace config: {e}")
+    return config
+
+
+def get_metrics_config():
+    """Load lane metrics configuration, filling in defaults"""
+    config = dict(DEFAULT_METRICS_CONFIG)
+    if not os.path.exists(METRICS_CONFIG_FILE):
+        return config
+    try:
+        with open(METRICS_CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading metrics config: {e}")
+    return config
+
+
+def get_quick_keys_config():
+    """Load quick key configuration, filling in defaults"""
+    config = dict(DEFAULT_QUICK_KEYS_CONFIG)
+    if not os.path.exists(QUICK_KEYS_CONFIG_FILE):
+        return config
+    try:
+        with open(QUICK_KEYS_CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading quick keys config: {e}")
+    return config
+
+
 def is_printer_online(printer_name):
     """Check if printer is online and ready"""
     if not WINDOWS_PRINT_AVAILABLE:
@@ -87,6 +238,22 @@ def get_available_printers():
         return ["Install pywin32 for printer support"]
 
 
+def to_paise(amount):
+    """Rupees (number or text such as "1299.50") to integer paise
+
+    Rounds half up to the nearest paisa. Raises decimal.InvalidOperation
+    (an ArithmeticError) for text that is not a number.
+    """
+    return int((Decimal(str(amount).strip()) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def rupees(paise):
+    """Integer paise as rupee text with two decimals, e.g. 129950 -> '1299.50'"""
+    sign = "-" if paise < 0 else ""
+    whole, fraction = divmod(abs(int(paise)), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
 def format_enhanced_receipt(cart, total, receipt_width=42):
     """Creates a beautifully formatted receipt with proper alignment"""
     lines = []
@@ -117,17 +284,17 @@ def format_enhanced_receipt(cart, total, receipt_width=42):
         item_total = qty * price
         subtotal += item_total
         
-        line = f"{item_name:<20} {qty:>4} {price:>7.2f} {item_total:>8.2f}"
+        line = f"{item_name:<20} {qty:>4} {rupees(price):>7} {rupees(item_total):>8}"
         lines.append(line)
     
     lines.append("-" * receipt_width)
     lines.append("")
     
     # Total section
-    lines.append(f"{'SUBTOTAL:':<30} {subtotal:>10.2f}")
-    lines.append(f"{'TAX (0%):':<30} {0:>10.2f}")
+    lines.append(f"{'SUBTOTAL:':<30} {rupees(subtotal):>10}")
+    lines.append(f"{'TAX (0%):':<30} {rupees(0):>10}")
     lines.append("=" * receipt_width)
-    lines.append(f"{'TOTAL:':<30} ₹{total:>9.2f}")
+    lines.append(f"{'TOTAL:':<30} ₹{rupees(total):>9}")
     lines.append("=" * receipt_width)
     lines.append("")
     
@@ -139,3 +306,53 @@ def format_enhanced_receipt(cart, total, receipt_width=42):
     lines.append("")
 
     return lines
+
+
+def inventory_cache(rows):
+    """In-memory inventory {name: {"price", "stock", "barcode"}} from fetch_inventory() rows"""
+    return {name: {"price": price, "stock": stock, "barcode": barcode}
+            for name, price, stock, barcode in rows}
+
+
+def format_sales_report(date_str, rows, totals, items):
+    """Daily sales report text and grand total in paise
+
+    rows are fetch_sales() lines, totals sales_totals() and items
+    item_sales_summary() for the same day.
+    """
+    fast_total = totals.get('FAST') or 0
+    regular_total = sum(amount for billing_type, amount in totals.items()
+                        if billing_type != 'FAST')
+    grand_total = regular_total + fast_total
+
+    def sales_lines(billing_fast):
+        return [f"  {item_name[:30]:<30} {quantity:>3} x ₹{rupees(price):>6} = ₹{rupees(total):>7}\n"
+                for item_name, quantity, price, total, dt, billing_type in rows
+                if (billing_type == 'FAST') == billing_fast]
+
+    def section(title):
+        return [f"┌{'─'*58}┐\n", f"│ {title}".ljust(59) + "│\n", f"└{'─'*58}┘\n\n"]
+
+    parts = [f"{'='*60}\n", f"  DAILY SALES REPORT - {date_str}\n", f"{'='*60}\n\n"]
+
+    regular_lines = sales_lines(False)
+    if regular_lines:
+        parts += section("📦 REGULAR BILLING (Stock Items)")
+        parts += regular_lines
+        parts += [f"\n  {'-'*50}\n", f"  Regular Subtotal: ₹{rupees(regular_total)}\n", f"  {'-'*50}\n\n"]
+
+    fast_lines = sales_lines(True)
+    if fast_lines:
+        parts += section("⚡ FAST BILLING (Manual Entry)")
+        parts += fast_lines
+        parts += [f"\n  {'-'*50}\n", f"  Fast Billing Subtotal: ₹{rupees(fast_total)}\n", f"  {'-'*50}\n\n"]
+
+    if items:
+        parts += section("📊 ITEM SUMMARY")
+        parts += [f"  {item_name[:30]:<30} {quantity:>5} = ₹{rupees(total):>9}\n"
+                  for item_name, quantity, total in items]
+        parts.append("\n")
+
+    parts += [f"{'='*60}\n", f"  TOTAL SALES: ₹{rupees(grand_total)}\n",
+              f"  (Regular: ₹{rupees(regular_total)} | Fast: ₹{rupees(fast_total)})\n", f"{'='*60}\n"]
+    return "".join(parts), grand_total